@@ -0,0 +1,83 @@
+import threading
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable
+
+
+@dataclass
+class _Call:
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: BaseException | None = None
+
+
+@dataclass
+class _Counters:
+    executadas: int = 0
+    coalescidas: int = 0
+    erros: int = 0
+
+
+class SingleFlight:
+    """
+    Coalescência de requisições idênticas (single-flight): enquanto uma chamada com
+    a mesma chave está em andamento, as demais esperam e recebem o mesmo resultado
+    (ou a mesma exceção) em vez de repetir a consulta no banco.
+
+    A chave é uma tupla cujo primeiro elemento é o nome da rota; as métricas são por rota.
+    O resultado é compartilhado entre as requisições e não deve ser alterado.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self._counters: dict[str, _Counters] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: tuple, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            counters = self._counters.setdefault(str(key[0]), _Counters())
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                counters.executadas += 1
+            else:
+                counters.coalescidas += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                counters.erros += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def metrics(self) -> dict[str, dict]:
+        with self._lock:
+            em_andamento: dict[str, int] = {}
+            for key in self._calls:
+                em_andamento[str(key[0])] = em_andamento.get(str(key[0]), 0) + 1
+
+            result = {}
+            for rota, c in sorted(self._counters.items()):
+                total = c.executadas + c.coalescidas
+                result[rota] = {
+                    "requisicoes": total,
+                    "executadas": c.executadas,
+                    "coalescidas": c.coalescidas,
+                    "taxa_coalescencia": round(c.coalescidas / total, 4) if total else 0.0,
+                    "erros": c.erros,
+                    "em_andamento": em_andamento.get(rota, 0),
+                }
+            return result
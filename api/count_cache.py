@@ -0,0 +1,86 @@
+import threading
+import time
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable
+from api.queries import Q_VERSAO
+
+
+@dataclass
+class _Entry:
+    versao: int
+    total: int
+
+
+class CountCache:
+    """
+    Totais da listagem de operadoras por filtro normalizado, válidos para uma versão
+    dos dados (dados_versao). A versão é conferida no banco no máximo a cada
+    check_seconds, aproveitando o cursor da própria requisição; quando muda, o cache
+    é esvaziado. Guarda no máximo max_entries filtros (os menos usados saem primeiro).
+    """
+
+    def __init__(self, max_entries: int = 1024, check_seconds: float = 30.0):
+        self.max_entries = max_entries
+        self.check_seconds = check_seconds
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._versao: int | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _sync_version(self, cur) -> int:
+        """Versão conhecida dos dados; relê do banco se a última conferência expirou."""
+        with self._lock:
+            if self._versao is not None and time.monotonic() - self._checked_at < self.check_seconds:
+                return self._versao
+
+        cur.execute(Q_VERSAO)
+        row = cur.fetchone()
+        versao = int(row["versao"]) if row else 0
+
+        with self._lock:
+            if versao != self._versao:
+                self._entries.clear()
+                self._versao = versao
+            self._checked_at = time.monotonic()
+            return versao
+
+    def get(self, key: Hashable, cur) -> int | None:
+        versao = self._sync_version(cur)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.versao != versao:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.total
+
+    def put(self, key: Hashable, total: int, cur) -> None:
+        versao = self._sync_version(cur)
+        with self._lock:
+            self._entries[key] = _Entry(versao, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        """Esvazia o cache e força a conferência da versão na próxima leitura (ex.: logo após um import)."""
+        with self._lock:
+            self._entries.clear()
+            self._versao = None
+
+    def metrics(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "versao": self._versao,
+                "entradas": len(self._entries),
+                "acertos": self.hits,
+                "faltas": self.misses,
+                "taxa_acerto": round(self.hits / total, 4) if total else 0.0,
+            }
+
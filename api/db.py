@@ -1,10 +1,34 @@
+import logging
 import os
+import threading
+import time
 import psycopg
 
 from contextlib import contextmanager
+from dataclasses import dataclass
 from psycopg.rows import dict_row
 
 
+logger = logging.getLogger(__name__)
+
+# Atraso de replicação em segundos; 0 no primário. Réplica sem WAL pendente só conta
+# como em dia (sem isso pareceria atrasada com o primário ocioso) se o walreceiver está
+# em streaming e ouviu o primário há menos de %(recebido)s segundos: desconectada, o
+# WAL recebido é todo aplicado e não há mais nada pendente. Fora disso vale o tempo
+# desde a última transação aplicada; NULL se nenhuma foi aplicada desde o início.
+Q_REPLICA_LAG = """
+SELECT CASE
+  WHEN NOT pg_is_in_recovery() THEN 0
+  WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() AND EXISTS (
+    SELECT 1 FROM pg_stat_wal_receiver
+    WHERE status = 'streaming'
+      AND last_msg_receipt_time > now() - make_interval(secs => %(recebido)s)
+  ) THEN 0
+  ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END::float8 AS lag
+"""
+
+
 def _get_env(name: str, default: str | None = None) -> str:
     v = os.getenv(name, default)
     if v is None:
@@ -12,28 +36,159 @@ def _get_env(name: str, default: str | None = None) -> str:
     return str(v).strip().strip('"').strip("'")
 
 
-@contextmanager
-def get_conn():
-    host = _get_env("DB_HOST")
-    port = _get_env("DB_PORT")
+@dataclass
+class Replica:
+    """Réplica de leitura e o que se sabe dela: indisponível até down_until, atraso medido em checked_at."""
+
+    host: str
+    port: str
+    down_until: float = 0.0
+    lag: float | None = None
+    checked_at: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return f"{self.host}:{self.port}"
+
+
+_replicas: list[Replica] = []
+_replicas_env: str | None = None
+_next_replica = 0
+_state_lock = threading.Lock()
+
+
+def _connect(host: str, port: str, **kwargs) -> psycopg.Connection:
     dbname = _get_env("DB_NAME")
     user = _get_env("DB_USER")
     password = _get_env("DB_PASSWORD")
 
-    conn = psycopg.connect(
+    return psycopg.connect(
         f"host={host} port={port} dbname={dbname} user={user} password={password}",
         row_factory=dict_row,
         options="-c client_encoding=UTF8",
+        **kwargs,
     )
-    
+
+
+def replicas() -> list[Replica]:
+    """Réplicas de DB_REPLICAS ("host[:porta],host[:porta]"); a porta padrão é DB_PORT."""
+    global _replicas, _replicas_env, _next_replica
+
+    env = _get_env("DB_REPLICAS", "")
+    with _state_lock:
+        if env != _replicas_env:
+            default_port = _get_env("DB_PORT", "5432")
+            parsed = []
+            for item in filter(None, (i.strip() for i in env.split(","))):
+                host, _, port = item.rpartition(":") if ":" in item else (item, "", default_port)
+                parsed.append(Replica(host, port or default_port))
+            _replicas, _replicas_env, _next_replica = parsed, env, 0
+        return _replicas
+
+
+def _round_robin(candidates: list[Replica]) -> list[Replica]:
+    global _next_replica
+
+    with _state_lock:
+        start = _next_replica % len(candidates)
+        _next_replica += 1
+    return candidates[start:] + candidates[:start]
+
+
+def _connect_replica() -> psycopg.Connection | None:
+    """Primeira réplica saudável e dentro do atraso máximo, em rodízio; None se nenhuma servir."""
+    candidates = replicas()
+    if not candidates:
+        return None
+
+    retry = float(_get_env("DB_REPLICA_RETRY_SECONDS", "30"))
+    check_every = float(_get_env("DB_REPLICA_CHECK_SECONDS", "5"))
+    max_lag = float(_get_env("DB_REPLICA_MAX_LAG_SECONDS", "30"))
+    # Padrão = wal_receiver_timeout: o primário ocioso só responde quando o walreceiver pergunta
+    received = float(_get_env("DB_REPLICA_RECEIVE_TIMEOUT_SECONDS", "60"))
+    timeout = int(float(_get_env("DB_REPLICA_CONNECT_TIMEOUT", "3")))
+
+    for r in _round_robin(candidates):
+        now = time.monotonic()
+        if now < r.down_until:
+            continue
+        lag_fresh = now - r.checked_at < check_every
+        if lag_fresh and r.lag is not None and r.lag > max_lag:
+            continue
+
+        try:
+            conn = _connect(r.host, r.port, connect_timeout=timeout)
+        except psycopg.OperationalError as e:
+            r.down_until = now + retry
+            logger.warning(f"Réplica {r.name} indisponível, fora do rodízio por {retry:.0f}s: {e}")
+            continue
+
+        if lag_fresh:
+            return conn
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute(Q_REPLICA_LAG, {"recebido": received})
+                lag = cur.fetchone()["lag"]
+            conn.rollback()
+        except psycopg.Error as e:
+            conn.close()
+            r.down_until = now + retry
+            logger.warning(f"Falha ao medir atraso da réplica {r.name}: {e}")
+            continue
+
+        if lag is None:
+            conn.close()
+            r.down_until, r.lag, r.checked_at = now + retry, None, now
+            logger.warning(
+                f"Réplica {r.name} sem streaming do primário e sem transação aplicada, "
+                f"fora do rodízio por {retry:.0f}s"
+            )
+            continue
+
+        if r.lag is not None and (r.lag > max_lag) != (lag > max_lag):
+            estado = "acima" if lag > max_lag else "de volta abaixo"
+            logger.warning(f"Réplica {r.name} {estado} do atraso máximo ({lag:.1f}s / {max_lag:.0f}s)")
+        r.lag, r.checked_at = lag, now
+
+        if lag > max_lag:
+            conn.close()
+            continue
+        return conn
+
+    return None
+
+
+@contextmanager
+def get_conn(readonly: bool = False):
+    """
+    Conexão com o banco. readonly=True tenta uma réplica de DB_REPLICAS e cai no
+    primário (DB_HOST) se nenhuma estiver disponível; escrita sempre vai ao primário.
+    """
+    conn = _connect_replica() if readonly else None
+    if conn is None:
+        conn = _connect(_get_env("DB_HOST"), _get_env("DB_PORT"))
+
     try:
         yield conn
     finally:
         conn.close()
 
 
+def replicas_status() -> list[dict]:
+    now = time.monotonic()
+    return [
+        {
+            "replica": r.name,
+            "status": "down" if now < r.down_until else "up",
+            "lag_seconds": r.lag,
+        }
+        for r in replicas()
+    ]
+
+
 @contextmanager
 def get_cursor(conn):
     """Context manager para cursor"""
     with conn.cursor() as cursor:
-        yield cursor
\ No newline at end of file
+        yield cursor
@@ -2,18 +2,36 @@ import os
 import logging
 import threading
 
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from fastapi import FastAPI, HTTPException, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from api.db import get_conn, get_cursor
-from api.schemas import OperadoraListResponse, EstatisticasResponse
-from api import queries
-from api.pipeline import run_pipeline_and_import
+from api.db import get_conn, get_cursor, replicas_status
+from api.schemas import (
+    OperadoraListResponse,
+    EstatisticasResponse,
+    CrescimentoResponse,
+    DespesasUFResponse,
+    AcimaMediaResponse,
+)
+from api import queries, snapshot
+from api.responses import FastJSONResponse
+from api.coalesce import SingleFlight
+from api.count_cache import CountCache
 
 
 PIPELINE_LOCK = threading.Lock()
 
+# Requisições idênticas simultâneas (mesma rota e parâmetros normalizados) compartilham a consulta
+coalescer = SingleFlight()
+
+# Totais da listagem por filtro (q, situacao), válidos enquanto dados_versao não muda
+count_cache = CountCache(
+    max_entries=int(os.getenv("COUNT_CACHE_MAX_ENTRIES", "1024")),
+    check_seconds=float(os.getenv("COUNT_CACHE_CHECK_SECONDS", "30")),
+)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -21,9 +39,29 @@ load_dotenv()
 
 os.environ['PGCLIENTENCODING'] = 'UTF8'
 
+def _fast_start() -> bool:
+    return os.getenv("API_FAST_START", "0").strip().lower() in ("1", "true", "yes")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if snapshot.enabled() and _fast_start():
+        # Aceita requisições logo; até o snapshot ficar pronto, as rotas de operadora vão ao banco.
+        threading.Thread(target=snapshot.preload, name="snapshot-preload", daemon=True).start()
+    elif snapshot.enabled():
+        try:
+            snapshot.load()
+        except Exception as e:
+            # Sem snapshot as rotas de operadora consultam o banco diretamente.
+            logger.warning(f"Snapshot de operadoras indisponível na inicialização: {e}")
+    yield
+
+
 app = FastAPI(
     title="IntuitiveCare - Teste Técnico", 
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 app.add_middleware(
@@ -47,12 +85,61 @@ def health_check():
             with get_cursor(conn) as cur:
                 cur.execute("SELECT 1")
                 cur.fetchone()
-        return {"status": "healthy", "database": "connected"}
+        return {"status": "healthy", "database": "connected", "replicas": replicas_status()}
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return {"status": "unhealthy", "error": str(e)}
 
 
+# Por (tem q, tem situacao): lista, lista + total numa só consulta (None quando o
+# COUNT separado é mais barato, sem q a página sai do índice sem ler o resto) e contagem
+OPERADORAS_QUERIES = {
+    (False, False): (queries.Q_OPERADORAS_LIST_ALL, None, queries.Q_OPERADORAS_COUNT_ALL),
+    (False, True): (queries.Q_OPERADORAS_LIST_ALL_SITUACAO, None, queries.Q_OPERADORAS_COUNT_ALL_SITUACAO),
+    (True, False): (
+        queries.Q_OPERADORAS_LIST_FILTER,
+        queries.Q_OPERADORAS_LIST_FILTER_TOTAL,
+        queries.Q_OPERADORAS_COUNT_FILTER,
+    ),
+    (True, True): (
+        queries.Q_OPERADORAS_LIST_FILTER_SITUACAO,
+        queries.Q_OPERADORAS_LIST_FILTER_SITUACAO_TOTAL,
+        queries.Q_OPERADORAS_COUNT_FILTER_SITUACAO,
+    ),
+}
+
+
+def _fetch_operadoras(page: int, limit: int, q_clean: str, situacao: str | None) -> dict:
+    offset = (page - 1) * limit
+    params = {"q_like": f"%{q_clean}%", "situacao": situacao, "limit": limit, "offset": offset}
+    q_list, q_list_total, q_count = OPERADORAS_QUERIES[(bool(q_clean), bool(situacao))]
+    key = (q_clean.lower(), situacao)
+
+    with get_conn(readonly=True) as conn:
+        with get_cursor(conn) as cur:
+            total = count_cache.get(key, cur)
+            total_exato = total is None
+
+            if total_exato and q_list_total:
+                cur.execute(q_list_total, params)
+                rows = cur.fetchall()
+                totais = {row.pop("total") for row in rows}
+                # Página vazia: sem linhas não há total, a não ser que seja a primeira
+                total = totais.pop() if totais else (0 if offset == 0 else None)
+            else:
+                cur.execute(q_list, params)
+                rows = cur.fetchall()
+
+            if total is None:
+                cur.execute(q_count, params)
+                total = cur.fetchone()["total"]
+
+            if total_exato:
+                count_cache.put(key, total, cur)
+
+    return {"data": rows, "total": total, "total_exato": total_exato, "page": page, "limit": limit}
+
+
 @app.get("/api/operadoras", response_model=OperadoraListResponse)
 def list_operadoras(
     page: int = Query(1, ge=1),
@@ -61,37 +148,13 @@ def list_operadoras(
     situacao: str | None = Query(None, pattern="^(ATIVA|CANCELADA)$"),
 ):
     try:
-        offset = (page - 1) * limit
         q_clean = (q or "").strip()
+        # ILIKE ignora maiúsculas/minúsculas e o LIKE do CNPJ só casa dígitos: a chave pode usar lower()
+        key = ("operadoras", page, limit, q_clean.lower(), situacao)
+        payload = coalescer.do(key, lambda: _fetch_operadoras(page, limit, q_clean, situacao))
 
-        with get_conn() as conn:
-            with get_cursor(conn) as cur:
-                if situacao:
-                    if q_clean:
-                        q_like = f"%{q_clean}%"
-                        cur.execute(queries.Q_OPERADORAS_COUNT_FILTER_SITUACAO, {"q_like": q_like, "situacao": situacao})
-                        total = cur.fetchone()["total"]
-                        cur.execute(queries.Q_OPERADORAS_LIST_FILTER_SITUACAO, {"q_like": q_like, "situacao": situacao, "limit": limit, "offset": offset})
-                        rows = cur.fetchall()
-                    else:
-                        cur.execute(queries.Q_OPERADORAS_COUNT_ALL_SITUACAO, {"situacao": situacao})
-                        total = cur.fetchone()["total"]
-                        cur.execute(queries.Q_OPERADORAS_LIST_ALL_SITUACAO, {"situacao": situacao, "limit": limit, "offset": offset})
-                        rows = cur.fetchall()
-                else:
-                    if q_clean:
-                        q_like = f"%{q_clean}%"
-                        cur.execute(queries.Q_OPERADORAS_COUNT_FILTER, {"q_like": q_like})
-                        total = cur.fetchone()["total"]
-                        cur.execute(queries.Q_OPERADORAS_LIST_FILTER, {"q_like": q_like, "limit": limit, "offset": offset})
-                        rows = cur.fetchall()
-                    else:
-                        cur.execute(queries.Q_OPERADORAS_COUNT_ALL)
-                        total = cur.fetchone()["total"]
-                        cur.execute(queries.Q_OPERADORAS_LIST_ALL, {"limit": limit, "offset": offset})
-                        rows = cur.fetchall()
-
-        return {"data": rows, "total": total, "page": page, "limit": limit}
+        # Linhas já no formato de Operadora: serializa direto, sem revalidar o response_model
+        return FastJSONResponse(payload)
 
     except Exception as e:
         logger.error(f"Erro: {e}", exc_info=True)
@@ -102,8 +165,13 @@ def list_operadoras(
 def get_operadora(cnpj: str):
     try:
         cnpj = "".join([c for c in cnpj if c.isdigit()])
-        
-        with get_conn() as conn:
+
+        snap = snapshot.current()
+        row = snap.operadora(cnpj) if snap else None
+        if row:
+            return row
+
+        with get_conn(readonly=True) as conn:
             with get_cursor(conn) as cur:
                 cur.execute(queries.Q_OPERADORA_DETAIL, {"cnpj": cnpj})
                 row = cur.fetchone()
@@ -124,45 +192,147 @@ def get_operadora(cnpj: str):
 def get_despesas_operadora(cnpj: str):
     try:
         cnpj = "".join([c for c in cnpj if c.isdigit()])
-        
-        with get_conn() as conn:
+
+        snap = snapshot.current()
+        rows = snap.despesas(cnpj) if snap else None
+        if rows is not None:
+            return FastJSONResponse({"cnpj": cnpj, "despesas": rows})
+
+        with get_conn(readonly=True) as conn:
             with get_cursor(conn) as cur:
                 cur.execute(queries.Q_OPERADORA_DESPESAS, {"cnpj": cnpj})
                 rows = cur.fetchall()
-        
-        return {"cnpj": cnpj, "despesas": rows}
+
+        return FastJSONResponse({"cnpj": cnpj, "despesas": rows})
         
     except Exception as e:
         logger.error(f"Erro: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _fetch_estatisticas() -> dict:
+    with get_conn(readonly=True) as conn:
+        with get_cursor(conn) as cur:
+            cur.execute(queries.Q_ESTATS)
+            stats = cur.fetchone()
+
+            cur.execute(queries.Q_TOP5)
+            top5 = cur.fetchall()
+
+            cur.execute(queries.Q_UF_TOP5)
+            topuf = cur.fetchall()
+
+    return {
+        "total_despesas": float(stats["total"]) if stats else 0,
+        "media_despesas": float(stats["media"]) if stats else 0,
+        "top_5_operadoras": top5,
+        "despesas_por_uf_top5": topuf,
+    }
+
+
 @app.get("/api/estatisticas", response_model=EstatisticasResponse)
 def get_estatisticas():
     try:
-        with get_conn() as conn:
-            with get_cursor(conn) as cur:
-                cur.execute(queries.Q_ESTATS)
-                stats = cur.fetchone()
-                
-                cur.execute(queries.Q_TOP5)
-                top5 = cur.fetchall()
-                
-                cur.execute(queries.Q_UF_TOP5)
-                topuf = cur.fetchall()
-
-        return {
-            "total_despesas": float(stats["total"]) if stats else 0,
-            "media_despesas": float(stats["media"]) if stats else 0,
-            "top_5_operadoras": top5 or [],
-            "despesas_por_uf_top5": topuf or [],
-        }
+        return FastJSONResponse(coalescer.do(("estatisticas",), _fetch_estatisticas))
         
     except Exception as e:
         logger.error(f"Erro: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _fetch_janela(cur) -> dict:
+    cur.execute(queries.Q_ANALYTICS_JANELA)
+    return cur.fetchone() or {"periodo_inicial": None, "periodo_final": None, "qtd_trimestres": 0, "atualizado_em": None}
+
+
+def _fetch_crescimento(limit: int) -> dict:
+    with get_conn(readonly=True) as conn:
+        with get_cursor(conn) as cur:
+            janela = _fetch_janela(cur)
+            cur.execute(queries.Q_ANALYTICS_CRESCIMENTO, {"limit": limit})
+            rows = cur.fetchall()
+
+    return {"janela": janela, "data": rows}
+
+
+@app.get("/api/estatisticas/crescimento", response_model=CrescimentoResponse)
+def get_crescimento(limit: int = Query(5, ge=1, le=100)):
+    try:
+        return FastJSONResponse(coalescer.do(("crescimento", limit), lambda: _fetch_crescimento(limit)))
+
+    except Exception as e:
+        logger.error(f"Erro: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _fetch_despesas_uf(limit: int) -> dict:
+    with get_conn(readonly=True) as conn:
+        with get_cursor(conn) as cur:
+            janela = _fetch_janela(cur)
+            cur.execute(queries.Q_ANALYTICS_DESPESAS_UF, {"limit": limit})
+            rows = cur.fetchall()
+
+    return {"janela": janela, "data": rows}
+
+
+@app.get("/api/estatisticas/uf", response_model=DespesasUFResponse)
+def get_despesas_por_uf(limit: int = Query(5, ge=1, le=30)):
+    try:
+        return FastJSONResponse(coalescer.do(("uf", limit), lambda: _fetch_despesas_uf(limit)))
+
+    except Exception as e:
+        logger.error(f"Erro: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _fetch_acima_media(minimo: int, page: int, limit: int) -> dict:
+    offset = (page - 1) * limit
+
+    with get_conn(readonly=True) as conn:
+        with get_cursor(conn) as cur:
+            janela = _fetch_janela(cur)
+            cur.execute(queries.Q_ANALYTICS_ACIMA_MEDIA_COUNT, {"minimo": minimo})
+            total = cur.fetchone()["total"]
+            cur.execute(queries.Q_ANALYTICS_ACIMA_MEDIA_LIST, {"minimo": minimo, "limit": limit, "offset": offset})
+            rows = cur.fetchall()
+
+    return {
+        "janela": janela,
+        "minimo_trimestres": minimo,
+        "total": total,
+        "data": rows,
+        "page": page,
+        "limit": limit,
+    }
+
+
+@app.get("/api/estatisticas/acima-media", response_model=AcimaMediaResponse)
+def get_acima_media(
+    minimo: int = Query(2, ge=1),
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=100),
+):
+    try:
+        key = ("acima-media", minimo, page, limit)
+        return FastJSONResponse(coalescer.do(key, lambda: _fetch_acima_media(minimo, page, limit)))
+
+    except Exception as e:
+        logger.error(f"Erro: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/metricas/coalescencia")
+def get_metricas_coalescencia():
+    """Por rota: requisições, consultas executadas e requisições atendidas por uma consulta já em andamento."""
+    return coalescer.metrics()
+
+
+@app.get("/api/metricas/totais")
+def get_metricas_totais():
+    """Cache de totais da listagem de operadoras: versão dos dados, entradas, acertos e faltas."""
+    return count_cache.metrics()
+
+
 @app.post("/api/admin/atualizar")
 def atualizar_dados(x_pipeline_token: str | None = Header(default=None)):
     token = os.getenv("PIPELINE_TOKEN")
@@ -174,7 +344,12 @@ def atualizar_dados(x_pipeline_token: str | None = Header(default=None)):
 
     started_at = datetime.now(timezone.utc)
     try:
+        # Importado só aqui: as rotas de leitura não carregam nada do ETL.
+        from api.pipeline import run_pipeline_and_import
+
         last_output = run_pipeline_and_import()
+        snapshot.invalidate()
+        count_cache.invalidate()
         return {
             "status": "success",
             "message": "Pipeline executado e banco atualizado com sucesso.",
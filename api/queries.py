@@ -14,6 +14,16 @@ ORDER BY razao_social
 LIMIT %(limit)s OFFSET %(offset)s
 """
 
+# Lista com filtro + total do filtro na mesma ida ao banco (a busca já lê todas as
+# linhas que casam para ordenar; contar junto sai mais barato que um COUNT separado)
+Q_OPERADORAS_LIST_FILTER_TOTAL = """
+SELECT cnpj, registro_ans, razao_social, modalidade, uf, situacao, COUNT(*) OVER ()::int AS total
+FROM operadoras
+WHERE cnpj LIKE %(q_like)s OR razao_social ILIKE %(q_like)s
+ORDER BY razao_social
+LIMIT %(limit)s OFFSET %(offset)s
+"""
+
 # Contagem sem filtro
 Q_OPERADORAS_COUNT_ALL = """
 SELECT COUNT(*)::int AS total FROM operadoras
@@ -36,7 +46,7 @@ WHERE cnpj = %(cnpj)s
 
 # Despesas de uma operadora
 Q_OPERADORA_DESPESAS = """
-SELECT ano, trimestre, vl_saldo_final
+SELECT ano, trimestre, vl_saldo_final::float8
 FROM despesas_consolidadas
 WHERE cnpj = %(cnpj)s
 ORDER BY ano, trimestre
@@ -45,29 +55,33 @@ ORDER BY ano, trimestre
 # Estatísticas gerais
 Q_ESTATS = """
 SELECT
-  COALESCE(SUM(vl_saldo_final), 0)::numeric AS total,
-  COALESCE(AVG(vl_saldo_final), 0)::numeric AS media
+  COALESCE(SUM(vl_saldo_final), 0)::float8 AS total,
+  COALESCE(AVG(vl_saldo_final), 0)::float8 AS media
 FROM despesas_consolidadas
 """
 
-# Top 5 operadoras por despesas
+# Top 5 operadoras por despesas: agrega antes do join, que fica com só 5 buscas por cnpj
 Q_TOP5 = """
 SELECT
   d.cnpj,
-  MAX(o.razao_social) AS razao_social,
-  SUM(d.vl_saldo_final)::numeric AS total_despesas
-FROM despesas_consolidadas d
+  o.razao_social,
+  d.total_despesas::float8 AS total_despesas
+FROM (
+  SELECT cnpj, SUM(vl_saldo_final) AS total_despesas
+  FROM despesas_consolidadas
+  GROUP BY cnpj
+  ORDER BY total_despesas DESC
+  LIMIT 5
+) d
 LEFT JOIN operadoras o ON o.cnpj = d.cnpj
-GROUP BY d.cnpj
-ORDER BY total_despesas DESC
-LIMIT 5
+ORDER BY d.total_despesas DESC
 """
 
 # Top 5 UFs por despesas
 Q_UF_TOP5 = """
 SELECT
   COALESCE(o.uf, 'NI') AS uf,
-  SUM(d.vl_saldo_final)::numeric AS total_despesas
+  SUM(d.vl_saldo_final)::float8 AS total_despesas
 FROM despesas_consolidadas d
 LEFT JOIN operadoras o ON o.cnpj = d.cnpj
 GROUP BY COALESCE(o.uf, 'NI')
@@ -92,6 +106,15 @@ ORDER BY razao_social
 LIMIT %(limit)s OFFSET %(offset)s;
 """
 
+Q_OPERADORAS_LIST_FILTER_SITUACAO_TOTAL = """
+SELECT cnpj, registro_ans, razao_social, modalidade, uf, situacao, COUNT(*) OVER ()::int AS total
+FROM operadoras
+WHERE (cnpj ILIKE %(q_like)s OR razao_social ILIKE %(q_like)s)
+  AND situacao = %(situacao)s
+ORDER BY razao_social
+LIMIT %(limit)s OFFSET %(offset)s;
+"""
+
 # Sem q, só situacao
 Q_OPERADORAS_COUNT_ALL_SITUACAO = """
 SELECT COUNT(*)::int AS total
@@ -106,3 +129,56 @@ WHERE situacao = %(situacao)s
 ORDER BY razao_social
 LIMIT %(limit)s OFFSET %(offset)s;
 """
+
+# Analytics pré-calculadas no import (atualizar_analytics)
+Q_ANALYTICS_JANELA = """
+SELECT periodo_inicial, periodo_final, qtd_trimestres, atualizado_em
+FROM analytics_janela
+"""
+
+# ORDER BY qualificado (c.): sem ele usaria a coluna de saída (float8) e não o índice
+Q_ANALYTICS_CRESCIMENTO = """
+SELECT
+  cnpj, razao_social, first_periodo, last_periodo,
+  first_val::float8, last_val::float8, crescimento_percentual::float8
+FROM analytics_crescimento c
+WHERE c.crescimento_percentual IS NOT NULL
+ORDER BY c.crescimento_percentual DESC NULLS LAST
+LIMIT %(limit)s
+"""
+
+Q_ANALYTICS_DESPESAS_UF = """
+SELECT uf, total_uf::float8, qtd_operadoras, media_por_operadora_na_uf::float8
+FROM analytics_despesas_uf
+ORDER BY total_uf DESC
+LIMIT %(limit)s
+"""
+
+Q_ANALYTICS_ACIMA_MEDIA_COUNT = """
+SELECT COUNT(*)::int AS total
+FROM analytics_acima_media
+WHERE qtd_trimestres_acima_media >= %(minimo)s
+"""
+
+Q_ANALYTICS_ACIMA_MEDIA_LIST = """
+SELECT cnpj, razao_social, qtd_trimestres_acima_media
+FROM analytics_acima_media
+WHERE qtd_trimestres_acima_media >= %(minimo)s
+ORDER BY qtd_trimestres_acima_media DESC, cnpj
+LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+# Versão dos dados (incrementada a cada import)
+Q_VERSAO = "SELECT versao FROM dados_versao WHERE id = 1"
+
+# Snapshot em memória (api/snapshot.py): tabelas inteiras, lidas na carga do snapshot
+Q_SNAPSHOT_OPERADORAS = """
+SELECT cnpj, registro_ans, razao_social, modalidade, uf, situacao
+FROM operadoras
+"""
+
+Q_SNAPSHOT_DESPESAS = """
+SELECT cnpj, ano, trimestre, vl_saldo_final::float8 AS vl_saldo_final
+FROM despesas_consolidadas
+WHERE cnpj IS NOT NULL
+"""
@@ -0,0 +1,24 @@
+import orjson
+
+from decimal import Decimal
+from fastapi.responses import ORJSONResponse
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    Resposta serializada com orjson.
+
+    Quando o handler devolve esta resposta diretamente, o FastAPI não valida o
+    conteúdo contra o response_model nem passa pelo jsonable_encoder; use só com
+    dados que já saem do banco no formato do schema.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
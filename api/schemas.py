@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 from typing import Optional, List, Any
 
@@ -14,6 +15,8 @@ class Operadora(BaseModel):
 class OperadoraListResponse(BaseModel):
     data: List[Operadora]
     total: int
+    # False quando o total veio do cache (pode estar defasado até a próxima conferência de dados_versao)
+    total_exato: bool = True
     page: int
     limit: int
 
@@ -29,3 +32,52 @@ class EstatisticasResponse(BaseModel):
     media_despesas: float
     top_5_operadoras: List[Any]
     despesas_por_uf_top5: List[Any]
+
+
+class JanelaAnalytics(BaseModel):
+    periodo_inicial: Optional[int] = None
+    periodo_final: Optional[int] = None
+    qtd_trimestres: int = 0
+    atualizado_em: Optional[datetime] = None
+
+
+class CrescimentoItem(BaseModel):
+    cnpj: str
+    razao_social: Optional[str] = None
+    first_periodo: int
+    last_periodo: int
+    first_val: Optional[float] = None
+    last_val: Optional[float] = None
+    crescimento_percentual: float
+
+
+class CrescimentoResponse(BaseModel):
+    janela: JanelaAnalytics
+    data: List[CrescimentoItem]
+
+
+class DespesaUFItem(BaseModel):
+    uf: str
+    total_uf: float
+    qtd_operadoras: int
+    media_por_operadora_na_uf: Optional[float] = None
+
+
+class DespesasUFResponse(BaseModel):
+    janela: JanelaAnalytics
+    data: List[DespesaUFItem]
+
+
+class AcimaMediaItem(BaseModel):
+    cnpj: str
+    razao_social: Optional[str] = None
+    qtd_trimestres_acima_media: int
+
+
+class AcimaMediaResponse(BaseModel):
+    janela: JanelaAnalytics
+    minimo_trimestres: int
+    total: int
+    data: List[AcimaMediaItem]
+    page: int
+    limit: int
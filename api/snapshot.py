@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+import time
+import psycopg
+
+from api.db import get_conn, get_cursor
+from api.queries import Q_SNAPSHOT_DESPESAS, Q_SNAPSHOT_OPERADORAS, Q_VERSAO
+
+
+logger = logging.getLogger(__name__)
+
+DETAIL_COLUMNS = ("cnpj", "registro_ans", "razao_social", "modalidade", "uf", "situacao")
+
+
+class OperadoraSnapshot:
+    """
+    Cópia em memória de operadoras e da série de despesas de cada uma.
+
+    As despesas ficam em colunas NumPy contíguas, agrupadas por operadora
+    (layout CSR): as linhas da operadora i estão em [inicio[i], inicio[i + 1]).
+    O dicionário index leva o CNPJ à posição i.
+    """
+
+    def __init__(self, versao: int, operadoras: list[dict], despesas: list[dict]):
+        # NumPy só é importado quando um snapshot é montado (não pesa no import da API)
+        import numpy as np
+
+        self.versao = versao
+        self.loaded_at = time.monotonic()
+
+        self.index = {row["cnpj"]: i for i, row in enumerate(operadoras)}
+        self.detail = {col: np.array([row[col] for row in operadoras], dtype=object) for col in DETAIL_COLUMNS}
+
+        n = len(operadoras)
+        pos = np.fromiter((self.index.get(row["cnpj"], -1) for row in despesas), dtype=np.int64, count=len(despesas))
+        ano = np.fromiter((row["ano"] for row in despesas), dtype=np.int16, count=len(despesas))
+        trimestre = np.fromiter((row["trimestre"] for row in despesas), dtype=np.int8, count=len(despesas))
+        valor = np.fromiter((row["vl_saldo_final"] for row in despesas), dtype=np.float64, count=len(despesas))
+
+        # Ordena por (operadora, ano, trimestre) e descarta despesas sem operadora conhecida
+        order = np.lexsort((trimestre, ano, pos))
+        order = order[pos[order] >= 0]
+        self.ano = ano[order]
+        self.trimestre = trimestre[order]
+        self.valor = valor[order]
+
+        counts = np.bincount(pos[order], minlength=n)
+        self.inicio = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.inicio[1:])
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def operadora(self, cnpj: str) -> dict | None:
+        i = self.index.get(cnpj)
+        if i is None:
+            return None
+        return {col: self.detail[col][i] for col in DETAIL_COLUMNS}
+
+    def despesas(self, cnpj: str) -> list[dict] | None:
+        i = self.index.get(cnpj)
+        if i is None:
+            return None
+        a, b = self.inicio[i], self.inicio[i + 1]
+        return [
+            {"ano": int(ano), "trimestre": int(tri), "vl_saldo_final": float(v)}
+            for ano, tri, v in zip(self.ano[a:b], self.trimestre[a:b], self.valor[a:b])
+        ]
+
+
+_snapshot: OperadoraSnapshot | None = None
+_checked_at = 0.0
+_reload_lock = threading.Lock()
+
+
+def _check_interval() -> float:
+    return float(os.getenv("SNAPSHOT_CHECK_SECONDS", "30"))
+
+
+def enabled() -> bool:
+    return os.getenv("SNAPSHOT_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+
+
+def _fetch_version(cur) -> int:
+    cur.execute(Q_VERSAO)
+    row = cur.fetchone()
+    return int(row["versao"]) if row else 0
+
+
+def load() -> OperadoraSnapshot:
+    """Lê operadoras e despesas numa única transação REPEATABLE READ (versão consistente)."""
+    global _snapshot, _checked_at
+
+    started = time.perf_counter()
+    with get_conn(readonly=True) as conn:
+        conn.isolation_level = psycopg.IsolationLevel.REPEATABLE_READ
+        with get_cursor(conn) as cur:
+            versao = _fetch_version(cur)
+            cur.execute(Q_SNAPSHOT_OPERADORAS)
+            operadoras = cur.fetchall()
+            cur.execute(Q_SNAPSHOT_DESPESAS)
+            despesas = cur.fetchall()
+        conn.rollback()
+
+    snap = OperadoraSnapshot(versao, operadoras, despesas)
+    _snapshot = snap
+    _checked_at = time.monotonic()
+    logger.info(
+        f"Snapshot de operadoras carregado: versão {versao} | {len(snap)} operadoras | "
+        f"{len(snap.valor)} despesas | {time.perf_counter() - started:.2f}s"
+    )
+    return snap
+
+
+def _refresh_if_stale() -> None:
+    """Roda em thread própria, com _reload_lock já adquirido por _start_refresh."""
+    try:
+        with get_conn(readonly=True) as conn:
+            with get_cursor(conn) as cur:
+                versao = _fetch_version(cur)
+        if _snapshot is None or versao != _snapshot.versao:
+            load()
+    except Exception as e:
+        logger.warning(f"Falha ao atualizar snapshot de operadoras: {e}")
+    finally:
+        _reload_lock.release()
+
+
+def _start_refresh() -> None:
+    global _checked_at
+
+    # Só uma thread verifica/recarrega, fora da requisição; as requisições seguem
+    # com o snapshot atual até a troca.
+    if not _reload_lock.acquire(blocking=False):
+        return
+    _checked_at = time.monotonic()
+    try:
+        threading.Thread(target=_refresh_if_stale, name="snapshot-refresh", daemon=True).start()
+    except Exception:
+        _reload_lock.release()
+        raise
+
+
+def preload() -> None:
+    """Carga inicial em segundo plano; enquanto roda, current() devolve None e as rotas usam o banco."""
+    with _reload_lock:
+        try:
+            load()
+        except Exception as e:
+            logger.warning(f"Snapshot de operadoras indisponível na inicialização: {e}")
+
+
+def current() -> OperadoraSnapshot | None:
+    """
+    Snapshot atual. No máximo a cada SNAPSHOT_CHECK_SECONDS dispara, em segundo
+    plano, a conferência da versão dos dados (e a recarga, se mudou); a requisição
+    não espera e recebe o snapshot que estiver carregado.
+    """
+    if not enabled():
+        return None
+    if time.monotonic() - _checked_at >= _check_interval():
+        _start_refresh()
+    return _snapshot
+
+
+def invalidate() -> None:
+    """Força a conferência da versão na próxima leitura (ex.: logo após um import)."""
+    global _checked_at
+    _checked_at = 0.0
@@ -0,0 +1,58 @@
+"""
+Benchmark do parser numérico do ETL (etl/br_numbers.py).
+
+Mede, em --rows valores, o caminho antigo (.str.replace(".", "") +
+.str.replace(",", ".") + conversão) contra parse_br_number, com entrada no
+formato da ANS ("1234567,89") e no formato do consolidado ("1234567.89").
+Os casos de conversão ficam em tests/test_br_numbers.py.
+
+Uso:
+    python -m benchmarks.bench_br_numbers [--rows 1000000] [--repeat 3]
+"""
+import argparse
+import math
+import random
+import time
+import pandas as pd
+
+from etl.br_numbers import parse_br_number
+
+
+def _antes(values: pd.Series) -> pd.Series:
+    return pd.to_numeric(
+        values.astype(str).str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+        errors="coerce",
+    )
+
+
+def _tempo(fn, values: pd.Series, repeat: int) -> float:
+    melhor = math.inf
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(values)
+        melhor = min(melhor, time.perf_counter() - started)
+    return melhor
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    numeros = [rnd.uniform(-1e6, 1e10) for _ in range(args.rows)]
+    entradas = {
+        "ANS (1234567,89)": pd.Series([f"{x:.2f}".replace(".", ",") for x in numeros]),
+        "consolidado (1234567.89)": pd.Series([f"{x:.2f}" for x in numeros]),
+    }
+
+    print(f"{args.rows} valores, melhor de {args.repeat}:")
+    for nome, values in entradas.items():
+        antes = _tempo(_antes, values, args.repeat)
+        depois = _tempo(parse_br_number, values, args.repeat)
+        print(f"{nome:<26} antes {antes * 1000:8.1f} ms | depois {depois * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
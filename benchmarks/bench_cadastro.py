@@ -0,0 +1,213 @@
+"""
+Benchmark da carga do cadastro de operadoras no banco.
+
+Compara, sobre os mesmos Relatorio_cadop*.csv:
+- antes: COPY (FORMAT text) de cada linha numa coluna única + parsing em SQL
+  com split_part/regexp_replace/convert_from;
+- depois: etl.cadastro (parser CSV do pandas) + COPY (FORMAT csv) em staging tipada.
+
+Os dois caminhos terminam na mesma tabela temporária deduplicada por CNPJ; o
+upsert em operadoras é igual nos dois e fica fora da medição. Os arquivos são
+enviados via COPY FROM STDIN, então não é preciso acesso ao /shared.
+
+Uso:
+    python -m benchmarks.bench_cadastro [--rows 50000] [--repeat 5] [--raw-dir data/raw]
+
+Sem --raw-dir, gera arquivos sintéticos com --rows linhas cada (com ';' dentro
+de campos entre aspas, como no cadastro real).
+"""
+import argparse
+import csv
+import io
+import random
+import tempfile
+import time
+
+from pathlib import Path
+from dotenv import load_dotenv
+from psycopg.rows import tuple_row
+from api.db import get_conn
+from etl import cadastro
+
+
+HEADER = [
+    "REGISTRO_OPERADORA", "CNPJ", "Razao_Social", "Nome_Fantasia", "Modalidade", "Logradouro",
+    "Numero", "Complemento", "Bairro", "Cidade", "UF", "CEP", "DDD", "Telefone", "Fax",
+    "Endereco_eletronico", "Representante", "Cargo_Representante", "Regiao_de_Comercializacao",
+    "Data_Registro_ANS",
+]
+
+ANTES = r"""
+CREATE TEMP TABLE ativas_raw (linha TEXT) ON COMMIT DROP;
+CREATE TEMP TABLE canceladas_raw (linha TEXT) ON COMMIT DROP;
+"""
+
+ANTES_PARSE = r"""
+CREATE TEMP TABLE resultado ON COMMIT DROP AS
+WITH src AS (
+  SELECT 'ATIVA' AS situacao, linha FROM ativas_raw
+  UNION ALL
+  SELECT 'CANCELADA' AS situacao, linha FROM canceladas_raw
+),
+limpa AS (
+  SELECT situacao, replace(linha, '""', '"') AS linha
+  FROM src
+  WHERE linha IS NOT NULL AND trim(linha) <> ''
+),
+dados AS (
+  SELECT
+    situacao,
+    trim(both '"' from split_part(linha, ';', 1)) AS registro_ans,
+    trim(both '"' from split_part(linha, ';', 2)) AS cnpj,
+    convert_from(convert_to(trim(both '"' from split_part(linha, ';', 3)), 'LATIN1'), 'UTF8') AS razao_social,
+    convert_from(convert_to(trim(both '"' from split_part(linha, ';', 5)), 'LATIN1'), 'UTF8') AS modalidade,
+    convert_from(convert_to(trim(both '"' from split_part(linha, ';', 11)), 'LATIN1'), 'UTF8') AS uf
+  FROM limpa
+),
+normalizado AS (
+  SELECT
+    situacao,
+    NULLIF(trim(registro_ans), '') AS registro_ans,
+    NULLIF(regexp_replace(cnpj, '\D', '', 'g'), '') AS cnpj,
+    NULLIF(trim(razao_social), '') AS razao_social,
+    NULLIF(trim(modalidade), '') AS modalidade,
+    CASE
+      WHEN upper(left(regexp_replace(trim(uf), '[^A-Za-z]', '', 'g'), 2)) ~ '^[A-Z]{2}$'
+        THEN upper(left(regexp_replace(trim(uf), '[^A-Za-z]', '', 'g'), 2))
+      ELSE NULL
+    END AS uf
+  FROM dados
+  WHERE cnpj IS NOT NULL
+    AND trim(cnpj) <> ''
+    AND cnpj !~ '^(CNPJ|Cnpj)'
+    AND registro_ans !~ '^(REGISTRO_OPERADORA|Registro_ANS)'
+)
+SELECT DISTINCT ON (cnpj) cnpj, registro_ans, razao_social, modalidade, uf, situacao
+FROM normalizado
+WHERE razao_social IS NOT NULL AND cnpj ~ '^\d+$' AND length(cnpj) = 14
+ORDER BY cnpj, CASE WHEN situacao = 'ATIVA' THEN 1 ELSE 2 END, registro_ans NULLS LAST
+"""
+
+DEPOIS = """
+CREATE TEMP TABLE operadoras_carga (
+  registro_ans VARCHAR(20),
+  cnpj         VARCHAR(14) NOT NULL,
+  razao_social TEXT NOT NULL,
+  modalidade   TEXT,
+  uf           CHAR(2),
+  situacao     TEXT NOT NULL
+) ON COMMIT DROP
+"""
+
+DEPOIS_DEDUP = """
+CREATE TEMP TABLE resultado ON COMMIT DROP AS
+SELECT DISTINCT ON (cnpj) cnpj, registro_ans, razao_social, modalidade, uf, situacao
+FROM operadoras_carga
+ORDER BY cnpj, CASE WHEN situacao = 'ATIVA' THEN 1 ELSE 2 END, registro_ans NULLS LAST
+"""
+
+Q_RESULTADO = "SELECT cnpj, registro_ans, razao_social, modalidade, uf, situacao FROM resultado"
+
+
+def _cnpj(rnd: random.Random) -> str:
+    base = [rnd.randint(0, 9) for _ in range(12)]
+    for weights in ([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]):
+        r = sum(d * w for d, w in zip(base, weights)) % 11
+        base.append(0 if r < 2 else 11 - r)
+    return "".join(map(str, base))
+
+
+def _generate(raw_dir: Path, rows: int) -> None:
+    rnd = random.Random(42)
+    ufs = ["SP", "RJ", "MG", "RS", "PR", "BA", "SC", "PE"]
+    for nome, _ in cadastro.FONTES:
+        with open(raw_dir / nome, "w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f, delimiter=";", quoting=csv.QUOTE_ALL)
+            w.writerow(HEADER)
+            for i in range(rows):
+                fantasia = "SAÚDE; PLANOS" if i % 10 == 0 else f"FANTASIA {i}"
+                w.writerow([
+                    str(300000 + i), _cnpj(rnd), f"OPERADORA DE SAÚDE {i} LTDA", fantasia, "Medicina de Grupo",
+                    "RUA DAS FLORES", str(i), "", "CENTRO", "SÃO PAULO", rnd.choice(ufs), "01000000", "11",
+                    "30000000", "", "contato@operadora.com.br", "FULANO DE TAL", "DIRETOR", "1", "2000-01-01",
+                ])
+
+
+def _copy(cur, sql: str, data: bytes) -> None:
+    with cur.copy(sql) as copy:
+        copy.write(data)
+
+
+def _before(conn, raw_dir: Path) -> list[tuple]:
+    with conn.cursor(row_factory=tuple_row) as cur:
+        cur.execute(ANTES)
+        for (nome, _), tabela in zip(cadastro.FONTES, ["ativas_raw", "canceladas_raw"]):
+            sql = f"COPY {tabela} (linha) FROM STDIN WITH (FORMAT text, ENCODING 'LATIN1')"
+            _copy(cur, sql, (raw_dir / nome).read_bytes())
+        cur.execute(ANTES_PARSE)
+        cur.execute(Q_RESULTADO)
+        rows = cur.fetchall()
+    conn.rollback()
+    return rows
+
+
+def _after(conn, raw_dir: Path) -> list[tuple]:
+    buf = io.StringIO()
+    partes = [cadastro._clean(cadastro._read_cadop(raw_dir / nome), situacao) for nome, situacao in cadastro.FONTES]
+    for parte in partes:
+        parte[cadastro.COLUNAS].to_csv(buf, index=False, header=False, sep=";")
+
+    with conn.cursor(row_factory=tuple_row) as cur:
+        cur.execute(DEPOIS)
+        sql = (
+            "COPY operadoras_carga (registro_ans, cnpj, razao_social, modalidade, uf, situacao) "
+            "FROM STDIN WITH (FORMAT csv, DELIMITER ';', QUOTE '\"', ENCODING 'UTF8')"
+        )
+        _copy(cur, sql, buf.getvalue().encode("utf-8"))
+        cur.execute(DEPOIS_DEDUP)
+        cur.execute(Q_RESULTADO)
+        rows = cur.fetchall()
+    conn.rollback()
+    return rows
+
+
+def _timeit(fn, repeat: int) -> tuple[float, list[tuple]]:
+    best, result = float("inf"), []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--raw-dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir = args.raw_dir
+        if raw_dir is None:
+            raw_dir = Path(tmp)
+            _generate(raw_dir, args.rows)
+
+        linhas = sum((raw_dir / nome).read_bytes().count(b"\n") - 1 for nome, _ in cadastro.FONTES)
+
+        with get_conn() as conn:
+            before, antes = _timeit(lambda: _before(conn, raw_dir), args.repeat)
+            after, depois = _timeit(lambda: _after(conn, raw_dir), args.repeat)
+
+    print(f"cadastro ({linhas} linhas)   antes: {before * 1000:8.1f} ms | depois: {after * 1000:8.1f} ms | {before / after:5.1f}x")
+
+    # Diferenças esperadas: o caminho antigo desloca os campos após um ';' entre aspas
+    antes_por_cnpj = {r[0]: r for r in antes}
+    divergentes = sum(1 for r in depois if antes_por_cnpj.get(r[0]) != r)
+    print(f"operadoras: antes {len(antes)} | depois {len(depois)} | linhas divergentes: {divergentes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark da coalescência de requisições idênticas (api/coalesce.py).
+
+Sobe a API (uvicorn, no mesmo processo) contra o banco configurado no .env e
+dispara --rajadas rajadas de --clientes requisições simultâneas para a mesma URL.
+Compara:
+- antes: cada requisição executa as próprias consultas;
+- depois: SingleFlight, uma execução por rajada de requisições idênticas.
+
+Uso:
+    python -m benchmarks.bench_coalesce [--url /api/estatisticas] [--clientes 50] [--rajadas 20]
+
+Sai com código 1 se alguma resposta diferir entre os dois modos.
+"""
+import argparse
+import socket
+import statistics
+import threading
+import time
+import urllib.request
+import uvicorn
+
+from concurrent.futures import ThreadPoolExecutor
+from api import main as api_main
+from api.coalesce import SingleFlight
+
+
+class _SemCoalescencia:
+    """Mesmo contrato do SingleFlight, mas executa toda chamada."""
+
+    def __init__(self):
+        self.executadas = 0
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            self.executadas += 1
+        return fn()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str) -> tuple[float, bytes]:
+    started = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=60) as r:
+        body = r.read()
+    return time.perf_counter() - started, body
+
+
+def _carga(url: str, clientes: int, rajadas: int) -> tuple[list[float], set[bytes], float]:
+    latencias: list[float] = []
+    corpos: set[bytes] = set()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as pool:
+        for _ in range(rajadas):
+            for lat, body in pool.map(lambda _: _get(url), range(clientes)):
+                latencias.append(lat)
+                corpos.add(body)
+    return latencias, corpos, time.perf_counter() - started
+
+
+def _report(nome: str, latencias: list[float], elapsed: float, executadas: int) -> None:
+    ms = sorted(x * 1000 for x in latencias)
+    p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+    print(
+        f"{nome:<7} {len(ms)} requisições | {executadas} execuções no banco | "
+        f"{len(ms) / elapsed:.0f} req/s | p50 {statistics.median(ms):.1f} ms | p99 {p99:.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="/api/estatisticas")
+    parser.add_argument("--clientes", type=int, default=50)
+    parser.add_argument("--rajadas", type=int, default=20)
+    args = parser.parse_args()
+
+    port = _free_port()
+    # Threadpool do Starlette (40 threads por padrão) atende as rotas síncronas
+    server = uvicorn.Server(uvicorn.Config(api_main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    url = f"http://127.0.0.1:{port}{args.url}"
+    _get(url)
+
+    try:
+        sem = _SemCoalescencia()
+        api_main.coalescer = sem
+        latencias, corpos_antes, elapsed = _carga(url, args.clientes, args.rajadas)
+        _report("antes", latencias, elapsed, sem.executadas)
+
+        api_main.coalescer = SingleFlight()
+        latencias, corpos_depois, elapsed = _carga(url, args.clientes, args.rajadas)
+        rota = next(iter(api_main.coalescer.metrics().values()))
+        _report("depois", latencias, elapsed, rota["executadas"])
+        print(f"métricas: {rota}")
+    finally:
+        server.should_exit = True
+
+    if len(corpos_antes | corpos_depois) != 1:
+        print("FALHA: respostas diferentes entre os modos.")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
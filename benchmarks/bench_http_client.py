@@ -0,0 +1,200 @@
+"""
+Benchmark do cliente HTTP da ANS (etl/http_client.py) contra um servidor local que
+injeta falhas ao acaso. Os cenários de falha com asserções ficam em
+tests/test_http_client.py.
+
+O servidor publica uma página de índice e --files arquivos de --size bytes; uma
+fração --gzip deles vai com Content-Encoding: gzip (como o portal da ANS faz com
+os CSVs do cadastro), e o arquivo gravado tem que ser o conteúdo decodificado. Com
+probabilidade --falhas cada requisição recebe uma falha sorteada: 429, 503,
+conexão derrubada sem resposta ou corpo truncado.
+
+Compara:
+- antes: requests.get por URL (conexão nova a cada chamada, sem novas tentativas);
+- depois: HttpClient compartilhado (keep-alive, novas tentativas com backoff, limite de taxa).
+
+Uso:
+    python -m benchmarks.bench_http_client [--files 40] [--size 200000] [--falhas 0.2] [--gzip 0.5] [--workers 4]
+
+Sai com código 1 se o cliente novo não baixar todos os arquivos íntegros.
+"""
+import argparse
+import gzip
+import hashlib
+import random
+import tempfile
+import threading
+import time
+import requests
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from etl.http_client import HttpClient
+
+
+class FakeANS(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, files: int, size: int, falhas: float, gzip_fraction: float = 0.5, seed: int = 7):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        rnd = random.Random(seed)
+        self.files = {f"/files/{i}T2025.zip": rnd.randbytes(size) for i in range(files)}
+        # Corpo comprimido (tamanho na rede diferente do conteúdo) para uma parte dos arquivos
+        self.gzipped = {
+            path: gzip.compress(data[: size // 2] + bytes(size - size // 2))
+            for i, (path, data) in enumerate(self.files.items())
+            if i < round(files * gzip_fraction)
+        }
+        for path, body in self.gzipped.items():
+            self.files[path] = gzip.decompress(body)
+        self.falhas = falhas
+        self.rnd = rnd
+        self.lock = threading.Lock()
+        self.connections: set[tuple] = set()
+        self.requests = 0
+        self.injected: dict[str, int] = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def sorteia_falha(self) -> str | None:
+        with self.lock:
+            self.requests += 1
+            if self.rnd.random() >= self.falhas:
+                return None
+            falha = self.rnd.choice(["429", "503", "reset", "truncado"])
+            self.injected[falha] = self.injected.get(falha, 0) + 1
+            return falha
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeANS
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        with self.server.lock:
+            self.server.connections.add(self.client_address)
+
+        if self.path == "/index/":
+            links = "".join(f'<a href="{p.rsplit("/", 1)[1]}">x</a>' for p in self.server.files)
+            body = f"<html><body>{links}</body></html>".encode()
+        elif self.path in self.server.gzipped and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = self.server.gzipped[self.path]
+        elif self.path in self.server.files:
+            body = self.server.files[self.path]
+        else:
+            self.send_error(404)
+            return
+
+        falha = self.server.sorteia_falha()
+        if falha in ("429", "503"):
+            self.send_response(int(falha))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if falha == "reset":
+            self.close_connection = True
+            return
+
+        self.send_response(200)
+        if body is self.server.gzipped.get(self.path):
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if falha == "truncado":
+            self.wfile.write(body[: len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+def _before(urls: list[str], out_dir: Path, workers: int) -> tuple[int, float]:
+    def baixa(url: str) -> bool:
+        try:
+            r = requests.get(url, timeout=10)
+            r.raise_for_status()
+            (out_dir / url.rsplit("/", 1)[1]).write_bytes(r.content)
+            return True
+        except requests.RequestException:
+            return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        ok = sum(pool.map(baixa, urls))
+    return ok, time.perf_counter() - started
+
+
+def _after(client: HttpClient, urls: list[str], out_dir: Path, workers: int) -> tuple[int, float]:
+    def baixa(url: str) -> bool:
+        try:
+            client.download(url, out_dir / url.rsplit("/", 1)[1], timeout=10)
+            return True
+        except requests.RequestException:
+            return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        ok = sum(pool.map(baixa, urls))
+    return ok, time.perf_counter() - started
+
+
+def _run(nome: str, server: FakeANS, fn) -> int:
+    server.connections.clear()
+    server.requests = 0
+    server.injected = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        ok, elapsed = fn(out_dir)
+        integros = sum(
+            1 for path, data in server.files.items()
+            if (out_dir / path.rsplit("/", 1)[1]).exists()
+            and hashlib.sha256((out_dir / path.rsplit("/", 1)[1]).read_bytes()).digest() == hashlib.sha256(data).digest()
+        )
+
+    print(
+        f"{nome:<7} baixados: {ok}/{len(server.files)} ({len(server.gzipped)} com gzip) | íntegros: {integros} | {elapsed:.2f}s | "
+        f"requisições: {server.requests} | conexões TCP: {len(server.connections)} | falhas injetadas: {server.injected}"
+    )
+    return integros
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--falhas", type=float, default=0.2)
+    parser.add_argument("--gzip", type=float, default=0.5, help="Fração dos arquivos servida com gzip.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=50.0)
+    args = parser.parse_args()
+
+    server = FakeANS(args.files, args.size, args.falhas, args.gzip)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [server.url + p for p in server.files]
+
+    try:
+        _run("antes", server, lambda d: _before(urls, d, args.workers))
+
+        client = HttpClient(max_concurrency=args.workers, rate=args.rate, retries=8, backoff=0.05, max_backoff=1.0)
+        listed = client.get_text(server.url + "/index/")
+        assert all(p.rsplit("/", 1)[1] in listed for p in server.files)
+        integros = _run("depois", server, lambda d: _after(client, urls, d, args.workers))
+
+        for host, m in client.metrics().items():
+            print(f"métricas {host}: {m}")
+    finally:
+        server.shutdown()
+
+    if integros != args.files:
+        print("FALHA: o cliente não baixou todos os arquivos íntegros.")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark da serialização das respostas grandes da API.
+
+Compara, por 1000 linhas (as mesmas linhas dict_row nos dois casos):
+- antes: validação do response_model + serialize do FastAPI + JSONResponse (json da stdlib);
+- depois: FastJSONResponse (orjson, sem revalidar o schema).
+
+Uso:
+    python -m benchmarks.bench_serialization [--rows 1000] [--repeat 50] [--db]
+
+Com --db mede também a leitura das linhas do banco somada à serialização,
+usando as variáveis DB_* do .env.
+"""
+import argparse
+import asyncio
+import time
+
+from decimal import Decimal
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from api.main import app
+from api.responses import FastJSONResponse
+
+
+def _route_field(path: str):
+    return next(r for r in app.routes if getattr(r, "path", None) == path).response_field
+
+
+def _operadoras_rows(n: int) -> tuple[list[str], list[tuple]]:
+    cols = ["cnpj", "registro_ans", "razao_social", "modalidade", "uf", "situacao"]
+    rows = [
+        (f"{i:014d}", str(300000 + i), f"OPERADORA DE SAÚDE {i} S.A.", "Medicina de Grupo", "SP", "ATIVA")
+        for i in range(n)
+    ]
+    return cols, rows
+
+
+def _despesas_rows(n: int) -> tuple[list[str], list[tuple]]:
+    cols = ["cnpj", "razao_social", "total_despesas"]
+    rows = [(f"{i:014d}", f"OPERADORA {i}", Decimal(f"{i * 1234567}.89")) for i in range(n)]
+    return cols, rows
+
+
+def _before(field, payload) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=payload))
+    return JSONResponse(content).body
+
+
+def _after(payload) -> bytes:
+    return FastJSONResponse(payload).body
+
+
+def _timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _report(name: str, before: float, after: float, rows: int) -> None:
+    scale = 1000 / rows * 1000
+    print(
+        f"{name:<28} antes: {before * scale:8.2f} ms/1000 linhas | "
+        f"depois: {after * scale:8.2f} ms/1000 linhas | {before / after:5.1f}x"
+    )
+
+
+def bench_serialization(rows: int, repeat: int) -> None:
+    cols, data = _operadoras_rows(rows)
+    dict_rows = [dict(zip(cols, r)) for r in data]
+    field = _route_field("/api/operadoras")
+
+    before = _timeit(lambda: _before(field, {"data": dict_rows, "total": rows, "page": 1, "limit": rows}), repeat)
+    after = _timeit(lambda: _after({"data": dict_rows, "total": rows, "page": 1, "limit": rows}), repeat)
+    _report("/api/operadoras", before, after, rows)
+
+    cols, data = _despesas_rows(rows)
+    dict_rows = [dict(zip(cols, r)) for r in data]
+    field = _route_field("/api/estatisticas")
+    payload = {"total_despesas": 1.0, "media_despesas": 1.0, "despesas_por_uf_top5": []}
+
+    before = _timeit(lambda: _before(field, {**payload, "top_5_operadoras": dict_rows}), repeat)
+    # No caminho novo o banco já devolve float8, então não há Decimal para converter
+    float_rows = [dict(zip(cols, (c, r, float(v)))) for c, r, v in data]
+    after = _timeit(lambda: _after({**payload, "top_5_operadoras": float_rows}), repeat)
+    _report("/api/estatisticas (numeric)", before, after, rows)
+
+
+def bench_fetch(rows: int, repeat: int) -> None:
+    from dotenv import load_dotenv
+    from api.db import get_conn
+
+    load_dotenv()
+    sql = "SELECT cnpj, registro_ans, razao_social, modalidade, uf, situacao FROM operadoras LIMIT %(n)s"
+    field = _route_field("/api/operadoras")
+
+    with get_conn() as conn:
+        def fetch():
+            with conn.cursor() as cur:
+                cur.execute(sql, {"n": rows})
+                data = cur.fetchall()
+            return {"data": data, "total": len(data), "page": 1, "limit": max(len(data), 1)}
+
+        got = len(fetch()["data"])
+        before = _timeit(lambda: _before(field, fetch()), repeat)
+        after = _timeit(lambda: _after(fetch()), repeat)
+        _report(f"leitura + serialização ({got})", before, after, max(got, 1))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--db", action="store_true")
+    args = parser.parse_args()
+
+    bench_serialization(args.rows, args.repeat)
+    if args.db:
+        bench_fetch(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark da inicialização da API.
+
+1) Perfil de import (python -X importtime) de api.main: tempo total e os módulos
+   mais caros. Também falha se algum módulo do caminho do pipeline (etl, pandas,
+   bs4, requests) for carregado pelas rotas de leitura.
+2) Tempo até a API responder: sobe o uvicorn e mede até o primeiro 200 em "/",
+   com carga síncrona do snapshot (padrão) e com API_FAST_START=1.
+
+Uso:
+    python -m benchmarks.bench_startup [--repeat 5] [--top 15] [--max-import-ms 1500] [--sem-uvicorn]
+
+Sai com código 1 se o import passar de --max-import-ms ou carregar módulos proibidos.
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from pathlib import Path
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Módulos que só o job de atualização (/api/admin/atualizar) pode carregar
+PROIBIDOS = ("etl", "api.pipeline", "pandas", "bs4", "requests")
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def importtime_profile() -> list[tuple[str, int, int]]:
+    """(módulo, self_us, cumulativo_us) de cada módulo importado por api.main."""
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api.main"],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if p.returncode != 0:
+        raise RuntimeError(p.stderr[-2000:])
+
+    modulos = []
+    for line in p.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m:
+            modulos.append((m.group(4), int(m.group(1)), int(m.group(2))))
+    return modulos
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_response(env: dict[str, str], timeout: float = 30.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BASE_DIR,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"API não respondeu em {timeout:.0f}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-import-ms", type=float, default=1500.0)
+    parser.add_argument("--sem-uvicorn", action="store_true", help="Só o perfil de import.")
+    args = parser.parse_args()
+
+    perfis = [importtime_profile() for _ in range(args.repeat)]
+    total_ms = statistics.median(
+        next(cum for name, _, cum in p if name == "api.main") / 1000 for p in perfis
+    )
+
+    modulos = perfis[-1]
+    print(f"import api.main: {total_ms:.0f} ms (mediana de {args.repeat}) | {len(modulos)} módulos")
+    print(f"\n{'módulo':<40} {'próprio (ms)':>12} {'cumulativo (ms)':>16}")
+    for name, self_us, cum_us in sorted(modulos, key=lambda m: m[2], reverse=True)[: args.top]:
+        print(f"{name:<40} {self_us / 1000:12.1f} {cum_us / 1000:16.1f}")
+
+    carregados = sorted({
+        name for name, _, _ in modulos
+        if any(name == p or name.startswith(p + ".") for p in PROIBIDOS)
+    })
+
+    if not args.sem_uvicorn:
+        print()
+        for nome, env in [("snapshot síncrono", {"API_FAST_START": "0"}), ("API_FAST_START=1", {"API_FAST_START": "1"})]:
+            tempos = [time_to_first_response(env) for _ in range(args.repeat)]
+            print(f"primeira resposta ({nome}): {statistics.median(tempos) * 1000:.0f} ms (mediana de {args.repeat})")
+
+    falhas = []
+    if carregados:
+        falhas.append(f"módulos do pipeline carregados no import da API: {', '.join(carregados)}")
+    if total_ms > args.max_import_ms:
+        falhas.append(f"import de api.main acima do limite: {total_ms:.0f} ms > {args.max_import_ms:.0f} ms")
+
+    if falhas:
+        print("\nFALHA: " + "\n       ".join(falhas))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Verificação dos planos de execução das consultas da API (api/queries.py).
+
+Cria um banco descartável (<DB_NAME>_plancheck) no servidor do .env, aplica
+sql/01_ddl.sql, popula com dados sintéticos (--operadoras operadoras x
+--trimestres trimestres de despesas), roda atualizar_analytics() e VACUUM ANALYZE,
+e executa EXPLAIN (ANALYZE, BUFFERS) de cada constante Q_* de api/queries.py.
+
+Cada consulta falha se:
+- o plano tiver Seq Scan em tabela com mais de --min-linhas linhas (exceto as
+  tabelas listadas para a consulta em VARREDURA_ESPERADA, que ela precisa ler inteiras);
+- o custo estimado passar do limite dela em PLANOS.
+
+Consulta nova em api/queries.py sem entrada em PLANOS também falha. As buscas por
+substring (ILIKE '%q%') só têm índice com a extensão pg_trgm; sem ela no servidor,
+o Seq Scan dessas consultas é reportado como aviso.
+
+Uso:
+    python -m benchmarks.check_query_plans [--operadoras 20000] [--trimestres 12] [--manter] [--verbose]
+
+Sai com código 1 se alguma consulta violar as regras.
+"""
+import argparse
+import os
+import psycopg
+
+from pathlib import Path
+from psycopg import sql
+from api import queries
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DDL = BASE_DIR / "sql" / "01_ddl.sql"
+
+BUSCA = {"q_like": "%saude 1%", "situacao": "ATIVA", "limit": 20, "offset": 0}
+
+# Parâmetros de exemplo e custo máximo (unidades do planner) de cada consulta,
+# calibrados para o volume padrão (--operadoras 20000 --trimestres 12)
+PLANOS: dict[str, tuple[dict, float]] = {
+    "Q_OPERADORAS_COUNT_FILTER": (BUSCA, 1_000),
+    "Q_OPERADORAS_LIST_FILTER": (BUSCA, 1_000),
+    "Q_OPERADORAS_LIST_FILTER_TOTAL": (BUSCA, 1_000),
+    "Q_OPERADORAS_COUNT_ALL": ({}, 1_000),
+    "Q_OPERADORAS_LIST_ALL": (BUSCA, 50),
+    "Q_OPERADORA_DETAIL": ({"cnpj": "00000000001234"}, 50),
+    "Q_OPERADORA_DESPESAS": ({"cnpj": "00000000001234"}, 200),
+    "Q_ESTATS": ({}, 15_000),
+    "Q_TOP5": ({}, 15_000),
+    "Q_UF_TOP5": ({}, 15_000),
+    "Q_OPERADORAS_COUNT_FILTER_SITUACAO": (BUSCA, 1_000),
+    "Q_OPERADORAS_LIST_FILTER_SITUACAO": (BUSCA, 1_000),
+    "Q_OPERADORAS_LIST_FILTER_SITUACAO_TOTAL": (BUSCA, 1_000),
+    "Q_OPERADORAS_COUNT_ALL_SITUACAO": (BUSCA, 1_000),
+    "Q_OPERADORAS_LIST_ALL_SITUACAO": (BUSCA, 50),
+    "Q_ANALYTICS_JANELA": ({}, 50),
+    "Q_ANALYTICS_CRESCIMENTO": ({"limit": 5}, 50),
+    "Q_ANALYTICS_DESPESAS_UF": ({"limit": 5}, 50),
+    "Q_ANALYTICS_ACIMA_MEDIA_COUNT": ({"minimo": 2}, 1_000),
+    "Q_ANALYTICS_ACIMA_MEDIA_LIST": ({"minimo": 2, "limit": 10, "offset": 0}, 50),
+    "Q_VERSAO": ({}, 50),
+    "Q_SNAPSHOT_OPERADORAS": ({}, 1_000),
+    "Q_SNAPSHOT_DESPESAS": ({}, 15_000),
+}
+
+# Agregações sobre todas as despesas e a carga do snapshot: ler a tabela inteira é
+# o plano certo (um Index Only Scan de todas as linhas não sai mais barato que o Seq Scan)
+VARREDURA_ESPERADA: dict[str, tuple[str, ...]] = {
+    "Q_ESTATS": ("despesas_consolidadas",),
+    "Q_TOP5": ("despesas_consolidadas",),
+    "Q_UF_TOP5": ("despesas_consolidadas", "operadoras"),
+    "Q_SNAPSHOT_OPERADORAS": ("operadoras",),
+    "Q_SNAPSHOT_DESPESAS": ("despesas_consolidadas",),
+}
+
+# Dependem de índice trigram (pg_trgm) para não varrer operadoras
+BUSCA_TRIGRAM = {
+    "Q_OPERADORAS_COUNT_FILTER",
+    "Q_OPERADORAS_LIST_FILTER",
+    "Q_OPERADORAS_LIST_FILTER_TOTAL",
+    "Q_OPERADORAS_COUNT_FILTER_SITUACAO",
+    "Q_OPERADORAS_LIST_FILTER_SITUACAO",
+    "Q_OPERADORAS_LIST_FILTER_SITUACAO_TOTAL",
+}
+
+SEED_SQL = """
+INSERT INTO operadoras (cnpj, registro_ans, razao_social, modalidade, uf, situacao)
+SELECT
+  lpad(i::text, 14, '0'),
+  (300000 + i)::text,
+  (ARRAY['SAUDE', 'VIDA', 'ODONTO', 'MEDICINA', 'CLINICA'])[1 + i %% 5] || ' ' || i || ' LTDA',
+  (ARRAY['Medicina de Grupo', 'Cooperativa Médica', 'Odontologia de Grupo'])[1 + i %% 3],
+  (ARRAY['SP','RJ','MG','RS','PR','SC','BA','PE','CE','GO','DF','ES','PA','AM','MA',
+         'PB','RN','AL','SE','PI','MT','MS','RO','TO','AC','AP','RR'])[1 + i %% 27],
+  CASE WHEN i %% 5 = 0 THEN 'CANCELADA' ELSE 'ATIVA' END
+FROM generate_series(1, %(operadoras)s) AS i;
+
+SELECT criar_particao_despesas(2026 - (t / 4) - 1, t %% 4 + 1)
+FROM generate_series(0, %(trimestres)s - 1) AS t;
+
+INSERT INTO despesas_consolidadas (registro_ans, cnpj, razao_social, ano, trimestre, vl_saldo_final)
+SELECT o.registro_ans, o.cnpj, o.razao_social, 2026 - (t / 4) - 1, t %% 4 + 1, round((random() * 1e7)::numeric, 2)
+FROM operadoras o
+CROSS JOIN generate_series(0, %(trimestres)s - 1) AS t
+WHERE (hashtext(o.cnpj) + t) %% 10 <> 0;
+
+SELECT atualizar_analytics();
+"""
+
+
+def _connect(dbname: str) -> psycopg.Connection:
+    return psycopg.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT", "5432"),
+        dbname=dbname,
+        user=os.getenv("DB_USER", "intuitive"),
+        password=os.getenv("DB_PASSWORD", "intuitive123"),
+        autocommit=True,
+    )
+
+
+def _create_database(name: str, operadoras: int, trimestres: int) -> None:
+    with _connect(os.getenv("DB_NAME", "intuitivecare")) as admin:
+        admin.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+        admin.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+
+    with _connect(name) as conn:
+        conn.execute(DDL.read_text(encoding="utf-8"))
+        with conn.transaction():
+            for stmt in filter(str.strip, SEED_SQL.split(";\n")):
+                conn.execute(stmt, {"operadoras": operadoras, "trimestres": trimestres})
+        conn.execute("VACUUM ANALYZE")
+
+
+def _drop_database(name: str) -> None:
+    with _connect(os.getenv("DB_NAME", "intuitivecare")) as admin:
+        admin.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+
+
+def _walk(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def _seq_scans(plan: dict, reltuples: dict[str, float], min_linhas: int) -> list[str]:
+    return [
+        n["Relation Name"]
+        for n in _walk(plan)
+        if n["Node Type"] == "Seq Scan" and reltuples.get(n["Relation Name"], 0) > min_linhas
+    ]
+
+
+def check(conn: psycopg.Connection, min_linhas: int, verbose: bool) -> list[str]:
+    trigram = conn.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'").fetchone() is not None
+    reltuples = dict(conn.execute("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'").fetchall())
+
+    constantes = sorted(n for n, v in vars(queries).items() if n.startswith("Q_") and isinstance(v, str))
+    falhas = [f"{n}: sem parâmetros/limite em PLANOS" for n in constantes if n not in PLANOS]
+
+    print(f"{'consulta':<36} {'custo':>9} {'limite':>8} {'ms':>8} {'hit':>7} {'read':>6}  nós")
+    for nome in (n for n in constantes if n in PLANOS):
+        params, custo_max = PLANOS[nome]
+        query = getattr(queries, nome).strip().rstrip(";")
+        plan = conn.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", params).fetchone()[0][0]
+        root = plan["Plan"]
+
+        nos = sorted({n["Node Type"] for n in _walk(root) if "Scan" in n["Node Type"]})
+        print(
+            f"{nome:<36} {root['Total Cost']:>9.0f} {custo_max:>8.0f} {plan['Execution Time']:>8.2f} "
+            f"{root.get('Shared Hit Blocks', 0):>7} {root.get('Shared Read Blocks', 0):>6}  {', '.join(nos)}"
+        )
+        if verbose:
+            with conn.cursor() as cur:
+                cur.execute(f"EXPLAIN {query}", params)
+                print("\n".join("    " + r[0] for r in cur.fetchall()))
+
+        seq = [r for r in _seq_scans(root, reltuples, min_linhas) if not r.startswith(VARREDURA_ESPERADA.get(nome, ()))]
+        if seq:
+            if nome in BUSCA_TRIGRAM and not trigram:
+                print(f"    aviso: Seq Scan em {', '.join(seq)} (pg_trgm indisponível no servidor)")
+            else:
+                falhas.append(f"{nome}: Seq Scan em {', '.join(seq)}")
+        if root["Total Cost"] > custo_max:
+            falhas.append(f"{nome}: custo {root['Total Cost']:.0f} acima do limite {custo_max:.0f}")
+
+    return falhas
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--operadoras", type=int, default=20_000)
+    parser.add_argument("--trimestres", type=int, default=12)
+    parser.add_argument("--min-linhas", type=int, default=1_000, help="Seq Scan em tabelas menores é aceito.")
+    parser.add_argument("--manter", action="store_true", help="Não remove o banco ao final.")
+    parser.add_argument("--verbose", action="store_true", help="Imprime o plano de cada consulta.")
+    args = parser.parse_args()
+
+    name = f"{os.getenv('DB_NAME', 'intuitivecare')}_plancheck"
+    print(f"Criando {name}: {args.operadoras} operadoras x {args.trimestres} trimestres")
+    _create_database(name, args.operadoras, args.trimestres)
+
+    try:
+        with _connect(name) as conn:
+            falhas = check(conn, args.min_linhas, args.verbose)
+    finally:
+        if not args.manter:
+            _drop_database(name)
+
+    if falhas:
+        print("\nFALHA:")
+        print("\n".join(f"- {f}" for f in falhas))
+        raise SystemExit(1)
+    print("\nOK: todas as consultas dentro das regras.")
+
+
+if __name__ == "__main__":
+    main()
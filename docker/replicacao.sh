@@ -0,0 +1,5 @@
+#!/bin/bash
+# Roda uma vez, na criação do volume do primário: libera conexões de replicação
+# (pg_basebackup e streaming da réplica do perfil "replica" do docker-compose).
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
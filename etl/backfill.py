@@ -0,0 +1,208 @@
+import json
+import logging
+import multiprocessing
+import os
+import re
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from etl import binary_snapshot, cadastro, consolidate, db_import, download_ans, process_files, validate_and_aggregate
+from etl.download_operadoras import run as download_operadoras_run
+from etl.logging_config import setup_logging
+
+
+FINAL_DIR = Path("data/final")
+TRIMESTRES_DIR = FINAL_DIR / "trimestres"
+# ZIPs e extrações do backfill ficam fora de data/raw e data/extracted: o
+# process_files.run() do pipeline normal processa tudo o que estiver lá.
+RAW_DIR = Path("data/backfill/raw")
+EXTRACTED_DIR = Path("data/backfill/extracted")
+CHECKPOINT_FILE = Path("data/checkpoints/backfill.json")
+
+# Etapas de cada trimestre, na ordem em que são concluídas.
+ETAPAS = ["baixado", "processado", "agregado", "importado"]
+
+logger = setup_logging("backfill", "pipeline.log", logging.INFO)
+
+
+def parse_periodo(value: str) -> tuple[int, int]:
+    """Aceita '2025-3', '2025T3' ou '3T2025' e devolve (ano, trimestre)."""
+    value = value.strip().upper()
+    m = re.fullmatch(r"(\d{4})[-/T](\d)", value) or re.fullmatch(r"(\d)T(\d{4})", value)
+    if not m:
+        raise ValueError(f"Período inválido: {value!r} (use AAAA-T, ex.: 2025-3)")
+    a, b = m.groups()
+    ano, trimestre = (int(a), int(b)) if len(a) == 4 else (int(b), int(a))
+    if not 1 <= trimestre <= 4:
+        raise ValueError(f"Trimestre inválido: {value!r}")
+    return ano, trimestre
+
+
+def _key(periodo: tuple[int, int]) -> str:
+    return f"{periodo[0]}-{periodo[1]}"
+
+
+def _load_checkpoint() -> dict:
+    if CHECKPOINT_FILE.exists():
+        return json.loads(CHECKPOINT_FILE.read_text(encoding="utf-8"))
+    return {"trimestres": {}}
+
+
+def _save_checkpoint(state: dict) -> None:
+    # Grava num arquivo temporário e renomeia: uma interrupção no meio da
+    # escrita nunca deixa o checkpoint corrompido.
+    CHECKPOINT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CHECKPOINT_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, CHECKPOINT_FILE)
+
+
+def _done(state: dict, periodo: tuple[int, int], etapa: str) -> bool:
+    atual = state["trimestres"].get(_key(periodo), {}).get("etapa")
+    return atual is not None and ETAPAS.index(atual) >= ETAPAS.index(etapa)
+
+
+def _mark(state: dict, periodo: tuple[int, int], etapa: str, **info) -> None:
+    entry = state["trimestres"].setdefault(_key(periodo), {})
+    entry.update(info)
+    entry["etapa"] = etapa
+    _save_checkpoint(state)
+
+
+def _consolidated_path(periodo: tuple[int, int]) -> Path:
+    return TRIMESTRES_DIR / f"despesas_consolidadas_{periodo[0]}T{periodo[1]}.csv"
+
+
+def _process_quarter(zip_path: str, periodo: tuple[int, int]) -> str:
+    # Roda num processo separado (pandas é CPU-bound): só recebe/devolve tipos simples.
+    ano, trimestre = periodo
+    despesas = process_files.run_zip(
+        Path(zip_path), TRIMESTRES_DIR / f"despesas_por_operadora_{ano}T{trimestre}.csv", EXTRACTED_DIR
+    )
+    return str(consolidate.run(despesas, out_csv=_consolidated_path(periodo)))
+
+
+def _import_quarter(periodo: tuple[int, int], csv_path: Path) -> None:
+    arquivo = db_import.copy_to_shared(csv_path, csv_path.name)
+    db_import.run_psql(
+        db_import.SQL_DIR / "04_import_trimestre.sql",
+        {"arquivo": arquivo, "ano": periodo[0], "trimestre": periodo[1]},
+    )
+
+
+def _import_operadoras() -> None:
+    """Carrega o cadastro antes dos trimestres: sem ele o 04_import_trimestre.sql cria todas como DESCONHECIDA."""
+    csv_path = cadastro.CADASTRO_CSV
+    db_import.run_psql(
+        db_import.SQL_DIR / "06_import_operadoras.sql",
+        {"arquivo": db_import.copy_to_shared(csv_path, csv_path.name)},
+    )
+
+
+def _reaggregate_if_cadastro_changed(state: dict) -> None:
+    """
+    O estado das agregações guarda os grupos com a UF do cadastro em que foi gerado.
+    Se o cadastro mudou, os trimestres já agregados são reagregados (o primeiro
+    descarta o estado antigo) antes de seguir com os pendentes.
+    """
+    agregados = sorted(
+        (tuple(map(int, k.split("-"))), Path(v["csv"]))
+        for k, v in state["trimestres"].items()
+        if _done(state, tuple(map(int, k.split("-"))), "agregado")
+    )
+    if not agregados or validate_and_aggregate.state_matches_cadastro():
+        return
+
+    logger.warning(f"Cadastro de operadoras mudou: reagregando {len(agregados)} trimestres.")
+    for _, csv_path in agregados:
+        validate_and_aggregate.run(csv_path, partial_input=True)
+
+
+def _rebuild_final(periodos: list[tuple[int, int]]) -> Path:
+    frames = [pd.read_csv(_consolidated_path(p), sep=";", dtype=str) for p in periodos]
+    out = FINAL_DIR / "despesas_consolidadas_final.csv"
+    pd.concat(frames, ignore_index=True).to_csv(out, index=False, sep=";")
+    logger.info(f"Consolidado histórico gerado: {out} | Trimestres: {len(periodos)}")
+    return out
+
+
+def run(
+    inicio: tuple[int, int],
+    fim: tuple[int, int],
+    batch_size: int = 4,
+    max_workers: int = 4,
+    import_db: bool = True,
+) -> list[tuple[int, int]]:
+    """
+    Backfill histórico entre inicio e fim (ano, trimestre), em lotes de batch_size trimestres.
+
+    Em cada lote os downloads rodam em threads e o processamento em processos
+    paralelos; as agregações e o import são incrementais por trimestre. O progresso fica em
+    CHECKPOINT_FILE, então uma execução interrompida retoma de onde parou.
+    """
+    if inicio > fim:
+        raise ValueError("Período inicial maior que o final.")
+
+    logger.info(f"Iniciando backfill de {_key(inicio)} até {_key(fim)}.")
+    state = _load_checkpoint()
+
+    download_operadoras_run()
+    cadastro.run()
+
+    _reaggregate_if_cadastro_changed(state)
+
+    targets = download_ans.discover_zips_in_range(inicio, fim)
+    if not targets:
+        raise RuntimeError("Nenhum ZIP encontrado no intervalo informado.")
+
+    pendentes = [t for t in targets if not _done(state, t[0], "importado" if import_db else "agregado")]
+    logger.info(f"Trimestres no intervalo: {len(targets)} | Pendentes: {len(pendentes)}")
+
+    if import_db:
+        db_import.apply_ddl()
+        _import_operadoras()
+
+    for i in range(0, len(pendentes), batch_size):
+        lote = pendentes[i:i + batch_size]
+        logger.info(f"Lote {i // batch_size + 1}: {', '.join(_key(p) for p, _, _ in lote)}")
+
+        a_baixar = [t for t in lote if not _done(state, t[0], "baixado")]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(download_ans.download_zip, url, name, RAW_DIR): periodo for periodo, url, name in a_baixar}
+            for fut in as_completed(futures):
+                _mark(state, futures[fut], "baixado", zip=str(fut.result()))
+
+        a_processar = [p for p, _, _ in lote if not _done(state, p, "processado")]
+        # spawn pelo mesmo motivo do scheduler: o processo já tem threads e o cliente HTTP
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {
+                pool.submit(_process_quarter, state["trimestres"][_key(p)]["zip"], p): p
+                for p in a_processar
+            }
+            for fut in as_completed(futures):
+                _mark(state, futures[fut], "processado", csv=fut.result())
+
+        # Sequencial: as agregações incrementais compartilham o mesmo estado e
+        # cada import de trimestre é uma transação própria no banco.
+        for periodo, _, _ in lote:
+            csv_path = Path(state["trimestres"][_key(periodo)]["csv"])
+            if not _done(state, periodo, "agregado"):
+                validate_and_aggregate.run(csv_path, partial_input=True)
+                _mark(state, periodo, "agregado")
+            if import_db and not _done(state, periodo, "importado"):
+                _import_quarter(periodo, csv_path)
+                _mark(state, periodo, "importado")
+
+    _rebuild_final([p for p, _, _ in targets])
+    binary_snapshot.run()
+
+    if import_db:
+        parciais = validate_and_aggregate.PARCIAIS_CSV
+        db_import.run_psql(
+            db_import.SQL_DIR / "05_import_agregadas.sql",
+            {"arquivo": db_import.copy_to_shared(parciais, parciais.name)},
+        )
+
+    logger.info("Backfill finalizado com sucesso.")
+    return [p for p, _, _ in targets]
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+
+from datetime import datetime, timezone
+from pathlib import Path
+from etl.br_numbers import parse_br_number
+from etl.logging_config import setup_logging
+from etl.snapshot_reader import FORMAT_VERSION, MAGIC, PREFIX, SNAPSHOT_PATH, aligned
+
+
+DATA_FINAL = Path("data/final")
+CONSOLIDADO_CSV = DATA_FINAL / "despesas_consolidadas_final.csv"
+AGREGADO_CSV = DATA_FINAL / "despesas_agregadas.csv"
+
+logger = setup_logging("binary_snapshot", "pipeline.log", logging.INFO)
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _int_column(values: pd.Series, dtype: str) -> np.ndarray:
+    """Inteiros com -1 onde o valor falta ou não é numérico."""
+    return pd.to_numeric(values, errors="coerce").fillna(-1).astype(dtype).to_numpy()
+
+
+def _cnpj_column(values: pd.Series) -> np.ndarray:
+    """
+    CNPJ como texto ASCII de largura fixa (S14), vazio quando falta. Completa com
+    zeros à esquerda os que chegaram com menos de 14 dígitos (CNPJ lido como número
+    em algum ponto do caminho).
+    """
+    digitos = values.str.replace(r"[^0-9]", "", regex=True)
+    digitos = digitos.where(digitos == "", digitos.str.zfill(14))
+    return digitos.to_numpy().astype("S14")
+
+
+def _dictionary(values: pd.Series) -> tuple[list[str], dict[str, int]]:
+    strings = sorted(set(values))
+    return strings, {s: i for i, s in enumerate(strings)}
+
+
+def _encode_strings(strings: list[str]) -> tuple[np.ndarray, bytes]:
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def _read_tables(consolidado: Path, agregado: Path) -> tuple[pd.DataFrame, pd.DataFrame]:
+    despesas = pd.read_csv(consolidado, sep=";", dtype=str, keep_default_na=False)
+    despesas.columns = [str(c).strip().upper() for c in despesas.columns]
+
+    agregadas = pd.read_csv(agregado, sep=";", dtype={"RAZAO_SOCIAL": str, "UF": str}, keep_default_na=False, na_values=[""])
+    agregadas.columns = [str(c).strip().upper() for c in agregadas.columns]
+    agregadas[["RAZAO_SOCIAL", "UF"]] = agregadas[["RAZAO_SOCIAL", "UF"]].fillna("")
+
+    return despesas, agregadas
+
+
+def run(
+    consolidado: Path = CONSOLIDADO_CSV,
+    agregado: Path = AGREGADO_CSV,
+    out_path: Path = SNAPSHOT_PATH,
+) -> Path:
+    """Grava o snapshot binário (ver etl/snapshot_reader.py) a partir dos CSVs finais."""
+    logger.info("Gerando snapshot binário de despesas.")
+
+    for path in (consolidado, agregado):
+        if not path.exists():
+            raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+
+    despesas, agregadas = _read_tables(consolidado, agregado)
+
+    razoes, razao_code = _dictionary(pd.concat([despesas["RAZAO_SOCIAL"].str.strip(), agregadas["RAZAO_SOCIAL"]]))
+    ufs, uf_code = _dictionary(agregadas["UF"])
+
+    tabelas = {
+        "despesas": {
+            "registro_ans": _int_column(despesas["REGISTROANS"], "<i4"),
+            "cnpj": _cnpj_column(despesas["CNPJ"]),
+            "ano": _int_column(despesas["ANO"], "<i2"),
+            "trimestre": _int_column(despesas["TRIMESTRE"], "<i1"),
+            "vl_saldo_final": parse_br_number(despesas["VL_SALDO_FINAL"]).to_numpy("<f8"),
+            "razao_social": despesas["RAZAO_SOCIAL"].str.strip().map(razao_code).to_numpy("<u4"),
+        },
+        "agregadas": {
+            "razao_social": agregadas["RAZAO_SOCIAL"].map(razao_code).to_numpy("<u4"),
+            "uf": agregadas["UF"].map(uf_code).to_numpy("<u4"),
+            "total_despesas": agregadas["TOTAL_DESPESAS"].to_numpy("<f8"),
+            "media_trimestral": agregadas["MEDIA_TRIMESTRAL"].to_numpy("<f8"),
+            "desvio_padrao": agregadas["DESVIO_PADRAO"].to_numpy("<f8"),
+        },
+    }
+
+    # Layout da seção de dados: um bloco alinhado por coluna e por parte de dicionário
+    blocos: list[bytes] = []
+    pos = 0
+
+    def add(data: bytes) -> int:
+        nonlocal pos
+        inicio = pos
+        blocos.append(data + b"\0" * (aligned(len(data)) - len(data)))
+        pos += aligned(len(data))
+        return inicio
+
+    header = {
+        "versao_formato": FORMAT_VERSION,
+        "gerado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "fontes": {p.name: {"sha256": _sha256(p)} for p in (consolidado, agregado)},
+        "tabelas": {},
+        "dicionarios": {},
+    }
+    # Identifica o conteúdo: muda sempre que algum CSV de origem muda
+    header["versao_dados"] = hashlib.sha256(
+        "".join(f["sha256"] for f in header["fontes"].values()).encode()
+    ).hexdigest()[:16]
+
+    for nome, colunas in tabelas.items():
+        linhas = len(next(iter(colunas.values())))
+        header["tabelas"][nome] = {
+            "linhas": linhas,
+            "colunas": {c: {"dtype": a.dtype.str, "offset": add(a.tobytes())} for c, a in colunas.items()},
+        }
+
+    for nome, strings in (("razao_social", razoes), ("uf", ufs)):
+        offsets, blob = _encode_strings(strings)
+        header["dicionarios"][nome] = {
+            "tamanho": len(strings),
+            "offsets": add(offsets.tobytes()),
+            "dados": add(blob),
+            "bytes": len(blob),
+        }
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    prefixo = PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)) + header_bytes
+    prefixo += b"\0" * (aligned(len(prefixo)) - len(prefixo))
+
+    # Troca atômica: leitores com o arquivo antigo mapeado continuam com o inode antigo
+    tmp = out_path.with_suffix(out_path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(prefixo)
+        for bloco in blocos:
+            f.write(bloco)
+    os.replace(tmp, out_path)
+
+    logger.info(
+        f"Snapshot binário salvo em: {out_path} | versão {header['versao_dados']} | "
+        f"{len(despesas)} despesas | {len(agregadas)} agregadas | {out_path.stat().st_size / 1e6:.1f} MB"
+    )
+    return out_path
+
+
+if __name__ == "__main__":
+    run()
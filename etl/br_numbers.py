@@ -0,0 +1,55 @@
+"""
+Conversão de valores numéricos vindos dos CSVs da ANS e do pipeline.
+
+Aceita, na mesma coluna, dois formatos:
+- decimal simples, como o pandas grava ("1257109617.35", "-3", ".5", "1e-05");
+- formato brasileiro, como a ANS publica ("1234567,89", "1.234.567,89", "1.234.567", ",5").
+
+Sem vírgula, um único ponto é separador decimal; vários pontos são separadores de
+milhar. Cada formato é uma regex ancorada; as mesmas regex e o mesmo limite estão
+na função numero_br() (sql/01_ddl.sql).
+"""
+import numpy as np
+import pandas as pd
+
+
+DECIMAL_SIMPLES_RE = r"[+-]?([0-9]+(\.[0-9]*)?|\.[0-9]+)([eE][+-]?[0-9]{1,3})?"
+FORMATO_BR_RE = r"[+-]?([0-9]+(,[0-9]*)?|,[0-9]+|[0-9]{1,3}(\.[0-9]{3})+(,[0-9]*)?)"
+
+# Valores gravados em DECIMAL(22,2): de 1e20 em diante o CAST falharia no import
+LIMITE = 1e20
+
+_ESPACOS = " \t\r\n"
+
+
+def parse_br_number(values, errors: str = "coerce") -> pd.Series:
+    """
+    Converte values (Series ou sequência de textos/números) em float64.
+
+    Vazios, textos fora dos dois formatos e valores fora de LIMITE viram NaN. Com
+    errors="raise", um valor preenchido que não pôde ser convertido gera ValueError.
+    """
+    if errors not in ("coerce", "raise"):
+        raise ValueError(f"errors deve ser 'coerce' ou 'raise', não {errors!r}")
+
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    texto = series.astype("string").str.strip(_ESPACOS)
+
+    simples = texto.str.fullmatch(DECIMAL_SIMPLES_RE).fillna(False).astype(bool)
+    br = pd.Series(False, index=texto.index)
+    br[~simples] = texto[~simples].str.fullmatch(FORMATO_BR_RE).fillna(False).astype(bool)
+
+    normalizado = texto.where(~br, texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    valido = (simples | br).to_numpy()
+    result = np.full(len(texto), np.nan)
+    # astype usa a conversão do Python (arredondamento correto); pd.to_numeric não
+    result[valido] = normalizado[valido].astype(np.float64).to_numpy()
+    result[~(np.abs(result) < LIMITE)] = np.nan
+
+    if errors == "raise":
+        invalido = (texto.fillna("") != "").to_numpy() & np.isnan(result)
+        if invalido.any():
+            exemplo = texto[invalido].iloc[0]
+            raise ValueError(f"Valor numérico inválido: {exemplo!r} ({int(invalido.sum())} no total)")
+
+    return pd.Series(result, index=series.index, name=series.name)
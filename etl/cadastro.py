@@ -0,0 +1,102 @@
+import logging
+import pandas as pd
+
+from pathlib import Path
+from etl.logging_config import setup_logging
+
+
+RAW_DIR = Path("data/raw")
+DATA_FINAL = Path("data/final")
+DATA_FINAL.mkdir(parents=True, exist_ok=True)
+
+# Cadastro já limpo, com schema fixo, carregado pelo 02_import.sql via COPY (FORMAT csv).
+CADASTRO_CSV = DATA_FINAL / "operadoras_cadastro.csv"
+
+FONTES = [
+    ("Relatorio_cadop.csv", "ATIVA"),
+    ("Relatorio_cadop_canceladas.csv", "CANCELADA"),
+]
+
+COLUNAS = ["registro_ans", "cnpj", "razao_social", "modalidade", "uf", "situacao"]
+
+COL_MAP = {
+    "REGISTRO_OPERADORA": "registro_ans",
+    "REGISTRO_ANS": "registro_ans",
+    "CNPJ": "cnpj",
+    "RAZAO_SOCIAL": "razao_social",
+    "MODALIDADE": "modalidade",
+    "UF": "uf",
+}
+
+logger = setup_logging("cadastro", "pipeline.log", logging.INFO)
+
+
+def _read_cadop(path: Path) -> pd.DataFrame:
+    """Lê só as colunas usadas, pelo nome do cabeçalho (campos entre aspas podem conter ';')."""
+    kwargs = dict(
+        sep=";",
+        quotechar='"',
+        dtype=str,
+        keep_default_na=False,
+        usecols=lambda c: str(c).strip().upper() in COL_MAP,
+    )
+    try:
+        df = pd.read_csv(path, encoding="utf-8", **kwargs)
+    except UnicodeDecodeError:
+        logger.warning(f"{path.name} não está em UTF-8, lendo como LATIN1.")
+        df = pd.read_csv(path, encoding="latin1", **kwargs)
+
+    df.columns = [COL_MAP[str(c).strip().upper()] for c in df.columns]
+    missing = [c for c in ("registro_ans", "cnpj", "razao_social") if c not in df.columns]
+    if missing:
+        raise KeyError(f"Colunas ausentes no cadastro {path.name}: {missing}")
+
+    return df.loc[:, ~df.columns.duplicated()]
+
+
+def _clean(df: pd.DataFrame, situacao: str) -> pd.DataFrame:
+    out = pd.DataFrame(index=df.index)
+    out["registro_ans"] = df["registro_ans"].str.strip()
+    out["cnpj"] = df["cnpj"].str.replace(r"\D", "", regex=True)
+    out["razao_social"] = df["razao_social"].str.strip()
+    out["modalidade"] = df["modalidade"].str.strip() if "modalidade" in df.columns else ""
+
+    if "uf" in df.columns:
+        uf = df["uf"].str.replace(r"[^A-Za-z]", "", regex=True).str[:2].str.upper()
+        out["uf"] = uf.where(uf.str.fullmatch(r"[A-Z]{2}"), "")
+    else:
+        out["uf"] = ""
+
+    out["situacao"] = situacao
+
+    valido = (out["cnpj"].str.len() == 14) & (out["razao_social"] != "")
+    return out[valido]
+
+
+def run(out_csv: Path = CADASTRO_CSV) -> Path:
+    logger.info("Preparando cadastro de operadoras para importação.")
+
+    partes = []
+    for nome, situacao in FONTES:
+        path = RAW_DIR / nome
+        if not path.exists():
+            logger.warning(f"Cadastro não encontrado, ignorando: {path}")
+            continue
+
+        bruto = _read_cadop(path)
+        limpo = _clean(bruto, situacao)
+        logger.info(f"{nome}: {len(bruto)} linhas lidas | {len(limpo)} válidas ({situacao})")
+        partes.append(limpo)
+
+    if not partes:
+        raise FileNotFoundError("Nenhum cadastro encontrado em data/raw (Relatorio_cadop*.csv).")
+
+    cadastro = pd.concat(partes, ignore_index=True)[COLUNAS]
+    cadastro.to_csv(out_csv, index=False, sep=";", encoding="utf-8")
+
+    logger.info(f"Cadastro salvo em: {out_csv} ({len(cadastro)} linhas)")
+    return out_csv
+
+
+if __name__ == "__main__":
+    run()
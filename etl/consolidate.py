@@ -34,7 +34,7 @@ def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
         df = df.rename(columns=cols)
     return df
 
-def run(despesas_path: Path | None = None) -> Path:
+def run(despesas_path: Path | None = None, out_csv: Path | None = None) -> Path:
     logger.info("Iniciando consolidação final com dados cadastrais.")
 
     if despesas_path is None:
@@ -100,6 +100,13 @@ def run(despesas_path: Path | None = None) -> Path:
     if "CNPJ" not in merged.columns and "CNPJ_cad" in merged.columns:
         merged["CNPJ"] = merged["CNPJ_cad"]
 
+    if out_csv is not None:
+        # Saída avulsa (ex.: um trimestre do backfill): sem o ZIP do teste.
+        out_csv.parent.mkdir(parents=True, exist_ok=True)
+        merged.to_csv(out_csv, index=False, sep=";")
+        logger.info(f"Arquivo gerado: {out_csv}")
+        return out_csv
+
     out_csv = FINAL_DIR / "despesas_consolidadas_final.csv"
     merged.to_csv(out_csv, index=False, sep=";")
     logger.info(f"Arquivo final gerado: {out_csv}")
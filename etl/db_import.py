@@ -0,0 +1,62 @@
+import logging
+import os
+import shutil
+import subprocess
+
+from pathlib import Path
+from etl.logging_config import setup_logging
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SQL_DIR = BASE_DIR / "sql"
+
+logger = setup_logging("db_import", "pipeline.log", logging.INFO)
+
+
+def shared_dir() -> Path:
+    d = Path(os.getenv("SHARED_DIR", str(BASE_DIR / "shared")))
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def copy_to_shared(src: Path, dst_name: str) -> str:
+    """Copia o arquivo para o volume compartilhado e devolve o caminho visto pelo PostgreSQL."""
+    if not src.exists():
+        raise RuntimeError(f"Arquivo não encontrado: {src}")
+    shutil.copyfile(src, shared_dir() / dst_name)
+    return f"{os.getenv('DB_SHARED_DIR', '/shared')}/{dst_name}"
+
+
+def run_psql(sql_file: Path, variables: dict[str, object] | None = None) -> str:
+    """Executa um script SQL via psql no banco principal; variables viram `-v nome=valor`."""
+    env = os.environ.copy()
+    env["PGPASSWORD"] = os.getenv("DB_PASSWORD", "intuitive123")
+
+    cmd = [
+        "psql",
+        "-h", os.getenv("DB_HOST", "db"),
+        "-p", str(os.getenv("DB_PORT", "5432")),
+        "-U", os.getenv("DB_USER", "intuitive"),
+        "-d", os.getenv("DB_NAME", "intuitivecare"),
+        "-v", "ON_ERROR_STOP=1",
+    ]
+    for name, value in (variables or {}).items():
+        cmd += ["-v", f"{name}={value}"]
+    cmd += ["-f", str(sql_file)]
+
+    logger.info(f"Executando {sql_file.name} {variables or ''}".rstrip())
+    p = subprocess.run(cmd, cwd=BASE_DIR, env=env, capture_output=True, text=True)
+
+    if p.returncode != 0:
+        raise RuntimeError(p.stderr or p.stdout or "Falha ao importar no banco")
+
+    return p.stdout + "\n" + p.stderr
+
+
+def apply_ddl() -> str:
+    """
+    Reaplica sql/01_ddl.sql (idempotente) antes de um import. Os scripts de import
+    usam tabelas e funções do DDL, e o docker-compose só roda o 01_ddl.sql na
+    criação do volume; assim bases já existentes são migradas.
+    """
+    return run_psql(SQL_DIR / "01_ddl.sql")
@@ -1,8 +1,8 @@
 import logging
 import re
-import requests
 
 from bs4 import BeautifulSoup
+from etl.http_client import get_client
 from etl.logging_config import setup_logging
 from pathlib import Path
 from urllib.parse import urljoin
@@ -17,9 +17,7 @@ logger = setup_logging("download_ans", "pipeline.log", logging.INFO)
 
 
 def _list_links(url: str) -> list[str]:
-    r = requests.get(url, timeout=60)
-    r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
+    soup = BeautifulSoup(get_client().get_text(url), "html.parser")
     links = []
     for a in soup.find_all("a"):
         href = a.get("href", "")
@@ -64,13 +62,44 @@ def _pick_last_n_zips(n: int) -> list[tuple[str, str]]:
     return picked
 
 
-def _download_file(url: str, out_path: Path) -> None:
-    r = requests.get(url, stream=True, timeout=120)
-    r.raise_for_status()
-    with open(out_path, "wb") as f:
-        for chunk in r.iter_content(chunk_size=1024 * 1024):
-            if chunk:
-                f.write(chunk)
+def periodo_do_nome(filename: str) -> tuple[int, int] | None:
+    m = re.search(r"(\d)T(\d{4})", filename)
+    if not m:
+        return None
+    return int(m.group(2)), int(m.group(1))
+
+
+def discover_zips_in_range(
+    inicio: tuple[int, int], fim: tuple[int, int]
+) -> list[tuple[tuple[int, int], str, str]]:
+    """Lista (periodo, url, arquivo) dos ZIPs trimestrais entre inicio e fim (ano, trimestre), em ordem crescente."""
+    found: dict[tuple[int, int], tuple[str, str]] = {}
+
+    for y in _discover_year_dirs():
+        if not inicio[0] <= int(y) <= fim[0]:
+            continue
+        for url, filename in _discover_zip_links_for_year(y):
+            periodo = periodo_do_nome(filename)
+            if periodo is None or not inicio <= periodo <= fim:
+                continue
+            found.setdefault(periodo, (url, filename))
+
+    return [(periodo, url, filename) for periodo, (url, filename) in sorted(found.items())]
+
+
+def download_zip(url: str, filename: str, out_dir: Path = RAW_DIR) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / filename
+    if out_path.exists():
+        logger.info(f"ZIP já existe, pulando: {filename}")
+        return out_path
+
+    logger.info(f"Baixando: {filename}")
+    # Baixa para um .part e renomeia no final: um download interrompido
+    # não deixa um ZIP truncado que seria "pulado" na próxima execução.
+    get_client().download(url, out_path)
+    logger.info(f"Salvo em: {out_path}")
+    return out_path
 
 
 def run(last_n_quarters: int = 3) -> list[Path]:
@@ -83,17 +112,9 @@ def run(last_n_quarters: int = 3) -> list[Path]:
     downloaded: list[Path] = []
 
     for url, filename in targets:
-        out_path = RAW_DIR / filename
-        if out_path.exists():
-            logger.info(f"ZIP já existe, pulando: {filename}")
-            downloaded.append(out_path)
-            continue
-
-        logger.info(f"Baixando: {filename}")
-        _download_file(url, out_path)
-        logger.info(f"Salvo em: {out_path}")
-        downloaded.append(out_path)
+        downloaded.append(download_zip(url, filename))
 
+    get_client().log_metrics()
     return downloaded
 
 
@@ -1,8 +1,8 @@
 import logging
-import requests
 
 from pathlib import Path
 from bs4 import BeautifulSoup
+from etl.http_client import get_client
 from etl.logging_config import setup_logging
 
 
@@ -15,16 +15,12 @@ CANCELADAS_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de
 logger = setup_logging("download_operadoras", "pipeline.log", logging.INFO)
 
 def _download_text_file(url: str, out_path: Path) -> Path:
-    r = requests.get(url, timeout=60)
-    r.raise_for_status()
-    out_path.write_bytes(r.content)
+    get_client().download(url, out_path, timeout=60)
     logger.info(f"Salvo em: {out_path}")
     return out_path
 
 def _find_latest_link(base_url: str, allowed_ext: tuple[str, ...]) -> str:
-    r = requests.get(base_url, timeout=60)
-    r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
+    soup = BeautifulSoup(get_client().get_text(base_url), "html.parser")
 
     links = []
     for a in soup.find_all("a"):
@@ -63,6 +59,7 @@ def run() -> dict[str, Path]:
         logger.info(f"Baixando: {Path(canceladas_link).name}")
         _download_text_file(canceladas_link, canceladas_out)
 
+    get_client().log_metrics()
     return {"ativas": ativas_out, "canceladas": canceladas_out}
 
 if __name__ == "__main__":
@@ -0,0 +1,237 @@
+import logging
+import os
+import random
+import threading
+import time
+import requests
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError
+from etl.logging_config import setup_logging
+
+
+# Status que valem nova tentativa: limite de taxa e falhas transitórias do servidor
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+logger = setup_logging("http_client", "pipeline.log", logging.INFO)
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+@dataclass
+class HostMetrics:
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    status: dict[int, int] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        mb_s = self.bytes / self.seconds / 1e6 if self.seconds else 0.0
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 3),
+            "mb_por_s": round(mb_s, 2),
+            "status": dict(sorted(self.status.items())),
+        }
+
+
+class _HostLimiter:
+    """
+    Espaça as requisições de um host em 1/rate segundos. Ao receber 429 a taxa cai
+    pela metade; cada sucesso devolve uma fração até o limite configurado (AIMD).
+    """
+
+    def __init__(self, rate: float):
+        self.max_rate = rate
+        self.rate = rate
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if self.max_rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + 1.0 / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+    def throttled(self) -> None:
+        with self._lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def succeeded(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+class HttpClient:
+    """
+    Cliente HTTP compartilhado pelos downloads da ANS: uma Session (keep-alive e pool
+    de conexões), no máximo max_concurrency requisições simultâneas, rate requisições
+    por segundo por host e novas tentativas com backoff exponencial com jitter em
+    429/5xx e erros de conexão.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        rate: float = 5.0,
+        retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        timeout: float = 60.0,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.rate = rate
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._limiters: dict[str, _HostLimiter] = {}
+        self._metrics: dict[str, HostMetrics] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host: str) -> tuple[_HostLimiter, HostMetrics]:
+        with self._lock:
+            if host not in self._limiters:
+                self._limiters[host] = _HostLimiter(self.rate)
+                self._metrics[host] = HostMetrics()
+            return self._limiters[host], self._metrics[host]
+
+    def _delay(self, attempt: int, response: requests.Response | None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(self.max_backoff, float(retry_after))
+        return min(self.max_backoff, self.backoff * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+    def _request(self, url: str, handle, timeout: float | None):
+        """Executa handle(response) com limite de taxa, concorrência e novas tentativas."""
+        limiter, metrics = self._host(urlsplit(url).netloc)
+
+        for attempt in range(self.retries + 1):
+            limiter.wait()
+            response = None
+            started = time.perf_counter()
+            try:
+                with self._slots:
+                    response = self.session.get(url, stream=True, timeout=timeout or self.timeout)
+                    with self._lock:
+                        metrics.requests += 1
+                        metrics.status[response.status_code] = metrics.status.get(response.status_code, 0) + 1
+
+                    if response.status_code in RETRY_STATUS and attempt < self.retries:
+                        response.close()
+                        raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+
+                    response.raise_for_status()
+                    result, size = handle(response)
+
+                with self._lock:
+                    metrics.bytes += size
+                    metrics.seconds += time.perf_counter() - started
+                limiter.succeeded()
+                return result
+
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError, ChunkedEncodingError) as e:
+                status = e.response.status_code if getattr(e, "response", None) is not None else None
+                retryable = status is None or status in RETRY_STATUS
+                if status == 429:
+                    limiter.throttled()
+
+                if not retryable or attempt >= self.retries:
+                    with self._lock:
+                        metrics.failures += 1
+                    raise
+
+                delay = self._delay(attempt, getattr(e, "response", None))
+                with self._lock:
+                    metrics.retries += 1
+                logger.warning(
+                    f"Falha em {url} (tentativa {attempt + 1}/{self.retries + 1}): {e} "
+                    f"| nova tentativa em {delay:.1f}s"
+                )
+                time.sleep(delay)
+            finally:
+                if response is not None:
+                    response.close()
+
+    def get_text(self, url: str, timeout: float | None = None) -> str:
+        def handle(r: requests.Response) -> tuple[str, int]:
+            return r.text, len(r.content)
+
+        return self._request(url, handle, timeout)
+
+    def download(self, url: str, out_path: Path, timeout: float | None = 120.0) -> int:
+        """
+        Baixa url em streaming para um .part e renomeia no final. Uma queda no meio
+        do corpo conta como falha de conexão e o download recomeça.
+        """
+        tmp_path = out_path.with_name(out_path.name + ".part")
+
+        def handle(r: requests.Response) -> tuple[int, int]:
+            size = 0
+            with open(tmp_path, "wb") as f:
+                for chunk in r.iter_content(chunk_size=1024 * 1024):
+                    if chunk:
+                        f.write(chunk)
+                        size += len(chunk)
+            # Content-Length é o tamanho na rede; com gzip/deflate o arquivo gravado já
+            # vem decodificado, então a conferência usa os bytes lidos do socket.
+            recebidos = r.raw.tell()
+            expected = r.headers.get("Content-Length")
+            if expected and expected.isdigit() and int(expected) != recebidos:
+                raise requests.ConnectionError(f"Download incompleto: {recebidos} de {expected} bytes")
+            return size, recebidos
+
+        size = self._request(url, handle, timeout)
+        tmp_path.replace(out_path)
+        return size
+
+    def metrics(self) -> dict[str, dict]:
+        with self._lock:
+            return {host: m.as_dict() for host, m in self._metrics.items()}
+
+    def log_metrics(self) -> None:
+        for host, m in self.metrics().items():
+            logger.info(
+                f"HTTP {host}: {m['requests']} requisições | {m['retries']} novas tentativas | "
+                f"{m['failures']} falhas | {m['bytes'] / 1e6:.1f} MB em {m['seconds']:.1f}s "
+                f"({m['mb_por_s']} MB/s) | status {m['status']}"
+            )
+
+
+_client: HttpClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Cliente compartilhado, configurado pelas variáveis ANS_HTTP_*."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient(
+                max_concurrency=int(_env_float("ANS_HTTP_MAX_CONCURRENCY", 4)),
+                rate=_env_float("ANS_HTTP_RATE", 5.0),
+                retries=int(_env_float("ANS_HTTP_RETRIES", 5)),
+                backoff=_env_float("ANS_HTTP_BACKOFF", 1.0),
+                timeout=_env_float("ANS_HTTP_TIMEOUT", 60.0),
+            )
+        return _client
@@ -4,7 +4,6 @@ from pathlib import Path
 
 
 LOG_DIR = Path("logs")
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 _CONFIGURED = False
 
@@ -15,6 +14,7 @@ def setup_logging(log_name: str, file_name: str, level: int = logging.INFO) -> l
     logger.setLevel(level)
 
     if not _CONFIGURED:
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
         fmt = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s")
 
         file_handler = logging.FileHandler(LOG_DIR / file_name, encoding="utf-8")
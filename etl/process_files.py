@@ -5,6 +5,7 @@ import zipfile
 import pandas as pd
 
 from pathlib import Path
+from etl.br_numbers import parse_br_number
 from etl.logging_config import setup_logging
 
 
@@ -24,19 +25,23 @@ def _extract_zip_files() -> None:
         return
 
     for zip_path in zips:
-        extract_path = EXTRACTED_DIR / zip_path.stem
-        if extract_path.exists():
-            logger.info(f"ZIP já extraído: {zip_path.name}")
-            continue
+        _extract_zip(zip_path)
 
-        logger.info(f"Extraindo: {zip_path.name}")
-        extract_path.mkdir(parents=True, exist_ok=True)
+def _extract_zip(zip_path: Path, extracted_dir: Path = EXTRACTED_DIR) -> Path:
+    extract_path = extracted_dir / zip_path.stem
+    if extract_path.exists():
+        logger.info(f"ZIP já extraído: {zip_path.name}")
+        return extract_path
 
-        try:
-            with zipfile.ZipFile(zip_path, "r") as z:
-                z.extractall(extract_path)
-        except Exception as e:
-            logger.error(f"Falha ao extrair {zip_path.name}: {e}")
+    logger.info(f"Extraindo: {zip_path.name}")
+    extract_path.mkdir(parents=True, exist_ok=True)
+
+    try:
+        with zipfile.ZipFile(zip_path, "r") as z:
+            z.extractall(extract_path)
+    except Exception as e:
+        logger.error(f"Falha ao extrair {zip_path.name}: {e}")
+    return extract_path
 
 def _read_file(file_path: Path) -> pd.DataFrame | None:
     try:
@@ -49,6 +54,43 @@ def _read_file(file_path: Path) -> pd.DataFrame | None:
         logger.error(f"Erro ao ler {file_path}: {e}")
     return None
 
+def _process_file(file_path: Path) -> pd.DataFrame | None:
+    if file_path.suffix.lower() not in [".csv", ".txt", ".xls", ".xlsx"]:
+        return None
+
+    df = _read_file(file_path)
+    if df is None:
+        return None
+
+    required = {"DESCRICAO", "REG_ANS", "VL_SALDO_FINAL"}
+    if not required.issubset(df.columns):
+        logger.info(f"Ignorado (colunas ausentes): {file_path.name}")
+        return None
+
+    before = len(df)
+    df = df[df["DESCRICAO"].astype(str).str.contains("EVENTOS|SINISTROS|ASSISTENC", case=False, na=False)]
+    after = len(df)
+    logger.info(f"{file_path.name} | Registros: {before} -> {after}")
+
+    try:
+        df["VL_SALDO_FINAL"] = parse_br_number(df["VL_SALDO_FINAL"], errors="raise")
+    except Exception as e:
+        logger.error(f"Erro ao converter valores em {file_path.name}: {e}")
+        return None
+
+    m = re.search(r"(\d)T(\d{4})", file_path.name)
+    if not m:
+        logger.info(f"Ignorado (sem trimestre/ano no nome): {file_path.name}")
+        return None
+
+    trimestre = int(m.group(1))
+    ano = int(m.group(2))
+
+    grouped = df.groupby("REG_ANS")["VL_SALDO_FINAL"].sum().reset_index()
+    grouped["ano"] = ano
+    grouped["trimestre"] = trimestre
+    return grouped
+
 def run() -> Path:
     logger.info("Iniciando processamento de despesas assistenciais.")
     _extract_zip_files()
@@ -60,48 +102,9 @@ def run() -> Path:
         raise FileNotFoundError("Nenhum arquivo para processar em data/extracted.")
 
     for file_path in candidates:
-        if file_path.suffix.lower() not in [".csv", ".txt", ".xls", ".xlsx"]:
-            continue
-
-        df = _read_file(file_path)
-        if df is None:
-            continue
-
-        required = {"DESCRICAO", "REG_ANS", "VL_SALDO_FINAL"}
-        if not required.issubset(df.columns):
-            logger.info(f"Ignorado (colunas ausentes): {file_path.name}")
-            continue
-
-        before = len(df)
-        df = df[df["DESCRICAO"].astype(str).str.contains("EVENTOS|SINISTROS|ASSISTENC", case=False, na=False)]
-        after = len(df)
-        logger.info(f"{file_path.name} | Registros: {before} -> {after}")
-
-        try:
-            df["VL_SALDO_FINAL"] = (
-                df["VL_SALDO_FINAL"]
-                .astype(str)
-                .str.replace(".", "", regex=False)
-                .str.replace(",", ".", regex=False)
-                .astype(float)
-            )
-        except Exception as e:
-            logger.error(f"Erro ao converter valores em {file_path.name}: {e}")
-            continue
-
-        m = re.search(r"(\d)T(\d{4})", file_path.name)
-        if not m:
-            logger.info(f"Ignorado (sem trimestre/ano no nome): {file_path.name}")
-            continue
-
-        trimestre = int(m.group(1))
-        ano = int(m.group(2))
-
-        grouped = df.groupby("REG_ANS")["VL_SALDO_FINAL"].sum().reset_index()
-        grouped["ano"] = ano
-        grouped["trimestre"] = trimestre
-
-        results.append(grouped)
+        grouped = _process_file(file_path)
+        if grouped is not None:
+            results.append(grouped)
 
     if not results:
         logger.error("Nenhum dado válido foi processado.")
@@ -115,5 +118,24 @@ def run() -> Path:
     logger.info(f"Arquivo gerado: {out} | Linhas: {len(final_df)}")
     return out
 
+def run_zip(zip_path: Path, out_csv: Path, extracted_dir: Path = EXTRACTED_DIR) -> Path:
+    """
+    Processa um único ZIP trimestral (usado pelo backfill), extraído em
+    extracted_dir, e grava o CSV do trimestre em out_csv.
+    """
+    extract_path = _extract_zip(zip_path, extracted_dir)
+
+    results = [g for g in (_process_file(f) for f in extract_path.rglob("*")) if g is not None]
+    if not results:
+        raise RuntimeError(f"Nenhum dado válido em {zip_path.name}.")
+
+    final_df = pd.concat(results, ignore_index=True)
+    final_df["VL_SALDO_FINAL"] = final_df["VL_SALDO_FINAL"].round(2)
+
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    final_df.to_csv(out_csv, index=False, sep=";")
+    logger.info(f"Arquivo gerado: {out_csv} | Linhas: {len(final_df)}")
+    return out_csv
+
 if __name__ == "__main__":
     run()
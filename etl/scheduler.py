@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import multiprocessing
+import random
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+from etl.logging_config import setup_logging
+
+
+logger = setup_logging("scheduler", "pipeline.log", logging.INFO)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """Etapa do pipeline. kind="io" roda numa thread do event loop; kind="cpu" num processo separado."""
+
+    name: str
+    func: Callable[[], Any]
+    deps: tuple[str, ...] = ()
+    kind: str = "io"
+    retries: int = 0
+    backoff: float = 2.0
+
+
+def _validate(stages: list[Stage]) -> dict[str, Stage]:
+    by_name = {s.name: s for s in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Etapas com nomes duplicados.")
+
+    for s in stages:
+        if s.kind not in ("io", "cpu"):
+            raise ValueError(f"Tipo de etapa inválido em {s.name}: {s.kind}")
+        missing = [d for d in s.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"Dependências desconhecidas em {s.name}: {missing}")
+
+    return by_name
+
+
+def levels(stages: list[Stage]) -> list[list[str]]:
+    """Agrupa as etapas em níveis: cada nível só depende dos anteriores (Kahn)."""
+    by_name = _validate(stages)
+    pending = {name: set(s.deps) for name, s in by_name.items()}
+    done: set[str] = set()
+    result: list[list[str]] = []
+
+    while pending:
+        ready = sorted(name for name, deps in pending.items() if deps <= done)
+        if not ready:
+            raise ValueError(f"Ciclo entre as etapas: {sorted(pending)}")
+        result.append(ready)
+        done.update(ready)
+        for name in ready:
+            del pending[name]
+
+    return result
+
+
+def plan(stages: list[Stage]) -> str:
+    """Plano de execução (dry-run), sem rodar nenhuma etapa."""
+    by_name = _validate(stages)
+    lines = []
+    for i, level in enumerate(levels(stages)):
+        lines.append(f"Nível {i} ({len(level)} em paralelo):")
+        for name in level:
+            s = by_name[name]
+            deps = ", ".join(s.deps) if s.deps else "-"
+            lines.append(f"  - {name} [{s.kind}] depende de: {deps} | tentativas: {s.retries + 1}")
+    return "\n".join(lines)
+
+
+async def _run_stage(stage: Stage, pool: ProcessPoolExecutor) -> Any:
+    loop = asyncio.get_running_loop()
+
+    for attempt in range(stage.retries + 1):
+        started = time.perf_counter()
+        try:
+            if stage.kind == "cpu":
+                result = await loop.run_in_executor(pool, stage.func)
+            else:
+                result = await asyncio.to_thread(stage.func)
+            logger.info(f"Etapa concluída: {stage.name} ({time.perf_counter() - started:.1f}s)")
+            return result
+        except Exception as e:
+            if attempt >= stage.retries:
+                logger.error(f"Etapa falhou: {stage.name} | {e}")
+                raise
+            delay = stage.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            logger.warning(
+                f"Etapa {stage.name} falhou (tentativa {attempt + 1}/{stage.retries + 1}): {e} "
+                f"| nova tentativa em {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+
+async def _run_async(stages: list[Stage], max_workers: int | None) -> dict[str, Any]:
+    by_name = _validate(stages)
+    levels(stages)  # rejeita ciclos antes de iniciar qualquer etapa
+
+    tasks: dict[str, asyncio.Task] = {}
+
+    # spawn, não fork: os workers nascem enquanto etapas io rodam em threads (e o
+    # cliente HTTP compartilhado segura locks e sessões); um fork nesse estado
+    # pode herdar um lock travado e deadlockar no filho.
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+
+        async def run_after_deps(stage: Stage) -> Any:
+            # Uma falha em qualquer dependência propaga e a etapa nem começa.
+            await asyncio.gather(*(tasks[d] for d in stage.deps))
+            return await _run_stage(stage, pool)
+
+        for name in [n for level in levels(stages) for n in level]:
+            tasks[name] = asyncio.create_task(run_after_deps(by_name[name]), name=name)
+
+        done = await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    results = dict(zip(tasks, done))
+    failed = {name: r for name, r in results.items() if isinstance(r, BaseException)}
+    if failed:
+        first = next(iter(failed.values()))
+        raise RuntimeError(f"Etapas com falha: {', '.join(failed)}") from first
+
+    return results
+
+
+def run(stages: list[Stage], max_workers: int | None = None) -> dict[str, Any]:
+    """Executa o DAG: etapas independentes rodam em paralelo, cada uma assim que suas dependências terminam."""
+    started = time.perf_counter()
+    results = asyncio.run(_run_async(stages, max_workers))
+    logger.info(f"DAG concluído em {time.perf_counter() - started:.1f}s")
+    return results
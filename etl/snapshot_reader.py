@@ -0,0 +1,153 @@
+"""
+Leitura do snapshot binário de despesas (data/final/despesas.snap).
+
+Formato (versão 2), tudo little-endian:
+
+    MAGIC (8 bytes) | versão do formato (u32) | tamanho do cabeçalho (u32) | cabeçalho JSON (UTF-8)
+    ... seção de dados, alinhada em ALIGN bytes, com um bloco alinhado por coluna ...
+
+O cabeçalho descreve cada tabela (linhas e, por coluna, dtype NumPy e offset) e
+cada dicionário de strings (offsets u64 com n + 1 posições e o blob UTF-8). Os
+offsets são relativos ao início da seção de dados. As colunas de texto das
+tabelas guardam o código (u32) da string no dicionário, exceto despesas.cnpj:
+texto ASCII de largura fixa (S14), sempre com 14 dígitos (zeros à esquerda) ou
+vazio, comparável direto com as chaves de 14 caracteres
+(d["cnpj"] == b"00000000000191"). Na versão 1 era int64 e perdia os zeros à
+esquerda.
+
+Este módulo só depende de NumPy: as colunas são views sobre o mmap, sem cópia e
+sem parse, e processos que abrem o mesmo arquivo compartilham as páginas.
+"""
+import json
+import mmap
+import struct
+import numpy as np
+
+from pathlib import Path
+
+
+MAGIC = b"ICSNAP\x00\x01"
+FORMAT_VERSION = 2
+PREFIX = struct.Struct("<8sII")
+ALIGN = 64
+
+SNAPSHOT_PATH = Path("data/final/despesas.snap")
+
+
+def aligned(n: int) -> int:
+    return -(-n // ALIGN) * ALIGN
+
+
+class StringDictionary:
+    """Dicionário de strings ordenadas: código -> string (decodificada sob demanda) e string -> código."""
+
+    def __init__(self, offsets: np.ndarray, blob: memoryview):
+        self.offsets = offsets
+        self._blob = blob
+        self._index: dict[str, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, code: int) -> str:
+        a, b = int(self.offsets[code]), int(self.offsets[code + 1])
+        return bytes(self._blob[a:b]).decode("utf-8")
+
+    def decode(self, codes: np.ndarray) -> list[str]:
+        return [self[int(c)] for c in codes]
+
+    def code(self, value: str) -> int | None:
+        if self._index is None:
+            self._index = {self[i]: i for i in range(len(self))}
+        return self._index.get(value)
+
+
+class Table:
+    """Colunas de uma tabela do snapshot, como views NumPy somente leitura."""
+
+    def __init__(self, name: str, rows: int, columns: dict[str, np.ndarray]):
+        self.name = name
+        self.rows = rows
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+    def __repr__(self) -> str:
+        cols = ", ".join(f"{c}:{a.dtype}" for c, a in self.columns.items())
+        return f"<Table {self.name} linhas={self.rows} [{cols}]>"
+
+
+class BinarySnapshot:
+    """
+    Snapshot aberto via mmap. Uso:
+
+        with open_snapshot() as snap:
+            d = snap.despesas
+            total = d["vl_saldo_final"][d["ano"] == 2025].sum()
+            nome = snap.dicionarios["razao_social"][d["razao_social"][0]]
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_len = PREFIX.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Arquivo não é um snapshot de despesas: {self.path}")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Versão de formato não suportada: {version} (esperada {FORMAT_VERSION})")
+
+        self.header = json.loads(bytes(self._mm[PREFIX.size:PREFIX.size + header_len]).decode("utf-8"))
+        self._base = aligned(PREFIX.size + header_len)
+        self.versao_dados = self.header["versao_dados"]
+        self.gerado_em = self.header["gerado_em"]
+
+        self.dicionarios = {
+            name: StringDictionary(
+                self._view("<u8", d["offsets"], d["tamanho"] + 1),
+                memoryview(self._mm)[self._base + d["dados"]:self._base + d["dados"] + d["bytes"]],
+            )
+            for name, d in self.header["dicionarios"].items()
+        }
+        self.tabelas = {
+            name: Table(name, t["linhas"], {c: self._view(s["dtype"], s["offset"], t["linhas"]) for c, s in t["colunas"].items()})
+            for name, t in self.header["tabelas"].items()
+        }
+
+    def _view(self, dtype: str, offset: int, count: int) -> np.ndarray:
+        return np.frombuffer(self._mm, dtype=np.dtype(dtype), count=count, offset=self._base + offset)
+
+    @property
+    def despesas(self) -> Table:
+        return self.tabelas["despesas"]
+
+    @property
+    def agregadas(self) -> Table:
+        return self.tabelas["agregadas"]
+
+    def close(self) -> None:
+        # Se ainda houver views em uso fora daqui, o mmap só é liberado quando elas forem descartadas.
+        self.tabelas = {}
+        self.dicionarios = {}
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def __enter__(self) -> "BinarySnapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_snapshot(path: Path = SNAPSHOT_PATH) -> BinarySnapshot:
+    return BinarySnapshot(path)
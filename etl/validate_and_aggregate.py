@@ -1,9 +1,14 @@
+import gzip
+import hashlib
+import json
 import logging
-import re
+import os
 import zipfile
+import numpy as np
 import pandas as pd
 
 from pathlib import Path
+from etl.br_numbers import parse_br_number
 from etl.logging_config import setup_logging
 
 
@@ -11,23 +16,181 @@ DATA_FINAL = Path("data/final")
 RAW_DIR = Path("data/raw")
 OUTPUT_ZIP = Path("Teste_Everton_Brandao.zip")
 
-logger = setup_logging("validate_and_aggregate", "pipeline.log", logging.INFO)
-
+# Estado das agregações: uma linha por (RAZAO_SOCIAL, UF, ANO, TRIMESTRE) com
+# contagem, soma e M2 (soma dos quadrados dos desvios, Welford). Parciais são
+# combináveis, então um trimestre novo só recalcula os grupos que ele toca.
+PARCIAIS_CSV = DATA_FINAL / "despesas_agregadas_parciais.csv"
+# Validade do estado: assinatura do mapeamento CNPJ -> UF do cadastro (que define
+# as chaves dos grupos) e trimestres presentes. Gravado por último, depois do
+# estado e do CSV final; sem ele (ou com outro cadastro) a agregação é completa.
+PARCIAIS_META = DATA_FINAL / "despesas_agregadas_parciais.json"
+GROUP_KEYS = ["RAZAO_SOCIAL", "UF"]
+PERIOD_KEYS = ["ANO", "TRIMESTRE"]
+
+# Linhas rejeitadas vão para data/quarentena/motivo=<motivo>/<arquivo>.csv.gz,
+# com os valores originais, e o resumo da execução para resumo_<arquivo>.json.
+QUARANTINE_DIR = Path("data/quarentena")
+MOTIVOS = ("razao_social_vazia", "valor_invalido", "cnpj_invalido")
+AMOSTRAS_POR_MOTIVO = 5
+
+# O consolidado é lido e validado em blocos deste tamanho
+CHUNK_ROWS = 200_000
+
+CNPJ_W1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+CNPJ_W2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
 
-def is_valid_cnpj(cnpj: str) -> bool:
-    cnpj = re.sub(r"\D", "", str(cnpj))
-    if len(cnpj) != 14 or cnpj == cnpj[0] * 14:
-        return False
+logger = setup_logging("validate_and_aggregate", "pipeline.log", logging.INFO)
 
-    def calc_digit(base: str, weights: list[int]) -> str:
-        s = sum(int(base[i]) * weights[i] for i in range(len(weights)))
-        r = s % 11
-        return "0" if r < 2 else str(11 - r)
 
-    w1 = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-    w2 = [6] + w1
+def _valid_cnpj_mask(cnpj: pd.Series) -> np.ndarray:
+    """Valida os dígitos verificadores de CNPJs já reduzidos a dígitos (vetorizado)."""
+    valido = np.zeros(len(cnpj), dtype=bool)
+    tamanho_ok = ((cnpj.str.len() == 14) & cnpj.str.isascii()).to_numpy()
+    if not tamanho_ok.any():
+        return valido
+
+    d = np.frombuffer("".join(cnpj[tamanho_ok]).encode("ascii"), dtype=np.uint8).reshape(-1, 14) - ord("0")
+    d = d.astype(np.int64)
+
+    r1 = (d[:, :12] @ CNPJ_W1) % 11
+    r2 = (d[:, :13] @ CNPJ_W2) % 11
+    dv1 = np.where(r1 < 2, 0, 11 - r1)
+    dv2 = np.where(r2 < 2, 0, 11 - r2)
+    repetido = (d == d[:, :1]).all(axis=1)
+
+    valido[tamanho_ok] = (dv1 == d[:, 12]) & (dv2 == d[:, 13]) & ~repetido
+    return valido
+
+
+def _classify(despesas: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray]:
+    """
+    Normaliza CNPJ, razão social e valor e aponta o motivo de rejeição de cada
+    linha ("" quando válida). Vale o primeiro motivo na ordem de MOTIVOS.
+    """
+    cnpj = despesas["CNPJ"].fillna("").astype(str).str.replace(r"\D", "", regex=True)
+    razao = despesas["RAZAO_SOCIAL"].fillna("").astype(str).str.strip()
+    valor = parse_br_number(despesas["VL_SALDO_FINAL"])
+
+    razao_vazia = (razao == "").to_numpy()
+    valor_invalido = ~(valor >= 0).to_numpy()
+    cnpj_invalido = ~_valid_cnpj_mask(cnpj)
+
+    motivo = np.select([razao_vazia, valor_invalido, cnpj_invalido], list(MOTIVOS), default="")
+    return despesas.assign(CNPJ=cnpj, RAZAO_SOCIAL=razao, VL_SALDO_FINAL=valor), motivo
+
+
+class _Quarantine:
+    """
+    Grava as linhas rejeitadas (valores originais) por motivo à medida que cada
+    bloco é classificado, em arquivos .csv.gz abertos uma vez por execução. Em
+    memória ficam só as contagens e até AMOSTRAS_POR_MOTIVO amostras por motivo.
+    Os arquivos são escritos com sufixo .tmp e trocados no close().
+    """
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.lidos = 0
+        self.contagens = {m: 0 for m in MOTIVOS}
+        self.amostras: dict[str, list[dict]] = {m: [] for m in MOTIVOS}
+        self._arquivos = {}
+
+    def _destino(self, m: str) -> Path:
+        return QUARANTINE_DIR / f"motivo={m}" / f"{self.nome}.csv.gz"
+
+    def write(self, bloco: pd.DataFrame, motivo: np.ndarray) -> None:
+        self.lidos += len(bloco)
+        for m in MOTIVOS:
+            mask = motivo == m
+            if not mask.any():
+                continue
+            rejeitadas = bloco[mask]
+            novo = m not in self._arquivos
+            if novo:
+                tmp = self._destino(m).with_name(f"{self.nome}.csv.gz.tmp")
+                tmp.parent.mkdir(parents=True, exist_ok=True)
+                self._arquivos[m] = gzip.open(tmp, "wt", encoding="utf-8", newline="")
+            rejeitadas.to_csv(self._arquivos[m], index=False, sep=";", header=novo)
+
+            self.contagens[m] += len(rejeitadas)
+            falta = AMOSTRAS_POR_MOTIVO - len(self.amostras[m])
+            if falta > 0:
+                self.amostras[m] += rejeitadas.head(falta).fillna("").to_dict(orient="records")
+
+    def close(self) -> dict[str, int]:
+        """Fecha os arquivos, troca os .tmp pelos definitivos e grava o resumo."""
+        for m in MOTIVOS:
+            destino = self._destino(m)
+            if m in self._arquivos:
+                self._arquivos.pop(m).close()
+                os.replace(destino.with_name(f"{self.nome}.csv.gz.tmp"), destino)
+            else:
+                # Sem rejeições: não deixa a quarentena de uma execução anterior para trás
+                destino.unlink(missing_ok=True)
+
+        rejeitados = sum(self.contagens.values())
+        resumo = {
+            "arquivo": self.nome,
+            "gerado_em": pd.Timestamp.now().isoformat(timespec="seconds"),
+            "registros_lidos": self.lidos,
+            "aceitos": self.lidos - rejeitados,
+            "rejeitados": {
+                m: {"quantidade": n, "arquivo": str(self._destino(m)), "amostras": self.amostras[m]}
+                for m, n in self.contagens.items()
+                if n
+            },
+        }
 
-    return calc_digit(cnpj, w1) == cnpj[12] and calc_digit(cnpj, w2) == cnpj[13]
+        QUARANTINE_DIR.mkdir(parents=True, exist_ok=True)
+        resumo_path = QUARANTINE_DIR / f"resumo_{self.nome}.json"
+        resumo_path.write_text(json.dumps(resumo, ensure_ascii=False, indent=2), encoding="utf-8")
+        logger.info(f"Quarentena: {rejeitados} linhas rejeitadas | resumo em {resumo_path}")
+        return self.contagens
+
+    def abort(self) -> None:
+        for m, f in self._arquivos.items():
+            f.close()
+            self._destino(m).with_name(f"{self.nome}.csv.gz.tmp").unlink(missing_ok=True)
+        self._arquivos.clear()
+
+
+def _read_and_classify(input_csv_path: Path) -> pd.DataFrame:
+    """
+    Lê o consolidado em blocos de CHUNK_ROWS linhas: cada bloco é classificado,
+    as rejeições vão direto para a quarentena e só as linhas aceitas seguem.
+    """
+    quarentena = _Quarantine(input_csv_path.stem)
+    aceitos = []
+
+    try:
+        for bloco in pd.read_csv(input_csv_path, sep=";", dtype=str, chunksize=CHUNK_ROWS):
+            bloco = _check_columns(_normalize_columns(bloco))
+            validos, motivo = _classify(bloco)
+            quarentena.write(bloco, motivo)
+            aceitos.append(validos[motivo == ""])
+
+        if not aceitos:
+            # Sem nenhum bloco (consolidado só com cabeçalho): frame vazio com as
+            # colunas e tipos de um bloco classificado
+            cabecalho = pd.read_csv(input_csv_path, sep=";", dtype=str, nrows=0)
+            aceitos.append(_classify(_check_columns(_normalize_columns(cabecalho)))[0])
+    except BaseException:
+        quarentena.abort()
+        raise
+
+    logger.info(f"Registros iniciais: {quarentena.lidos}")
+    contagens = quarentena.close()
+    logger.info(f"Razão Social vazia descartada: {contagens['razao_social_vazia']}")
+    logger.info(f"Valores inválidos/negativos descartados: {contagens['valor_invalido']}")
+    logger.warning(f"CNPJs inválidos descartados: {contagens['cnpj_invalido']}")
+
+    return pd.concat(aceitos, ignore_index=True)
+
+
+def _check_columns(despesas: pd.DataFrame) -> pd.DataFrame:
+    for col in ["CNPJ", "RAZAO_SOCIAL", "VL_SALDO_FINAL", "ANO", "TRIMESTRE"]:
+        if col not in despesas.columns:
+            raise KeyError(f"Coluna ausente no consolidado: {col}")
+    return despesas
 
 
 def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
@@ -86,52 +249,138 @@ def _load_cadastro_operadoras() -> pd.DataFrame:
     return cadastro
 
 
-def run(input_csv_path: Path | None = None) -> Path:
-    logger.info("Iniciando validação, enriquecimento e agregação.")
-
-    if input_csv_path is None:
-        input_csv_path = DATA_FINAL / "despesas_consolidadas_final.csv"
+def _read_state_csv(path: Path) -> pd.DataFrame:
+    # Sem os NA padrão do pandas: "NA" ou "NULL" na razão social são texto válido.
+    return pd.read_csv(path, sep=";", dtype={"RAZAO_SOCIAL": str, "UF": str}, keep_default_na=False, na_values=[""])
 
-    if not input_csv_path.exists():
-        raise FileNotFoundError(f"Arquivo consolidado não encontrado: {input_csv_path}")
 
-    despesas = pd.read_csv(input_csv_path, sep=";", dtype=str)
-    despesas = _normalize_columns(despesas)
+def _compute_partials(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    for col in PERIOD_KEYS:
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
 
-    logger.info(f"Registros iniciais: {len(despesas)}")
+    g = df.groupby(GROUP_KEYS + PERIOD_KEYS, dropna=False)["VL_SALDO_FINAL"]
+    parciais = g.agg(n="count", soma="sum").reset_index()
+    parciais["m2"] = g.var(ddof=0).fillna(0.0).to_numpy() * parciais["n"].to_numpy()
+    return parciais
 
-    required = ["CNPJ", "RAZAO_SOCIAL", "VL_SALDO_FINAL"]
-    for col in required:
-        if col not in despesas.columns:
-            raise KeyError(f"Coluna ausente no consolidado: {col}")
 
-    despesas["CNPJ"] = despesas["CNPJ"].astype(str).str.replace(r"\D", "", regex=True)
-    despesas["RAZAO_SOCIAL"] = despesas["RAZAO_SOCIAL"].astype(str).str.strip()
+def _merge_partials(parciais: pd.DataFrame) -> pd.DataFrame:
+    """Combina parciais por (RAZAO_SOCIAL, UF) com a fórmula de Chan: m2 = Σm2ᵢ + Σnᵢ(x̄ᵢ - x̄)²."""
+    p = parciais[parciais["n"] > 0].copy()
+    tot = p.groupby(GROUP_KEYS, dropna=False)[["n", "soma"]].transform("sum")
+    p["desvio_media"] = p["n"] * (p["soma"] / p["n"] - tot["soma"] / tot["n"]) ** 2
 
-    despesas["VL_SALDO_FINAL"] = (
-        despesas["VL_SALDO_FINAL"]
-        .astype(str)
-        .str.replace(".", "", regex=False)
-        .str.replace(",", ".", regex=False)
+    agg = (
+        p.groupby(GROUP_KEYS, dropna=False)
+        .agg(n=("n", "sum"), total_despesas=("soma", "sum"), m2=("m2", "sum"), desvio_media=("desvio_media", "sum"))
+        .reset_index()
     )
-    despesas["VL_SALDO_FINAL"] = pd.to_numeric(despesas["VL_SALDO_FINAL"], errors="coerce")
+    m2 = agg["m2"] + agg["desvio_media"]
+    agg["media_trimestral"] = agg["total_despesas"] / agg["n"]
+    agg["desvio_padrao"] = np.sqrt(m2.clip(lower=0) / (agg["n"] - 1)).where(agg["n"] > 1)
+    return agg[GROUP_KEYS + ["total_despesas", "media_trimestral", "desvio_padrao"]]
+
+
+def _cadastro_signature(cadastro: pd.DataFrame) -> str:
+    """Hash do mapeamento CNPJ -> UF usado para montar as chaves (RAZAO_SOCIAL, UF)."""
+    pares = cadastro[["CNPJ", "UF"]].fillna("").astype(str).sort_values(["CNPJ", "UF"])
+    return hashlib.sha256("\n".join(pares["CNPJ"] + ";" + pares["UF"]).encode("utf-8")).hexdigest()
 
-    before = len(despesas)
-    despesas = despesas[despesas["RAZAO_SOCIAL"].notna() & (despesas["RAZAO_SOCIAL"] != "")]
-    razao_drop = before - len(despesas)
 
-    before = len(despesas)
-    despesas = despesas[despesas["VL_SALDO_FINAL"].notna() & (despesas["VL_SALDO_FINAL"] >= 0)]
-    valor_drop = before - len(despesas)
+def _periodos(df: pd.DataFrame) -> list[str]:
+    return sorted({f"{a}-{t}" for a, t in df[PERIOD_KEYS].drop_duplicates().itertuples(index=False)})
 
-    despesas["CNPJ_VALIDO"] = despesas["CNPJ"].apply(is_valid_cnpj)
-    invalidos = int((~despesas["CNPJ_VALIDO"]).sum())
 
-    logger.info(f"Razão Social vazia descartada: {razao_drop}")
-    logger.info(f"Valores inválidos/negativos descartados: {valor_drop}")
-    logger.warning(f"CNPJs inválidos descartados: {invalidos}")
+def _read_state(output_csv: Path, assinatura: str) -> pd.DataFrame | None:
+    """Parciais da execução anterior, se ainda valem para este cadastro; senão None."""
+    if not (PARCIAIS_CSV.exists() and output_csv.exists() and PARCIAIS_META.exists()):
+        return None
 
-    despesas = despesas[despesas["CNPJ_VALIDO"]].drop(columns=["CNPJ_VALIDO"])
+    meta = json.loads(PARCIAIS_META.read_text(encoding="utf-8"))
+    if meta.get("cadastro") != assinatura:
+        logger.warning("Estado das agregações foi gerado com outro cadastro de operadoras: descartado.")
+        return None
+
+    anteriores = _read_state_csv(PARCIAIS_CSV)
+    for col in PERIOD_KEYS:
+        anteriores[col] = anteriores[col].astype("Int64")
+    if _periodos(anteriores) != meta.get("trimestres"):
+        logger.warning("Estado das agregações não confere com os trimestres registrados: descartado.")
+        return None
+    return anteriores
+
+
+def state_matches_cadastro() -> bool:
+    """Indica se o estado gravado foi gerado com o cadastro atual em data/raw."""
+    if not PARCIAIS_META.exists():
+        return False
+    meta = json.loads(PARCIAIS_META.read_text(encoding="utf-8"))
+    cadastro = _normalize_columns(_load_cadastro_operadoras())
+    if "UF" not in cadastro.columns:
+        cadastro["UF"] = None
+    return meta.get("cadastro") == _cadastro_signature(cadastro)
+
+
+def _update_aggregates(
+    novos: pd.DataFrame,
+    output_csv: Path,
+    incremental: bool,
+    partial_input: bool,
+    assinatura: str,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Monta o novo estado e devolve (agregadas, estado). Com partial_input, os
+    parciais dos trimestres presentes em novos substituem os do estado e os
+    demais trimestres são mantidos; sem ele, novos é o estado inteiro (trimestres
+    que saíram da entrada saem do estado). Só os grupos cujos parciais mudaram são
+    recalculados; os demais são reaproveitados de output_csv.
+    """
+    anteriores = _read_state(output_csv, assinatura) if incremental else None
+
+    if anteriores is None:
+        logger.info("Agregação completa (sem estado anterior válido).")
+        return _merge_partials(novos), novos
+
+    if partial_input:
+        periodos = pd.MultiIndex.from_frame(novos[PERIOD_KEYS].drop_duplicates())
+        substituidos = pd.MultiIndex.from_frame(anteriores[PERIOD_KEYS]).isin(periodos)
+    else:
+        substituidos = np.ones(len(anteriores), dtype=bool)
+
+    estado = pd.concat([anteriores[~substituidos], novos], ignore_index=True)
+
+    # Grupos com algum parcial diferente entre o estado anterior e o novo
+    colunas = GROUP_KEYS + PERIOD_KEYS + ["n", "soma", "m2"]
+    diferencas = anteriores.loc[substituidos, colunas].merge(novos[colunas], how="outer", indicator=True)
+    afetados = diferencas.loc[diferencas["_merge"] != "both", GROUP_KEYS].drop_duplicates()
+    chave = pd.MultiIndex.from_frame(afetados)
+    afetado_no_estado = pd.MultiIndex.from_frame(estado[GROUP_KEYS]).isin(chave)
+
+    agg_anterior = _read_state_csv(output_csv)
+    mantidos = agg_anterior[~pd.MultiIndex.from_frame(agg_anterior[GROUP_KEYS]).isin(chave)]
+
+    recalculados = _merge_partials(estado[afetado_no_estado])
+    agg = pd.concat([mantidos, recalculados], ignore_index=True)
+    logger.info(f"Agregação incremental: {len(afetados)} grupos recalculados, {len(mantidos)} reaproveitados.")
+    return agg, estado
+
+
+def run(input_csv_path: Path | None = None, incremental: bool = True, partial_input: bool = False) -> Path:
+    """
+    Valida, enriquece e agrega input_csv_path (padrão: o consolidado final). Com
+    partial_input, a entrada traz só alguns trimestres (backfill) e os demais
+    trimestres do estado são mantidos.
+    """
+    logger.info("Iniciando validação, enriquecimento e agregação.")
+
+    if input_csv_path is None:
+        input_csv_path = DATA_FINAL / "despesas_consolidadas_final.csv"
+
+    if not input_csv_path.exists():
+        raise FileNotFoundError(f"Arquivo consolidado não encontrado: {input_csv_path}")
+
+    despesas = _read_and_classify(input_csv_path)
 
     cadastro = _load_cadastro_operadoras()
     cadastro = _normalize_columns(cadastro)
@@ -147,19 +396,21 @@ def run(input_csv_path: Path | None = None) -> Path:
 
     df["UF"] = df["UF"].fillna("SEM_MATCH")
 
-    agg = (
-        df.groupby(["RAZAO_SOCIAL", "UF"], dropna=False)
-        .agg(
-            total_despesas=("VL_SALDO_FINAL", "sum"),
-            media_trimestral=("VL_SALDO_FINAL", "mean"),
-            desvio_padrao=("VL_SALDO_FINAL", "std"),
-        )
-        .reset_index()
-        .sort_values("total_despesas", ascending=False)
-    )
-
     output_csv = DATA_FINAL / "despesas_agregadas.csv"
-    agg.to_csv(output_csv, index=False, sep=";")
+
+    assinatura = _cadastro_signature(cadastro)
+    parciais = _compute_partials(df)
+    agg, estado = _update_aggregates(parciais, output_csv, incremental, partial_input, assinatura)
+
+    # O meta só é regravado depois do estado e do CSV final: uma execução
+    # interrompida no meio força a agregação completa na próxima.
+    PARCIAIS_META.unlink(missing_ok=True)
+    estado.to_csv(PARCIAIS_CSV, index=False, sep=";")
+    agg.sort_values("total_despesas", ascending=False).to_csv(output_csv, index=False, sep=";")
+    PARCIAIS_META.write_text(
+        json.dumps({"cadastro": assinatura, "trimestres": _periodos(estado)}, indent=2),
+        encoding="utf-8",
+    )
 
     with zipfile.ZipFile(OUTPUT_ZIP, "w", zipfile.ZIP_DEFLATED) as z:
         z.write(output_csv, output_csv.name)
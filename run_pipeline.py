@@ -1,26 +1,67 @@
+import argparse
 import logging
-from pathlib import Path
+from functools import partial
 
+from etl import scheduler
+from etl.scheduler import Stage
 from etl.logging_config import setup_logging
 from etl.download_ans import run as download_ans_run
 from etl.download_operadoras import run as download_operadoras_run
+from etl.cadastro import run as cadastro_run
 from etl.process_files import run as process_files_run
 from etl.consolidate import run as consolidate_run
 from etl.validate_and_aggregate import run as validate_and_aggregate_run
+from etl.binary_snapshot import run as binary_snapshot_run
 
 logger = setup_logging("run_pipeline", "pipeline.log", logging.INFO)
 
+# Downloads são I/O (threads); processamento com pandas é CPU (processos).
+# process_files só precisa dos ZIPs da ANS, então roda enquanto os cadastros ainda baixam.
+PIPELINE_STAGES = [
+    Stage("download_operadoras", download_operadoras_run, kind="io", retries=3),
+    Stage("download_ans", partial(download_ans_run, last_n_quarters=3), kind="io", retries=3),
+    Stage("process_files", process_files_run, deps=("download_ans",), kind="cpu"),
+    Stage("cadastro", cadastro_run, deps=("download_operadoras",), kind="cpu"),
+    Stage("consolidate", consolidate_run, deps=("process_files", "download_operadoras"), kind="cpu"),
+    Stage("validate_and_aggregate", validate_and_aggregate_run, deps=("consolidate",), kind="cpu"),
+    Stage("binary_snapshot", binary_snapshot_run, deps=("validate_and_aggregate",), kind="cpu"),
+]
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pipeline ETL de despesas das operadoras (ANS).")
+    parser.add_argument("--backfill", action="store_true", help="Carga histórica por intervalo de trimestres.")
+    parser.add_argument("--inicio", default="2007-1", help="Primeiro trimestre do backfill (AAAA-T).")
+    parser.add_argument("--fim", default=None, help="Último trimestre do backfill (AAAA-T). Padrão: o mais recente.")
+    parser.add_argument("--lote", type=int, default=4, help="Trimestres processados por lote.")
+    parser.add_argument("--workers", type=int, default=4, help="Downloads/processos paralelos por lote.")
+    parser.add_argument("--sem-import", action="store_true", help="Não importa os trimestres no banco.")
+    parser.add_argument("--plano", action="store_true", help="Mostra o plano de execução das etapas sem executá-las.")
+    return parser.parse_args(argv)
 
-def main() -> None:
-    logger.info("Iniciando pipeline completo.")
 
-    download_operadoras_run()
-    download_ans_run(last_n_quarters=3)
+def main(argv: list[str] | None = None) -> None:
+    args = _parse_args(argv)
 
-    despesas_trimestre = process_files_run()
-    consolidado = consolidate_run(Path(despesas_trimestre))
-    validate_and_aggregate_run(Path(consolidado))
+    if args.backfill:
+        from etl.backfill import parse_periodo, run as backfill_run
 
+        logger.info("Iniciando pipeline em modo backfill.")
+        backfill_run(
+            parse_periodo(args.inicio),
+            parse_periodo(args.fim) if args.fim else (9999, 4),
+            batch_size=args.lote,
+            max_workers=args.workers,
+            import_db=not args.sem_import,
+        )
+        return
+
+    if args.plano:
+        print(scheduler.plan(PIPELINE_STAGES))
+        return
+
+    logger.info("Iniciando pipeline completo.")
+    scheduler.run(PIPELINE_STAGES)
     logger.info("Pipeline finalizado com sucesso.")
 
 
@@ -7,27 +7,259 @@ CREATE TABLE IF NOT EXISTS operadoras (
   situacao         TEXT
 );
 
+-- Listagem paginada (ORDER BY razao_social), com e sem filtro de situação:
+-- os índices cobrem todas as colunas devolvidas, então a página sai de um Index Only Scan.
+CREATE INDEX IF NOT EXISTS idx_operadoras_razao_social
+  ON operadoras (razao_social) INCLUDE (cnpj, registro_ans, modalidade, uf, situacao);
+
+CREATE INDEX IF NOT EXISTS idx_operadoras_situacao_razao_social
+  ON operadoras (situacao, razao_social) INCLUDE (cnpj, registro_ans, modalidade, uf);
+
+-- Contagens (total e por situação) lendo só este índice estreito
+CREATE INDEX IF NOT EXISTS idx_operadoras_situacao
+  ON operadoras (situacao);
+
+-- Busca por substring (ILIKE '%q%') em razão social e CNPJ. pg_trgm vem no
+-- contrib da imagem oficial; em servidores sem ele a busca continua funcionando,
+-- só que varrendo a tabela.
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    EXECUTE 'CREATE INDEX IF NOT EXISTS idx_operadoras_razao_social_trgm
+               ON operadoras USING gin (razao_social gin_trgm_ops)';
+    EXECUTE 'CREATE INDEX IF NOT EXISTS idx_operadoras_cnpj_trgm
+               ON operadoras USING gin (cnpj gin_trgm_ops)';
+  END IF;
+END $$;
+
+-- Versão dos dados: incrementada ao final de cada import. A API usa para
+-- saber quando recarregar o que mantém em memória.
+CREATE TABLE IF NOT EXISTS dados_versao (
+  id             SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  versao         BIGINT NOT NULL DEFAULT 0,
+  atualizado_em  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO dados_versao (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION registrar_nova_versao_dados()
+RETURNS BIGINT
+LANGUAGE sql AS $$
+  UPDATE dados_versao
+  SET versao = versao + 1, atualizado_em = now()
+  WHERE id = 1
+  RETURNING versao
+$$;
+
+-- Bases criadas antes do particionamento: a tabela antiga é renomeada e seus
+-- dados migram para a tabela particionada no final deste script.
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM pg_class
+    WHERE relname = 'despesas_consolidadas' AND relkind = 'r'
+      AND relnamespace = 'public'::regnamespace
+  ) THEN
+    ALTER TABLE despesas_consolidadas RENAME TO despesas_consolidadas_legado;
+    ALTER TABLE despesas_consolidadas_legado
+      RENAME CONSTRAINT despesas_consolidadas_pkey TO despesas_consolidadas_legado_pkey;
+    DROP INDEX IF EXISTS idx_despesas_periodo, idx_despesas_operadora, idx_despesas_reg_ans;
+  END IF;
+END $$;
+
+-- Particionada por trimestre: cada (ano, trimestre) é uma partição própria,
+-- substituída inteira pelo import quando o trimestre muda.
 CREATE TABLE IF NOT EXISTS despesas_consolidadas (
-  id               BIGSERIAL PRIMARY KEY,
+  id               BIGSERIAL,
   registro_ans     VARCHAR(20) NOT NULL,
   cnpj             VARCHAR(14),
   razao_social     TEXT NOT NULL,
   ano              SMALLINT NOT NULL,
   trimestre        SMALLINT NOT NULL CHECK (trimestre BETWEEN 1 AND 4),
-  vl_saldo_final   DECIMAL(18,2) NOT NULL,
+  vl_saldo_final   DECIMAL(22,2) NOT NULL,
+  PRIMARY KEY (id, ano, trimestre),
   CONSTRAINT fk_despesas_operadora
     FOREIGN KEY (cnpj) REFERENCES operadoras(cnpj)
-);
+) PARTITION BY RANGE (ano, trimestre);
 
 CREATE INDEX IF NOT EXISTS idx_despesas_periodo
   ON despesas_consolidadas (ano, trimestre);
 
-CREATE INDEX IF NOT EXISTS idx_despesas_operadora
-  ON despesas_consolidadas (cnpj);
+-- Série de uma operadora (WHERE cnpj ORDER BY ano, trimestre) direto do índice
+DROP INDEX IF EXISTS idx_despesas_operadora;
+CREATE INDEX IF NOT EXISTS idx_despesas_operadora_periodo
+  ON despesas_consolidadas (cnpj, ano, trimestre) INCLUDE (vl_saldo_final);
 
 CREATE INDEX IF NOT EXISTS idx_despesas_reg_ans
   ON despesas_consolidadas (registro_ans);
 
+CREATE OR REPLACE FUNCTION despesas_particao_nome(p_ano INT, p_trimestre INT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT format('despesas_consolidadas_%st%s', p_ano, p_trimestre)
+$$;
+
+CREATE OR REPLACE FUNCTION despesas_particao_limites(p_ano INT, p_trimestre INT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+  -- O limite superior (ano, trimestre + 1) é exclusivo; (ano, 5) vem antes de (ano + 1, 1).
+  SELECT format('FROM (%s, %s) TO (%s, %s)', p_ano, p_trimestre, p_ano, p_trimestre + 1)
+$$;
+
+CREATE OR REPLACE FUNCTION criar_particao_despesas(p_ano INT, p_trimestre INT)
+RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+  EXECUTE format(
+    'CREATE TABLE IF NOT EXISTS %I PARTITION OF despesas_consolidadas FOR VALUES %s',
+    despesas_particao_nome(p_ano, p_trimestre),
+    despesas_particao_limites(p_ano, p_trimestre)
+  );
+END $$;
+
+-- Troca as partições dos trimestres presentes na tabela temporária
+-- despesas_carga (registro_ans, cnpj, razao_social, ano, trimestre, vl_saldo_final).
+-- Trimestres cujo conteúdo não mudou são mantidos; os demais são montados numa
+-- tabela nova e trocados via DETACH/ATTACH, sem tocar nas outras partições.
+CREATE OR REPLACE FUNCTION substituir_particoes_despesas()
+RETURNS TABLE (periodo TEXT, acao TEXT)
+LANGUAGE plpgsql AS $$
+DECLARE
+  r            RECORD;
+  v_nome       TEXT;
+  v_novo       TEXT;
+  v_hash_novo  TEXT;
+  v_hash_atual TEXT;
+  v_existe     BOOLEAN;
+  v_assinatura CONSTANT TEXT :=
+    'md5(string_agg(concat_ws(''|'', registro_ans, cnpj, razao_social, vl_saldo_final), '','' '
+    'ORDER BY registro_ans, cnpj, vl_saldo_final))';
+BEGIN
+  FOR r IN SELECT DISTINCT c.ano, c.trimestre FROM despesas_carga c ORDER BY 1, 2 LOOP
+    v_nome := despesas_particao_nome(r.ano, r.trimestre);
+    v_novo := v_nome || '_novo';
+    periodo := format('%s-%s', r.ano, r.trimestre);
+
+    EXECUTE format('SELECT %s FROM despesas_carga WHERE ano = $1 AND trimestre = $2', v_assinatura)
+      INTO v_hash_novo USING r.ano, r.trimestre;
+
+    v_existe := to_regclass(v_nome) IS NOT NULL;
+    IF v_existe THEN
+      EXECUTE format('SELECT %s FROM %I', v_assinatura, v_nome) INTO v_hash_atual;
+      IF v_hash_atual IS NOT DISTINCT FROM v_hash_novo THEN
+        acao := 'inalterada';
+        RETURN NEXT;
+        CONTINUE;
+      END IF;
+    END IF;
+
+    EXECUTE format('DROP TABLE IF EXISTS %I', v_novo);
+    EXECUTE format(
+      'CREATE TABLE %I (LIKE despesas_consolidadas INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+      v_novo
+    );
+    EXECUTE format(
+      'INSERT INTO %I (registro_ans, cnpj, razao_social, ano, trimestre, vl_saldo_final) '
+      'SELECT registro_ans, cnpj, razao_social, ano, trimestre, vl_saldo_final '
+      'FROM despesas_carga WHERE ano = $1 AND trimestre = $2',
+      v_novo
+    ) USING r.ano, r.trimestre;
+
+    IF v_existe THEN
+      EXECUTE format('ALTER TABLE despesas_consolidadas DETACH PARTITION %I', v_nome);
+      EXECUTE format('DROP TABLE %I', v_nome);
+    END IF;
+
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', v_novo, v_nome);
+    EXECUTE format(
+      'ALTER TABLE despesas_consolidadas ATTACH PARTITION %I FOR VALUES %s',
+      v_nome, despesas_particao_limites(r.ano, r.trimestre)
+    );
+
+    acao := CASE WHEN v_existe THEN 'substituida' ELSE 'criada' END;
+    RETURN NEXT;
+  END LOOP;
+END $$;
+
+-- Upsert do cadastro da tabela temporária operadoras_carga
+-- (registro_ans, cnpj, razao_social, modalidade, uf, situacao): um registro por
+-- CNPJ, com a operadora ativa na frente da cancelada.
+CREATE OR REPLACE FUNCTION carregar_operadoras()
+RETURNS INT
+LANGUAGE plpgsql AS $$
+DECLARE
+  v_linhas INT;
+BEGIN
+  WITH dedup AS (
+    SELECT DISTINCT ON (cnpj)
+      cnpj, registro_ans, razao_social, modalidade, uf, situacao
+    FROM operadoras_carga
+    ORDER BY
+      cnpj,
+      CASE WHEN situacao = 'ATIVA' THEN 1 ELSE 2 END,
+      registro_ans NULLS LAST
+  )
+  INSERT INTO operadoras (cnpj, registro_ans, razao_social, modalidade, uf, situacao)
+  SELECT
+    cnpj, registro_ans, razao_social, modalidade, uf, situacao
+  FROM dedup
+  ON CONFLICT (cnpj) DO UPDATE
+  SET
+    registro_ans = COALESCE(EXCLUDED.registro_ans, operadoras.registro_ans),
+    razao_social = COALESCE(EXCLUDED.razao_social, operadoras.razao_social),
+    modalidade = COALESCE(EXCLUDED.modalidade, operadoras.modalidade),
+    uf = COALESCE(EXCLUDED.uf, operadoras.uf),
+    situacao = EXCLUDED.situacao;
+
+  GET DIAGNOSTICS v_linhas = ROW_COUNT;
+  RETURN v_linhas;
+END $$;
+
+-- Reconcilia operadoras com operadoras_carga (inclusive os registros
+-- DESCONHECIDA criados pelos imports): quem não está no cadastro e não tem
+-- despesas é removido; quem ainda tem despesas (FK) fica marcado como
+-- DESCONHECIDA. Cadastro vazio (ex.: download falhou) não altera nada.
+CREATE OR REPLACE FUNCTION reconciliar_operadoras()
+RETURNS INT
+LANGUAGE plpgsql AS $$
+DECLARE
+  v_removidas INT;
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM operadoras_carga) THEN
+    RETURN 0;
+  END IF;
+
+  DELETE FROM operadoras o
+  WHERE NOT EXISTS (SELECT 1 FROM operadoras_carga c WHERE c.cnpj = o.cnpj)
+    AND NOT EXISTS (SELECT 1 FROM despesas_consolidadas d WHERE d.cnpj = o.cnpj);
+  GET DIAGNOSTICS v_removidas = ROW_COUNT;
+
+  UPDATE operadoras o
+  SET situacao = 'DESCONHECIDA'
+  WHERE NOT EXISTS (SELECT 1 FROM operadoras_carga c WHERE c.cnpj = o.cnpj)
+    AND o.situacao IS DISTINCT FROM 'DESCONHECIDA';
+
+  RETURN v_removidas;
+END $$;
+
+DO $$
+DECLARE
+  r RECORD;
+BEGIN
+  IF to_regclass('despesas_consolidadas_legado') IS NOT NULL THEN
+    FOR r IN SELECT DISTINCT ano, trimestre FROM despesas_consolidadas_legado LOOP
+      PERFORM criar_particao_despesas(r.ano, r.trimestre);
+    END LOOP;
+
+    INSERT INTO despesas_consolidadas (registro_ans, cnpj, razao_social, ano, trimestre, vl_saldo_final)
+    SELECT registro_ans, cnpj, razao_social, ano, trimestre, vl_saldo_final
+    FROM despesas_consolidadas_legado;
+
+    DROP TABLE despesas_consolidadas_legado;
+  END IF;
+END $$;
+
 CREATE TABLE IF NOT EXISTS despesas_agregadas (
   id                BIGSERIAL PRIMARY KEY,
   razao_social      TEXT NOT NULL,
@@ -42,3 +274,254 @@ CREATE INDEX IF NOT EXISTS idx_agregadas_uf
 
 CREATE INDEX IF NOT EXISTS idx_agregadas_total
   ON despesas_agregadas (total_despesas DESC);
+
+CREATE INDEX IF NOT EXISTS idx_agregadas_grupo
+  ON despesas_agregadas (razao_social, uf);
+
+-- Estado combinável das agregações (gerado pelo validate_and_aggregate):
+-- contagem, soma e M2 por grupo e trimestre. UF fica como veio do ETL.
+CREATE TABLE IF NOT EXISTS despesas_agregadas_parciais (
+  razao_social  TEXT NOT NULL,
+  uf            TEXT NOT NULL,
+  ano           SMALLINT NOT NULL,
+  trimestre     SMALLINT NOT NULL,
+  n             INT NOT NULL,
+  soma          NUMERIC NOT NULL,
+  m2            NUMERIC NOT NULL,
+  PRIMARY KEY (razao_social, uf, ano, trimestre)
+);
+
+CREATE OR REPLACE FUNCTION uf_normalizada(p_uf TEXT)
+RETURNS CHAR(2)
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT CASE WHEN trim(p_uf) ~ '^[A-Za-z]{2}$' THEN upper(trim(p_uf)) END
+$$;
+
+-- Texto numérico em decimal simples ("1257109617.35", ".5", "1e-05") ou no formato
+-- brasileiro ("1234567,89", "1.234.567,89", ",5"); sem vírgula, um único ponto é
+-- decimal. Mesmas regex e limite de etl/br_numbers.py. Fora dos dois formatos ou
+-- fora de DECIMAL(22,2) (o CAST do import falharia), NULL.
+CREATE OR REPLACE FUNCTION numero_br(p_valor TEXT)
+RETURNS NUMERIC
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT CASE WHEN abs(round(n, 2)) < 1e20 THEN n END
+  FROM (
+    SELECT CASE
+      WHEN v ~ '^[+-]?([0-9]+(\.[0-9]*)?|\.[0-9]+)([eE][+-]?[0-9]{1,3})?$' THEN v::numeric
+      WHEN v ~ '^[+-]?([0-9]+(,[0-9]*)?|,[0-9]+|[0-9]{1,3}(\.[0-9]{3})+(,[0-9]*)?)$'
+        THEN replace(replace(v, '.', ''), ',', '.')::numeric
+    END AS n
+    FROM (SELECT btrim(p_valor, E' \t\r\n') AS v) t
+  ) t
+$$;
+
+-- Aplica os parciais da tabela temporária agregadas_parciais_carga
+-- (razao_social, uf, ano, trimestre, n, soma, m2): substitui os trimestres
+-- presentes nela e recalcula em despesas_agregadas só os grupos cujos parciais
+-- mudaram. Em NUMERIC a combinação é exata:
+--   m2 = Σm2ᵢ + Σ(somaᵢ² / nᵢ) - (Σsomaᵢ)² / Σnᵢ
+CREATE OR REPLACE FUNCTION atualizar_agregadas_incremental()
+RETURNS INT
+LANGUAGE plpgsql AS $$
+DECLARE
+  v_grupos INT;
+BEGIN
+  -- Primeira carga incremental: descarta agregadas vindas da carga completa antiga
+  IF NOT EXISTS (SELECT 1 FROM despesas_agregadas_parciais) THEN
+    TRUNCATE despesas_agregadas RESTART IDENTITY;
+  END IF;
+
+  DROP TABLE IF EXISTS agregadas_afetadas;
+  CREATE TEMP TABLE agregadas_afetadas AS
+  WITH periodos AS (
+    SELECT DISTINCT ano, trimestre FROM agregadas_parciais_carga
+  ),
+  antigos AS (
+    SELECT p.razao_social, p.uf, p.ano, p.trimestre, p.n, p.soma, p.m2
+    FROM despesas_agregadas_parciais p
+    JOIN periodos per ON per.ano = p.ano AND per.trimestre = p.trimestre
+  ),
+  novos AS (
+    SELECT razao_social, uf, ano, trimestre, n, soma, m2 FROM agregadas_parciais_carga
+  ),
+  diferencas AS (
+    (SELECT * FROM antigos EXCEPT SELECT * FROM novos)
+    UNION
+    (SELECT * FROM novos EXCEPT SELECT * FROM antigos)
+  )
+  SELECT DISTINCT razao_social, uf_normalizada(uf) AS uf
+  FROM diferencas;
+
+  DELETE FROM despesas_agregadas_parciais p
+  USING (SELECT DISTINCT ano, trimestre FROM agregadas_parciais_carga) per
+  WHERE p.ano = per.ano AND p.trimestre = per.trimestre;
+
+  INSERT INTO despesas_agregadas_parciais (razao_social, uf, ano, trimestre, n, soma, m2)
+  SELECT razao_social, uf, ano, trimestre, n, soma, m2
+  FROM agregadas_parciais_carga;
+
+  DELETE FROM despesas_agregadas a
+  USING agregadas_afetadas f
+  WHERE a.razao_social = f.razao_social
+    AND a.uf IS NOT DISTINCT FROM f.uf;
+
+  INSERT INTO despesas_agregadas (razao_social, uf, total_despesas, media_trimestral, desvio_padrao)
+  SELECT
+    f.razao_social,
+    f.uf,
+    SUM(p.soma),
+    SUM(p.soma) / SUM(p.n),
+    CASE
+      WHEN SUM(p.n) > 1 THEN sqrt(GREATEST(
+        SUM(p.m2) + SUM(p.soma * p.soma / p.n) - SUM(p.soma) * SUM(p.soma) / SUM(p.n), 0
+      ) / (SUM(p.n) - 1))
+    END
+  FROM agregadas_afetadas f
+  JOIN despesas_agregadas_parciais p
+    ON p.razao_social = f.razao_social
+   AND uf_normalizada(p.uf) IS NOT DISTINCT FROM f.uf
+  WHERE p.n > 0
+  GROUP BY f.razao_social, f.uf;
+
+  SELECT COUNT(*) INTO v_grupos FROM agregadas_afetadas;
+  DROP TABLE agregadas_afetadas;
+  RETURN v_grupos;
+END $$;
+
+-- Analytics pré-calculadas (recalculadas a cada import por atualizar_analytics).
+-- A janela analisada são os últimos N trimestres presentes na base.
+CREATE TABLE IF NOT EXISTS analytics_janela (
+  id               SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  periodo_inicial  INT,
+  periodo_final    INT,
+  qtd_trimestres   SMALLINT NOT NULL,
+  atualizado_em    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS analytics_crescimento (
+  cnpj                    VARCHAR(14) PRIMARY KEY,
+  razao_social            TEXT,
+  first_periodo           INT NOT NULL,
+  last_periodo            INT NOT NULL,
+  first_val               DECIMAL(22,2),
+  last_val                DECIMAL(22,2),
+  crescimento_percentual  DECIMAL(22,2)
+);
+
+CREATE INDEX IF NOT EXISTS idx_analytics_crescimento
+  ON analytics_crescimento (crescimento_percentual DESC NULLS LAST);
+
+CREATE TABLE IF NOT EXISTS analytics_despesas_uf (
+  uf                         CHAR(2) PRIMARY KEY,
+  total_uf                   DECIMAL(22,2) NOT NULL,
+  qtd_operadoras             INT NOT NULL,
+  media_por_operadora_na_uf  DECIMAL(22,2)
+);
+
+CREATE INDEX IF NOT EXISTS idx_analytics_despesas_uf_total
+  ON analytics_despesas_uf (total_uf DESC);
+
+CREATE TABLE IF NOT EXISTS analytics_acima_media (
+  cnpj                        VARCHAR(14) PRIMARY KEY,
+  razao_social                TEXT,
+  qtd_trimestres_acima_media  SMALLINT NOT NULL
+);
+
+-- Mesma ordem do ORDER BY da API (desempate por cnpj), sem Sort
+DROP INDEX IF EXISTS idx_analytics_acima_media_qtd;
+CREATE INDEX IF NOT EXISTS idx_analytics_acima_media_ordem
+  ON analytics_acima_media (qtd_trimestres_acima_media DESC, cnpj);
+
+CREATE OR REPLACE FUNCTION atualizar_analytics(p_ultimos INT DEFAULT 3)
+RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+  -- Uma linha por operadora e trimestre, restrita à janela dos últimos p_ultimos trimestres
+  DROP TABLE IF EXISTS analytics_base;
+  CREATE TEMP TABLE analytics_base AS
+  WITH periodos AS (
+    SELECT DISTINCT ano, trimestre
+    FROM despesas_consolidadas
+    ORDER BY ano DESC, trimestre DESC
+    LIMIT p_ultimos
+  )
+  SELECT
+    d.cnpj,
+    MAX(d.razao_social) AS razao_social,
+    d.ano,
+    d.trimestre,
+    (d.ano * 10 + d.trimestre) AS periodo,
+    SUM(d.vl_saldo_final) AS vl_saldo_final
+  FROM despesas_consolidadas d
+  JOIN periodos p ON p.ano = d.ano AND p.trimestre = d.trimestre
+  WHERE d.cnpj IS NOT NULL
+    AND d.cnpj <> ''
+  GROUP BY d.cnpj, d.ano, d.trimestre;
+
+  TRUNCATE analytics_janela, analytics_crescimento, analytics_despesas_uf, analytics_acima_media;
+
+  INSERT INTO analytics_janela (periodo_inicial, periodo_final, qtd_trimestres)
+  SELECT MIN(periodo), MAX(periodo), COUNT(DISTINCT periodo)
+  FROM analytics_base;
+
+  -- Query 1: crescimento entre o primeiro e o último trimestre da operadora na janela
+  INSERT INTO analytics_crescimento (
+    cnpj, razao_social, first_periodo, last_periodo, first_val, last_val, crescimento_percentual
+  )
+  SELECT
+    cnpj,
+    razao_social,
+    first_periodo,
+    last_periodo,
+    first_val,
+    last_val,
+    CASE
+      WHEN first_val IS NULL OR first_val = 0 THEN NULL
+      ELSE ROUND(((last_val - first_val) / first_val) * 100.0, 2)
+    END
+  FROM (
+    SELECT
+      cnpj,
+      MAX(razao_social) AS razao_social,
+      MIN(periodo) AS first_periodo,
+      MAX(periodo) AS last_periodo,
+      (array_agg(vl_saldo_final ORDER BY periodo ASC))[1]  AS first_val,
+      (array_agg(vl_saldo_final ORDER BY periodo DESC))[1] AS last_val
+    FROM analytics_base
+    GROUP BY cnpj
+  ) g;
+
+  -- Query 2: distribuição de despesas por UF
+  INSERT INTO analytics_despesas_uf (uf, total_uf, qtd_operadoras, media_por_operadora_na_uf)
+  SELECT
+    uf,
+    SUM(total_operadora_uf),
+    COUNT(*),
+    ROUND(AVG(total_operadora_uf), 2)
+  FROM (
+    SELECT
+      COALESCE(o.uf, 'NI') AS uf,
+      b.cnpj,
+      SUM(b.vl_saldo_final) AS total_operadora_uf
+    FROM analytics_base b
+    LEFT JOIN operadoras o ON o.cnpj = b.cnpj
+    GROUP BY COALESCE(o.uf, 'NI'), b.cnpj
+  ) por_operadora_uf
+  GROUP BY uf;
+
+  -- Query 3: em quantos trimestres da janela cada operadora ficou acima da média geral
+  INSERT INTO analytics_acima_media (cnpj, razao_social, qtd_trimestres_acima_media)
+  SELECT
+    b.cnpj,
+    MAX(b.razao_social),
+    SUM(CASE WHEN b.vl_saldo_final > m.media_geral THEN 1 ELSE 0 END)
+  FROM analytics_base b
+  JOIN (
+    SELECT periodo, AVG(vl_saldo_final) AS media_geral
+    FROM analytics_base
+    GROUP BY periodo
+  ) m ON m.periodo = b.periodo
+  GROUP BY b.cnpj;
+
+  DROP TABLE analytics_base;
+END $$;
@@ -1,27 +1,38 @@
-WITH base AS (
+-- As três queries usam a janela dos últimos 3 trimestres presentes na base
+-- (em vez de períodos fixos). O mesmo cálculo é materializado a cada import
+-- por atualizar_analytics() nas tabelas analytics_* servidas pela API.
+
+WITH periodos AS (
+  SELECT DISTINCT ano, trimestre
+  FROM despesas_consolidadas
+  ORDER BY ano DESC, trimestre DESC
+  LIMIT 3
+),
+base AS (
   SELECT
     d.cnpj,
-    d.razao_social,
-    d.ano,
-    d.trimestre,
-    d.vl_saldo_final,
-    (d.ano * 10 + d.trimestre) AS periodo
+    MAX(d.razao_social) AS razao_social,
+    (d.ano * 10 + d.trimestre) AS periodo,
+    SUM(d.vl_saldo_final) AS vl_saldo_final
   FROM despesas_consolidadas d
+  JOIN periodos p ON p.ano = d.ano AND p.trimestre = d.trimestre
   WHERE d.cnpj IS NOT NULL
     AND d.cnpj <> ''
+  GROUP BY d.cnpj, d.ano, d.trimestre
 ),
 first_last AS (
   SELECT
     cnpj,
-    razao_social,
-    FIRST_VALUE(vl_saldo_final) OVER (PARTITION BY cnpj ORDER BY periodo ASC)  AS first_val,
-    FIRST_VALUE(periodo)        OVER (PARTITION BY cnpj ORDER BY periodo ASC)  AS first_periodo,
-    FIRST_VALUE(vl_saldo_final) OVER (PARTITION BY cnpj ORDER BY periodo DESC) AS last_val,
-    FIRST_VALUE(periodo)        OVER (PARTITION BY cnpj ORDER BY periodo DESC) AS last_periodo
+    MAX(razao_social) AS razao_social,
+    MIN(periodo) AS first_periodo,
+    MAX(periodo) AS last_periodo,
+    (array_agg(vl_saldo_final ORDER BY periodo ASC))[1]  AS first_val,
+    (array_agg(vl_saldo_final ORDER BY periodo DESC))[1] AS last_val
   FROM base
+  GROUP BY cnpj
 ),
 growth AS (
-  SELECT DISTINCT
+  SELECT
     cnpj,
     razao_social,
     first_val,
@@ -47,12 +58,20 @@ WHERE crescimento_percentual IS NOT NULL
 ORDER BY crescimento_percentual DESC
 LIMIT 5;
 
-WITH por_operadora_uf AS (
+WITH periodos AS (
+  SELECT DISTINCT ano, trimestre
+  FROM despesas_consolidadas
+  ORDER BY ano DESC, trimestre DESC
+  LIMIT 3
+),
+por_operadora_uf AS (
   SELECT
     COALESCE(o.uf, 'NI') AS uf,
     d.cnpj,
     SUM(d.vl_saldo_final) AS total_operadora_uf
   FROM despesas_consolidadas d
+  JOIN periodos p
+    ON p.ano = d.ano AND p.trimestre = d.trimestre
   LEFT JOIN operadoras o
     ON o.cnpj = d.cnpj
   WHERE d.cnpj IS NOT NULL
@@ -77,16 +96,23 @@ FROM por_uf
 ORDER BY total_uf DESC
 LIMIT 5;
 
-WITH base AS (
+WITH periodos AS (
+  SELECT DISTINCT ano, trimestre
+  FROM despesas_consolidadas
+  ORDER BY ano DESC, trimestre DESC
+  LIMIT 3
+),
+base AS (
   SELECT
     d.cnpj,
     d.ano,
     d.trimestre,
     d.vl_saldo_final
   FROM despesas_consolidadas d
+  JOIN periodos p
+    ON p.ano = d.ano AND p.trimestre = d.trimestre
   WHERE d.cnpj IS NOT NULL
     AND d.cnpj <> ''
-    AND (d.ano, d.trimestre) IN ((2025,1),(2025,2),(2025,3))
 ),
 media_geral_por_trimestre AS (
   SELECT
@@ -119,3 +145,9 @@ SELECT
   COUNT(*) AS operadoras_acima_media_em_pelo_menos_2_trimestres
 FROM contagem
 WHERE qtd_trimestres_acima_media >= 2;
+
+-- Leituras equivalentes sobre as tabelas pré-calculadas:
+-- SELECT * FROM analytics_crescimento WHERE crescimento_percentual IS NOT NULL
+--   ORDER BY crescimento_percentual DESC LIMIT 5;
+-- SELECT * FROM analytics_despesas_uf ORDER BY total_uf DESC LIMIT 5;
+-- SELECT COUNT(*) FROM analytics_acima_media WHERE qtd_trimestres_acima_media >= 2;
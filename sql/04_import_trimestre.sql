@@ -0,0 +1,73 @@
+-- Import incremental de UM trimestre (usado pelo backfill).
+-- Variáveis psql: arquivo (caminho visto pelo servidor), ano, trimestre.
+-- Substitui apenas a partição do (ano, trimestre) informado; o resto da base fica intacto.
+BEGIN;
+SET client_encoding TO 'UTF8';
+
+CREATE TEMP TABLE despesas_trimestre_staging (
+  registro_ans_raw   TEXT,
+  vl_saldo_final_raw TEXT,
+  ano_raw            TEXT,
+  trimestre_raw      TEXT,
+  cnpj_raw           TEXT,
+  razao_social_raw   TEXT
+) ON COMMIT DROP;
+
+COPY despesas_trimestre_staging (registro_ans_raw, vl_saldo_final_raw, ano_raw, trimestre_raw, cnpj_raw, razao_social_raw)
+FROM :'arquivo'
+WITH (FORMAT csv, HEADER true, DELIMITER ';', QUOTE '"', ENCODING 'UTF8');
+
+-- INSERIR OPERADORAS FALTANTES (trimestres antigos podem ter operadoras fora do cadastro atual)
+INSERT INTO operadoras (cnpj, registro_ans, razao_social, modalidade, uf, situacao)
+SELECT DISTINCT ON (regexp_replace(cnpj_raw, '\D', '', 'g'))
+  regexp_replace(cnpj_raw, '\D', '', 'g') AS cnpj,
+  trim(registro_ans_raw) AS registro_ans,
+  trim(razao_social_raw) AS razao_social,
+  NULL AS modalidade,
+  NULL AS uf,
+  'DESCONHECIDA' AS situacao
+FROM despesas_trimestre_staging
+WHERE length(regexp_replace(cnpj_raw, '\D', '', 'g')) = 14
+  AND trim(razao_social_raw) <> ''
+ON CONFLICT (cnpj) DO NOTHING;
+
+CREATE TEMP TABLE despesas_carga (
+  registro_ans   VARCHAR(20),
+  cnpj           VARCHAR(14),
+  razao_social   TEXT,
+  ano            SMALLINT,
+  trimestre      SMALLINT,
+  vl_saldo_final DECIMAL(22,2)
+) ON COMMIT DROP;
+
+-- O CSV do trimestre vem do process_files (float com ponto decimal)
+INSERT INTO despesas_carga (registro_ans, cnpj, razao_social, ano, trimestre, vl_saldo_final)
+SELECT
+  NULLIF(trim(registro_ans_raw), ''),
+  regexp_replace(cnpj_raw, '\D', '', 'g'),
+  NULLIF(trim(razao_social_raw), ''),
+  CAST(trim(ano_raw) AS SMALLINT),
+  CAST(trim(trimestre_raw) AS SMALLINT),
+  CAST(numero_br(vl_saldo_final_raw) AS DECIMAL(22,2))
+FROM despesas_trimestre_staging
+WHERE trim(registro_ans_raw) <> ''
+  AND length(regexp_replace(cnpj_raw, '\D', '', 'g')) = 14
+  AND trim(razao_social_raw) <> ''
+  AND trim(ano_raw) = :'ano'
+  AND trim(trimestre_raw) = :'trimestre'
+  AND numero_br(vl_saldo_final_raw) IS NOT NULL;
+
+-- Troca só a partição deste trimestre (DETACH/ATTACH)
+SELECT periodo, acao FROM substituir_particoes_despesas();
+
+-- Registros DESCONHECIDA que ficaram sem despesas com a troca da partição
+DELETE FROM operadoras o
+WHERE o.situacao = 'DESCONHECIDA'
+  AND NOT EXISTS (SELECT 1 FROM despesas_consolidadas d WHERE d.cnpj = o.cnpj);
+
+-- Recalcula as analytics servidas pela API (janela dos últimos 3 trimestres)
+SELECT atualizar_analytics(3);
+
+SELECT registrar_nova_versao_dados() AS versao_dados;
+
+COMMIT;
@@ -0,0 +1,40 @@
+-- Atualiza despesas_agregadas de forma incremental a partir do estado de
+-- parciais gerado pelo ETL (despesas_agregadas_parciais.csv).
+-- Variável psql: arquivo (caminho visto pelo servidor).
+BEGIN;
+SET client_encoding TO 'UTF8';
+
+CREATE TEMP TABLE agregadas_parciais_staging (
+  razao_social TEXT,
+  uf           TEXT,
+  ano          TEXT,
+  trimestre    TEXT,
+  n            TEXT,
+  soma         TEXT,
+  m2           TEXT
+) ON COMMIT DROP;
+
+COPY agregadas_parciais_staging (razao_social, uf, ano, trimestre, n, soma, m2)
+FROM :'arquivo'
+WITH (FORMAT csv, HEADER true, DELIMITER ';', QUOTE '"', ENCODING 'UTF8');
+
+CREATE TEMP TABLE agregadas_parciais_carga ON COMMIT DROP AS
+SELECT
+  trim(razao_social) AS razao_social,
+  trim(uf) AS uf,
+  CAST(ano AS SMALLINT) AS ano,
+  CAST(trimestre AS SMALLINT) AS trimestre,
+  CAST(n AS INT) AS n,
+  CAST(soma AS NUMERIC) AS soma,
+  CAST(m2 AS NUMERIC) AS m2
+FROM agregadas_parciais_staging
+WHERE NULLIF(trim(razao_social), '') IS NOT NULL
+  AND NULLIF(trim(uf), '') IS NOT NULL
+  AND ano ~ '^\d+$'
+  AND trimestre ~ '^\d+$';
+
+SELECT atualizar_agregadas_incremental() AS grupos_recalculados;
+
+SELECT registrar_nova_versao_dados() AS versao_dados;
+
+COMMIT;
@@ -0,0 +1,25 @@
+-- Import do cadastro de operadoras (usado pelo backfill antes dos trimestres).
+-- Variável psql: arquivo (caminho visto pelo servidor do operadoras_cadastro.csv).
+-- Mesmo upsert e reconciliação do 02_import.sql (funções do 01_ddl.sql).
+BEGIN;
+SET client_encoding TO 'UTF8';
+
+CREATE TEMP TABLE operadoras_carga (
+  registro_ans VARCHAR(20),
+  cnpj         VARCHAR(14) NOT NULL,
+  razao_social TEXT NOT NULL,
+  modalidade   TEXT,
+  uf           CHAR(2),
+  situacao     TEXT NOT NULL
+) ON COMMIT DROP;
+
+COPY operadoras_carga (registro_ans, cnpj, razao_social, modalidade, uf, situacao)
+FROM :'arquivo'
+WITH (FORMAT csv, HEADER true, DELIMITER ';', QUOTE '"', ENCODING 'UTF8');
+
+SELECT carregar_operadoras() AS operadoras_carregadas;
+SELECT reconciliar_operadoras() AS operadoras_removidas;
+
+SELECT registrar_nova_versao_dados() AS versao_dados;
+
+COMMIT;
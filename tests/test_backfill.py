@@ -0,0 +1,80 @@
+import io
+import zipfile
+import pandas as pd
+import pytest
+
+from pathlib import Path
+from etl import backfill, db_import, download_ans, validate_and_aggregate as va
+
+
+def _cnpj(base: int) -> str:
+    digitos = [int(c) for c in f"{base:012d}"]
+    for pesos in (va.CNPJ_W1, va.CNPJ_W2):
+        r = sum(d * w for d, w in zip(digitos, pesos)) % 11
+        digitos.append(0 if r < 2 else 11 - r)
+    return "".join(map(str, digitos))
+
+
+OPERADORAS = [(str(300000 + i), _cnpj(11_222_333_0001 + i), f"OPERADORA {i}", ["SP", "RJ"][i % 2]) for i in range(6)]
+
+
+def _zip_trimestre(ano: int, trimestre: int) -> bytes:
+    linhas = ["DATA;REG_ANS;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_INICIAL;VL_SALDO_FINAL"]
+    linhas += [f"{ano}-01-01;{reg};41;EVENTOS/ SINISTROS CONHECIDOS;0;{1000 + i},50" for i, (reg, *_) in enumerate(OPERADORAS)]
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr(f"{trimestre}T{ano}.csv", "\n".join(linhas))
+    return buf.getvalue()
+
+
+class _FakeClient:
+    def download(self, url: str, out_path: Path) -> int:
+        ano, trimestre = download_ans.periodo_do_nome(out_path.name)
+        return out_path.write_bytes(_zip_trimestre(ano, trimestre))
+
+    def log_metrics(self) -> None:
+        pass
+
+
+@pytest.fixture
+def scripts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Path("data/raw").mkdir(parents=True)
+    Path("data/final").mkdir(parents=True)
+    pd.DataFrame(
+        [{"REGISTRO_OPERADORA": r, "CNPJ": c, "Razao_Social": n, "Modalidade": "X", "UF": uf} for r, c, n, uf in OPERADORAS]
+    ).to_csv("data/raw/Relatorio_cadop.csv", sep=";", index=False, encoding="latin1")
+
+    alvos = [((2025, t), f"https://ans/{t}T2025.zip", f"{t}T2025.zip") for t in (1, 2)]
+    monkeypatch.setattr(backfill, "download_operadoras_run", lambda: None)
+    monkeypatch.setattr(download_ans, "discover_zips_in_range", lambda inicio, fim: alvos)
+    monkeypatch.setattr(download_ans, "get_client", _FakeClient)
+    monkeypatch.setattr(db_import, "copy_to_shared", lambda src, nome: f"/shared/{nome}")
+
+    executados = []
+    monkeypatch.setattr(db_import, "run_psql", lambda sql_file, variables=None: executados.append(sql_file.name) or "")
+    return executados
+
+
+def test_backfill_carrega_cadastro_antes_dos_trimestres(scripts):
+    backfill.run((2025, 1), (2025, 2), max_workers=2)
+
+    assert scripts == [
+        "01_ddl.sql",
+        "06_import_operadoras.sql",
+        "04_import_trimestre.sql",
+        "04_import_trimestre.sql",
+        "05_import_agregadas.sql",
+    ]
+    cadastro = pd.read_csv("data/final/operadoras_cadastro.csv", sep=";", dtype=str)
+    assert sorted(cadastro["uf"].unique()) == ["RJ", "SP"]
+
+
+def test_backfill_fora_do_raw_do_pipeline(scripts):
+    backfill.run((2025, 1), (2025, 2), max_workers=2)
+
+    assert sorted(p.name for p in backfill.RAW_DIR.glob("*.zip")) == ["1T2025.zip", "2T2025.zip"]
+    assert sorted(p.name for p in backfill.EXTRACTED_DIR.iterdir()) == ["1T2025", "2T2025"]
+    # process_files.run() do pipeline normal lê data/raw/*.zip e data/extracted
+    assert not list(Path("data/raw").glob("*.zip"))
+    assert not Path("data/extracted").exists() or not any(Path("data/extracted").iterdir())
@@ -0,0 +1,119 @@
+import math
+import os
+import re
+import pandas as pd
+import pytest
+
+from pathlib import Path
+from etl.br_numbers import parse_br_number
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DATA_FINAL = BASE_DIR / "data" / "final"
+DDL = BASE_DIR / "sql" / "01_ddl.sql"
+
+# Colunas numéricas dos CSVs gerados pelo pipeline
+COLUNAS_FINAL = {
+    "despesas_consolidadas_final.csv": ["VL_SALDO_FINAL"],
+    "despesas_por_operadora_trimestre.csv": ["VL_SALDO_FINAL"],
+    "despesas_agregadas.csv": ["TOTAL_DESPESAS", "MEDIA_TRIMESTRAL", "DESVIO_PADRAO"],
+    "despesas_agregadas_parciais.csv": ["SOMA", "M2"],
+}
+
+CASOS = {
+    "1257109617.35": 1257109617.35,
+    "-1039393.62": -1039393.62,
+    "0.5": 0.5,
+    ".5": 0.5,
+    "5.": 5.0,
+    "1.234": 1.234,
+    "12": 12.0,
+    "1e5": 100000.0,
+    "-2.5E-05": -2.5e-05,
+    "1e19": 1e19,
+    "-99999999999999999,99": -99999999999999999.99,
+    "1e20": math.nan,
+    "-1.000.000.000.000.000.000.000": math.nan,
+    "1e308": math.nan,
+    "1e0001": math.nan,
+    "9" * 400: math.nan,
+    "1234567,89": 1234567.89,
+    "1.234.567,89": 1234567.89,
+    "1.234.567": 1234567.0,
+    "-3,5": -3.5,
+    ",5": 0.5,
+    "-,5": -0.5,
+    "5,": 5.0,
+    " 7,25 ": 7.25,
+    "\t7,25\r\n": 7.25,
+    "0,00": 0.0,
+    "": math.nan,
+    None: math.nan,
+    "abc": math.nan,
+    "+": math.nan,
+    ",": math.nan,
+    "1,234.56": math.nan,
+    "12.5.6": math.nan,
+    "1,5e3": math.nan,
+    "1.234.567e2": math.nan,
+    "1_000": math.nan,
+    "١٢": math.nan,
+    "1 000": math.nan,
+    "inf": math.nan,
+    "nan": math.nan,
+}
+
+
+def _iguais(a: float, b: float) -> bool:
+    return (math.isnan(a) and math.isnan(b)) or a == b
+
+
+@pytest.mark.parametrize("texto, esperado", CASOS.items())
+def test_casos(texto, esperado):
+    assert _iguais(parse_br_number([texto])[0], esperado)
+
+
+def test_errors_raise():
+    assert parse_br_number(["1,5", "", None], errors="raise").iloc[0] == 1.5
+    with pytest.raises(ValueError, match="1_000"):
+        parse_br_number(["1,5", "1_000"], errors="raise")
+
+
+def test_texto_longo():
+    assert parse_br_number(["0" * 100 + "1,5", "0" * 100 + "x"]).tolist()[0] == 1.5
+    assert math.isnan(parse_br_number(["0" * 100 + "x"])[0])
+
+
+@pytest.mark.parametrize("nome, coluna", [(n, c) for n, cols in COLUNAS_FINAL.items() for c in cols])
+def test_csvs_do_pipeline(nome, coluna):
+    path = DATA_FINAL / nome
+    if not path.exists():
+        pytest.skip(f"sem {path}")
+    df = pd.read_csv(path, sep=";", dtype=str, keep_default_na=False)
+    df.columns = [str(c).strip().upper() for c in df.columns]
+
+    valores = parse_br_number(df[coluna])
+    esperados = [float(t) if t.strip() else math.nan for t in df[coluna]]
+    divergentes = [t for t, e, v in zip(df[coluna], esperados, valores) if not _iguais(e, v)]
+    assert not divergentes, divergentes[:5]
+
+
+def test_mesma_regra_que_numero_br():
+    psycopg = pytest.importorskip("psycopg")
+    from benchmarks.check_query_plans import _connect
+
+    try:
+        conn = _connect(os.getenv("DB_NAME", "intuitivecare"))
+    except psycopg.Error as e:
+        pytest.skip(f"PostgreSQL indisponível: {e}")
+
+    # Cria a função do DDL em pg_temp: não depende do schema do banco estar atualizado
+    funcao = re.search(r"CREATE OR REPLACE FUNCTION numero_br\(.*?\n\$\$;", DDL.read_text(encoding="utf-8"), re.S)
+    textos = [t for t in CASOS if t is not None]
+    with conn:
+        conn.execute(funcao.group(0).replace("FUNCTION numero_br(", "FUNCTION pg_temp.numero_br("))
+        sql = conn.execute("SELECT pg_temp.numero_br(t) FROM unnest(%s::text[]) WITH ORDINALITY AS u(t, i) ORDER BY i", [textos])
+        valores = [math.nan if v is None else float(v) for (v,) in sql.fetchall()]
+
+    divergentes = [(t, CASOS[t], v) for t, v in zip(textos, valores) if not _iguais(CASOS[t], v)]
+    assert not divergentes, divergentes
@@ -0,0 +1,141 @@
+import os
+import shutil
+import socket
+import subprocess
+import time
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+from psycopg import sql
+from api import db
+
+
+USUARIO = "intuitive"
+
+
+def _run(*args) -> None:
+    subprocess.run([str(a) for a in args], check=True, capture_output=True, timeout=120)
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _iniciar(data_dir, porta: int, socket_dir) -> None:
+    opcoes = f"-p {porta} -k {socket_dir} -c listen_addresses=''"
+    _run("pg_ctl", "-D", data_dir, "-l", data_dir / "server.log", "-o", opcoes, "-w", "start")
+
+
+def _sql(host: str, porta: int, query, params=None):
+    with psycopg.connect(host=host, port=porta, dbname="postgres", user=USUARIO, autocommit=True) as c:
+        cur = c.execute(query, params)
+        return cur.fetchone() if cur.description else None
+
+
+def _esperar(condicao, timeout: float = 20.0) -> None:
+    limite = time.monotonic() + timeout
+    while not condicao():
+        if time.monotonic() > limite:
+            raise TimeoutError("condição não atingida")
+        time.sleep(0.2)
+
+
+def _em_streaming(host: str, porta: int) -> bool:
+    return _sql(host, porta, "SELECT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming')")[0]
+
+
+@pytest.fixture(scope="module")
+def instancias(tmp_path_factory):
+    # Primário e réplica em streaming criados do zero: precisa dos binários do
+    # PostgreSQL no PATH e de um usuário que não seja root (initdb recusa root)
+    if shutil.which("initdb") is None or shutil.which("pg_basebackup") is None:
+        pytest.skip("binários do PostgreSQL fora do PATH")
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        pytest.skip("initdb não roda como root")
+
+    base = tmp_path_factory.mktemp("pg")
+    host = str(base)
+    primario, replica = base / "primario", base / "replica"
+    p_primario, p_replica = _porta_livre(), _porta_livre()
+
+    _run("initdb", "-D", primario, "-U", USUARIO, "-A", "trust")
+    _iniciar(primario, p_primario, base)
+    try:
+        _run("pg_basebackup", "-h", host, "-p", p_primario, "-U", USUARIO, "-D", replica, "-R", "-X", "stream")
+        _iniciar(replica, p_replica, base)
+        _esperar(lambda: _em_streaming(host, p_replica))
+        yield host, p_primario, p_replica, replica
+    finally:
+        for d in (replica, primario):
+            if (d / "postmaster.pid").exists():
+                subprocess.run(["pg_ctl", "-D", str(d), "-m", "immediate", "stop"], capture_output=True)
+
+
+@pytest.fixture
+def env(instancias, monkeypatch):
+    host, p_primario, p_replica, _ = instancias
+    for nome, valor in {
+        "DB_HOST": host,
+        "DB_PORT": str(p_primario),
+        "DB_NAME": "postgres",
+        "DB_USER": USUARIO,
+        "DB_PASSWORD": "",
+        "DB_REPLICAS": f"{host}:{p_replica}",
+        "DB_REPLICA_CHECK_SECONDS": "0",
+        "DB_REPLICA_MAX_LAG_SECONDS": "1",
+    }.items():
+        monkeypatch.setenv(nome, valor)
+    # Lista de réplicas (e o estado delas) nova a cada teste
+    monkeypatch.setattr(db, "_replicas_env", None)
+    return instancias
+
+
+def _na_replica() -> bool:
+    with db.get_conn(readonly=True) as conn:
+        return conn.execute("SELECT pg_is_in_recovery() AS r").fetchone()["r"]
+
+
+def test_leitura_vai_para_replica_em_dia(env):
+    assert _na_replica()
+    assert db.replicas_status()[0]["lag_seconds"] == 0
+
+    # Escrita sempre no primário
+    with db.get_conn() as conn:
+        assert not conn.execute("SELECT pg_is_in_recovery() AS r").fetchone()["r"]
+
+
+def test_walreceiver_desconectado_nao_conta_como_em_dia(env):
+    host, p_primario, p_replica, _ = env
+    _sql(host, p_primario, "CREATE TABLE IF NOT EXISTS t_lag (x int); INSERT INTO t_lag VALUES (1)")
+    lsn = _sql(host, p_primario, "SELECT pg_current_wal_lsn()::text")[0]
+    _esperar(lambda: _sql(host, p_replica, "SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn", [lsn])[0])
+
+    conninfo = _sql(host, p_replica, "SHOW primary_conninfo")[0]
+    _sql(host, p_replica, "ALTER SYSTEM SET primary_conninfo = ''")
+    _sql(host, p_replica, "SELECT pg_reload_conf()")
+    try:
+        _esperar(lambda: not _em_streaming(host, p_replica))
+        time.sleep(1.5)
+
+        # Todo o WAL recebido já foi aplicado: o atalho antigo (receive = replay) daria 0
+        assert _sql(host, p_replica, "SELECT pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()")[0]
+        lag = _sql(host, p_replica, db.Q_REPLICA_LAG, {"recebido": 60})[0]
+        assert lag is not None and lag >= 1.5
+
+        assert not _na_replica()
+        assert db.replicas_status()[0]["lag_seconds"] >= 1.5
+    finally:
+        _sql(host, p_replica, sql.SQL("ALTER SYSTEM SET primary_conninfo = {}").format(sql.Literal(conninfo)))
+        _sql(host, p_replica, "SELECT pg_reload_conf()")
+        _esperar(lambda: _em_streaming(host, p_replica))
+
+
+def test_replica_parada_cai_no_primario(env):
+    _, _, _, replica = env
+    _run("pg_ctl", "-D", replica, "-m", "fast", "-w", "stop")
+
+    assert not _na_replica()
+    assert db.replicas_status()[0]["status"] == "down"
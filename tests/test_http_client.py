@@ -0,0 +1,244 @@
+import gzip
+import threading
+import pytest
+import requests
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from requests.exceptions import ChunkedEncodingError
+from etl import http_client
+from etl.http_client import HttpClient, _HostLimiter
+
+
+CORPO = bytes(range(256)) * 400
+
+
+class _Servidor(ThreadingHTTPServer):
+    """
+    Servidor local com roteiro: cada requisição a um caminho consome a próxima
+    resposta da lista ("ok" quando acaba).
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.roteiros: dict[str, list[str]] = {}
+        self.recebidas: list[str] = []
+        self.lock = threading.Lock()
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def proxima(self, path: str) -> str:
+        with self.lock:
+            self.recebidas.append(path)
+            roteiro = self.roteiros.get(path, [])
+            return roteiro.pop(0) if roteiro else "ok"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _Servidor
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _status(self, status: int, **headers) -> None:
+        self.send_response(status)
+        for nome, valor in {"Content-Length": "0", **headers}.items():
+            self.send_header(nome, valor)
+        self.end_headers()
+
+    def do_GET(self) -> None:
+        resposta = self.server.proxima(self.path)
+        if resposta.isdigit():
+            self._status(int(resposta))
+        elif resposta.startswith("retry-after="):
+            self._status(429, **{"Retry-After": resposta.split("=", 1)[1]})
+        elif resposta == "reset":
+            self.close_connection = True
+        elif resposta == "truncado":
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(CORPO)))
+            self.end_headers()
+            self.wfile.write(CORPO[: len(CORPO) // 2])
+            self.close_connection = True
+        elif resposta == "chunked-curto":
+            # Content-Length anunciado, mas o corpo vem em chunked e termina antes:
+            # o urllib3 ignora o Content-Length e só a conferência do cliente percebe
+            metade = CORPO[: len(CORPO) // 2]
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(CORPO)))
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(metade), metade))
+        elif resposta == "gzip":
+            body = gzip.compress(CORPO)
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(CORPO)))
+            self.end_headers()
+            self.wfile.write(CORPO)
+
+
+@pytest.fixture(scope="module")
+def servidor():
+    s = _Servidor()
+    threading.Thread(target=s.serve_forever, daemon=True).start()
+    yield s
+    s.shutdown()
+
+
+@pytest.fixture
+def roteiro(servidor):
+    servidor.recebidas.clear()
+
+    def definir(path: str, respostas: list[str]) -> str:
+        servidor.roteiros[path] = list(respostas)
+        return servidor.url(path)
+
+    return definir
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    # Registra os time.sleep do cliente (backoff e limite de taxa) sem esperar de fato
+    dormidas = []
+    monkeypatch.setattr(http_client.time, "sleep", dormidas.append)
+    return dormidas
+
+
+def _client(**kwargs) -> HttpClient:
+    return HttpClient(**{"rate": 0, "retries": 5, "backoff": 0.5, "max_backoff": 60.0, "timeout": 5.0, **kwargs})
+
+
+def _host(client: HttpClient) -> dict:
+    (metricas,) = client.metrics().values()
+    return metricas
+
+
+def test_novas_tentativas_em_429_e_5xx(roteiro, servidor, esperas, tmp_path):
+    url = roteiro("/a.zip", ["429", "503", "500", "reset"])
+    client = _client()
+
+    assert client.download(url, tmp_path / "a.zip") == len(CORPO)
+    assert (tmp_path / "a.zip").read_bytes() == CORPO
+    assert not (tmp_path / "a.zip.part").exists()
+
+    assert len(servidor.recebidas) == 5
+    m = _host(client)
+    assert m["retries"] == 4 and m["failures"] == 0
+    assert m["status"] == {200: 1, 429: 1, 500: 1, 503: 1}
+    # Backoff exponencial com jitter de ±50%: 0,5 · 2^tentativa
+    for tentativa, espera in enumerate(esperas):
+        assert 0.5 * 2**tentativa * 0.5 <= espera <= 0.5 * 2**tentativa * 1.5
+
+
+def test_desiste_depois_de_retries(roteiro, servidor, esperas, tmp_path):
+    url = roteiro("/b.zip", ["503"] * 10)
+    client = _client(retries=2)
+
+    with pytest.raises(requests.HTTPError, match="503"):
+        client.download(url, tmp_path / "b.zip")
+
+    assert len(servidor.recebidas) == 3
+    assert not (tmp_path / "b.zip").exists()
+    assert _host(client)["failures"] == 1
+
+
+def test_erro_do_cliente_nao_repete(roteiro, servidor, esperas, tmp_path):
+    url = roteiro("/c.zip", ["404"])
+
+    with pytest.raises(requests.HTTPError):
+        _client().download(url, tmp_path / "c.zip")
+
+    assert len(servidor.recebidas) == 1
+    assert esperas == []
+
+
+def test_retry_after(roteiro, esperas, tmp_path):
+    url = roteiro("/d.zip", ["retry-after=7", "retry-after=600"])
+
+    _client(max_backoff=30.0).download(url, tmp_path / "d.zip")
+
+    # Retry-After em segundos tem prioridade sobre o backoff, limitado a max_backoff
+    assert esperas == [7.0, 30.0]
+
+
+def test_corpo_truncado_repete_e_falha_sem_arquivo(roteiro, servidor, esperas, tmp_path):
+    url = roteiro("/e.zip", ["truncado"])
+    client = _client()
+    assert client.download(url, tmp_path / "e.zip") == len(CORPO)
+    assert (tmp_path / "e.zip").read_bytes() == CORPO
+    assert _host(client)["retries"] == 1
+
+    url = roteiro("/f.zip", ["truncado"] * 3)
+    with pytest.raises(ChunkedEncodingError):
+        _client(retries=2).download(url, tmp_path / "f.zip")
+    assert not (tmp_path / "f.zip").exists()
+
+
+def test_content_length_diferente_dos_bytes_recebidos(roteiro, esperas, tmp_path):
+    url = roteiro("/g.zip", ["chunked-curto"] * 2)
+
+    with pytest.raises(requests.ConnectionError, match="Download incompleto"):
+        _client(retries=1).download(url, tmp_path / "g.zip")
+    assert not (tmp_path / "g.zip").exists()
+
+    url = roteiro("/h.zip", ["chunked-curto"])
+    assert _client().download(url, tmp_path / "h.zip") == len(CORPO)
+
+
+def test_gzip_confere_bytes_da_rede(roteiro, esperas, tmp_path):
+    url = roteiro("/i.csv", ["gzip"])
+    client = _client()
+
+    # Content-Length é do corpo comprimido; o arquivo gravado é o conteúdo decodificado
+    assert client.download(url, tmp_path / "i.csv") == len(CORPO)
+    assert (tmp_path / "i.csv").read_bytes() == CORPO
+    assert _host(client)["retries"] == 0
+
+
+def test_limitador_aimd():
+    limiter = _HostLimiter(rate=8.0)
+
+    limiter.throttled()
+    assert limiter.rate == 4.0
+    for _ in range(10):
+        limiter.throttled()
+    assert limiter.rate == 0.5
+
+    limiter.succeeded()
+    assert limiter.rate == pytest.approx(1.3)
+    for _ in range(20):
+        limiter.succeeded()
+    assert limiter.rate == 8.0
+
+
+def test_429_reduz_a_taxa_do_host(roteiro, esperas, tmp_path):
+    url = roteiro("/j.zip", ["429", "429"])
+    client = _client(rate=10.0)
+
+    client.download(url, tmp_path / "j.zip")
+
+    (limiter,) = client._limiters.values()
+    # Duas quedas pela metade (10 → 5 → 2,5) e um sucesso (+10/10)
+    assert limiter.rate == pytest.approx(3.5)
+
+
+def test_limitador_espaca_requisicoes(esperas):
+    limiter = _HostLimiter(rate=4.0)
+    for _ in range(3):
+        limiter.wait()
+    limiter.throttled()
+    for _ in range(2):
+        limiter.wait()
+
+    # 1/taxa entre requisições (time.sleep não espera: as esperas se acumulam); depois
+    # do 429 o intervalo dobra a partir do próximo horário ainda não reservado
+    assert esperas == pytest.approx([0.25, 0.5, 0.75, 1.25], abs=0.05)
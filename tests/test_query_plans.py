@@ -0,0 +1,28 @@
+import os
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+from benchmarks import check_query_plans as cqp
+
+
+NOME = f"{os.getenv('DB_NAME', 'intuitivecare')}_plancheck_test"
+
+
+@pytest.fixture(scope="module")
+def conn():
+    # Roda só com um PostgreSQL acessível pelas variáveis DB_* (o mesmo .env da API)
+    try:
+        cqp._create_database(NOME, operadoras=20_000, trimestres=12)
+    except psycopg.Error as e:
+        pytest.skip(f"PostgreSQL indisponível para a verificação de planos: {e}")
+    try:
+        with cqp._connect(NOME) as c:
+            yield c
+    finally:
+        cqp._drop_database(NOME)
+
+
+def test_planos_das_consultas_da_api(conn):
+    falhas = cqp.check(conn, min_linhas=1_000, verbose=False)
+    assert not falhas, "\n".join(falhas)
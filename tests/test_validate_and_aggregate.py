@@ -0,0 +1,163 @@
+import json
+import random
+import pandas as pd
+import pytest
+
+from pathlib import Path
+from etl import validate_and_aggregate as va
+
+
+TRIMESTRES = [(2024, 4), (2025, 1), (2025, 2), (2025, 3)]
+CHAVES = ["RAZAO_SOCIAL", "UF"]
+
+
+def _cnpj(base: int) -> str:
+    digitos = [int(c) for c in f"{base:012d}"]
+    for pesos in (va.CNPJ_W1, va.CNPJ_W2):
+        r = sum(d * w for d, w in zip(digitos, pesos)) % 11
+        digitos.append(0 if r < 2 else 11 - r)
+    return "".join(map(str, digitos))
+
+
+OPERADORAS = [(_cnpj(11_222_333_0001 + i), f"OPERADORA {i % 7}", ["SP", "RJ", "MG"][i % 3]) for i in range(20)]
+
+
+def _write_cadastro(ufs: dict[str, str] | None = None) -> None:
+    linhas = [
+        {"REGISTRO_OPERADORA": str(300000 + i), "CNPJ": cnpj, "Razao_Social": razao, "Modalidade": "X", "UF": (ufs or {}).get(cnpj, uf)}
+        for i, (cnpj, razao, uf) in enumerate(OPERADORAS)
+    ]
+    pd.DataFrame(linhas).to_csv(va.RAW_DIR / "Relatorio_cadop.csv", sep=";", index=False, encoding="latin1")
+
+
+def _write_despesas(path: Path, trimestres: list[tuple[int, int]]) -> Path:
+    rnd = random.Random(1)
+    linhas = []
+    for ano, trimestre in TRIMESTRES:
+        for i, (cnpj, razao, _) in enumerate(OPERADORAS):
+            valor = round(rnd.uniform(0, 1e7), 2)
+            if (ano, trimestre) in trimestres and (i + trimestre) % 5:
+                linhas.append([str(300000 + i), f"{valor:.2f}", ano, trimestre, cnpj, razao])
+    pd.DataFrame(linhas, columns=["RegistroANS", "VL_SALDO_FINAL", "ano", "trimestre", "CNPJ", "RAZAO_SOCIAL"]).to_csv(
+        path, sep=";", index=False
+    )
+    return path
+
+
+def _agregadas() -> pd.DataFrame:
+    df = pd.read_csv(va.DATA_FINAL / "despesas_agregadas.csv", sep=";")
+    return df.sort_values(CHAVES).reset_index(drop=True)
+
+
+def _completa(trimestres: list[tuple[int, int]], tmp_path: Path) -> pd.DataFrame:
+    va.run(_write_despesas(tmp_path / "completa.csv", trimestres), incremental=False)
+    return _agregadas()
+
+
+def _assert_igual(incremental: pd.DataFrame, completa: pd.DataFrame) -> None:
+    pd.testing.assert_frame_equal(incremental, completa, check_exact=False, rtol=1e-9)
+
+
+@pytest.fixture(autouse=True)
+def _diretorio(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    va.RAW_DIR.mkdir(parents=True)
+    va.DATA_FINAL.mkdir(parents=True)
+    _write_cadastro()
+
+
+def test_trimestre_novo_igual_a_completa(tmp_path):
+    va.run(_write_despesas(tmp_path / "a.csv", TRIMESTRES[:3]))
+    va.run(_write_despesas(tmp_path / "b.csv", TRIMESTRES))
+    incremental = _agregadas()
+
+    _assert_igual(incremental, _completa(TRIMESTRES, tmp_path))
+
+
+def test_trimestre_fora_da_entrada_sai_do_estado(tmp_path):
+    va.run(_write_despesas(tmp_path / "a.csv", TRIMESTRES))
+    va.run(_write_despesas(tmp_path / "b.csv", TRIMESTRES[1:]))
+    incremental = _agregadas()
+
+    assert "2024-4" not in va._periodos(pd.read_csv(va.PARCIAIS_CSV, sep=";"))
+    _assert_igual(incremental, _completa(TRIMESTRES[1:], tmp_path))
+
+
+def test_cadastro_alterado_descarta_estado(tmp_path):
+    for ano, trimestre in TRIMESTRES[:3]:
+        va.run(_write_despesas(tmp_path / f"{ano}T{trimestre}.csv", [(ano, trimestre)]), partial_input=True)
+    _write_cadastro({OPERADORAS[0][0]: "BA", OPERADORAS[4][0]: "BA"})
+    assert not va.state_matches_cadastro()
+
+    # Os parciais dos trimestres anteriores têm a UF antiga: só o trimestre novo fica
+    va.run(_write_despesas(tmp_path / "b.csv", TRIMESTRES[3:]), partial_input=True)
+    incremental = _agregadas()
+
+    assert va.state_matches_cadastro()
+    assert "BA" in set(incremental["UF"])
+    _assert_igual(incremental, _completa(TRIMESTRES[3:], tmp_path))
+
+
+def test_entrada_parcial_acumula_trimestres(tmp_path):
+    for ano, trimestre in TRIMESTRES:
+        va.run(_write_despesas(tmp_path / f"{ano}T{trimestre}.csv", [(ano, trimestre)]), partial_input=True)
+    incremental = _agregadas()
+
+    _assert_igual(incremental, _completa(TRIMESTRES, tmp_path))
+
+
+def test_execucao_interrompida_refaz_completa(tmp_path):
+    va.run(_write_despesas(tmp_path / "a.csv", TRIMESTRES[:3]))
+    # Estado de uma execução que não terminou: CSV final defasado e sem o meta
+    va.PARCIAIS_META.unlink()
+    pd.DataFrame(columns=CHAVES + ["total_despesas", "media_trimestral", "desvio_padrao"]).to_csv(
+        va.DATA_FINAL / "despesas_agregadas.csv", sep=";", index=False
+    )
+
+    va.run(_write_despesas(tmp_path / "b.csv", TRIMESTRES[:3]))
+    _assert_igual(_agregadas(), _completa(TRIMESTRES[:3], tmp_path))
+
+
+def test_quarentena_em_blocos(tmp_path, monkeypatch):
+    monkeypatch.setattr(va, "CHUNK_ROWS", 7)
+    entrada = _write_despesas(tmp_path / "q.csv", TRIMESTRES)
+    df = pd.read_csv(entrada, sep=";", dtype=str)
+    df.loc[::4, "VL_SALDO_FINAL"] = "-1,00"
+    df.loc[1::9, "CNPJ"] = "11111111111111"
+    df.loc[2::11, "RAZAO_SOCIAL"] = ""
+    df.to_csv(entrada, sep=";", index=False)
+
+    va.run(entrada, incremental=False)
+
+    resumo = json.loads((va.QUARANTINE_DIR / "resumo_q.json").read_text(encoding="utf-8"))
+    assert resumo["registros_lidos"] == len(df)
+    total = 0
+    for motivo, info in resumo["rejeitados"].items():
+        rejeitadas = pd.read_csv(info["arquivo"], sep=";", dtype=str)
+        assert len(rejeitadas) == info["quantidade"]
+        assert len(info["amostras"]) == min(info["quantidade"], va.AMOSTRAS_POR_MOTIVO)
+        total += info["quantidade"]
+    assert set(resumo["rejeitados"]) == set(va.MOTIVOS)
+    assert resumo["aceitos"] == len(df) - total
+    assert not list(va.QUARANTINE_DIR.rglob("*.tmp"))
+
+
+@pytest.mark.parametrize("sem_blocos", [False, True])
+def test_entrada_so_com_cabecalho(tmp_path, monkeypatch, sem_blocos):
+    entrada = _write_despesas(tmp_path / "vazia.csv", [])
+    if sem_blocos:
+        # Leitor em blocos que não devolve bloco nenhum para um CSV sem linhas
+        read_csv = pd.read_csv
+        monkeypatch.setattr(
+            va.pd, "read_csv", lambda *a, **k: iter(()) if k.get("chunksize") else read_csv(*a, **k)
+        )
+
+    despesas = va._read_and_classify(entrada)
+    assert despesas.empty
+    assert {"CNPJ", "RAZAO_SOCIAL", "VL_SALDO_FINAL", "ANO", "TRIMESTRE"} <= set(despesas.columns)
+    assert despesas["VL_SALDO_FINAL"].dtype == "float64"
+
+    va.run(entrada, incremental=False)
+    assert _agregadas().empty
+    resumo = json.loads((va.QUARANTINE_DIR / "resumo_vazia.json").read_text(encoding="utf-8"))
+    assert resumo["registros_lidos"] == 0 and resumo["aceitos"] == 0